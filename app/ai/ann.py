@@ -0,0 +1,164 @@
+"""IVF (inverted file) approximate nearest-neighbour index over unit vectors.
+
+Rows are clustered with spherical k-means; a query only scores the rows in
+the ``nprobe`` clusters whose centroids are closest to it. ``nprobe`` trades
+recall for latency: ``nprobe >= nlist`` degenerates into an exact scan.
+
+On disk the index is two files next to the vector segments:
+
+- ``<name>.centroids.f32``: float32 matrix of shape ``(nlist, dimension)``.
+- ``<name>.assign.i32``: int32 cluster id per store row, append-only.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .scoring import normalize_rows, top_k
+
+CENTROIDS_SUFFIX = ".centroids.f32"
+ASSIGN_SUFFIX = ".assign.i32"
+
+# Rows scored per block while assigning, bounding the temporary score matrix.
+_ASSIGN_BLOCK = 16384
+
+
+def default_nlist(count: int) -> int:
+    """Rule-of-thumb cluster count: about ``4 * sqrt(n)``."""
+    return max(1, min(count, int(4 * np.sqrt(max(count, 1)))))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the nearest centroid id for every row of ``vectors``."""
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _ASSIGN_BLOCK):
+        block = np.asarray(vectors[start : start + _ASSIGN_BLOCK], dtype=np.float32)
+        labels[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    nlist: int,
+    iterations: int = 10,
+    sample_size: Optional[int] = None,
+    seed: int = 0,
+) -> np.ndarray:
+    """Spherical k-means over (a sample of) ``vectors``."""
+    rng = np.random.default_rng(seed)
+    count = vectors.shape[0]
+    nlist = max(1, min(nlist, count))
+    sample_size = min(count, sample_size or 256 * nlist)
+    sample_rows = np.sort(rng.choice(count, size=sample_size, replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sizes = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind="stable")
+        occupied = np.flatnonzero(sizes)
+        starts = np.concatenate([[0], np.cumsum(sizes)])[occupied]
+        sums = np.zeros_like(centroids)
+        sums[occupied] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(sizes == 0)
+        if len(empty):
+            sums[empty] = sample[rng.choice(sample_size, size=len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Cluster-pruned scorer over a (memory-mapped) matrix of unit vectors."""
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, labels: np.ndarray) -> None:
+        self.vectors = vectors
+        self.centroids = centroids
+        self.labels = labels
+        order = np.argsort(labels, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))])
+        self._lists: List[np.ndarray] = [
+            order[bounds[cluster] : bounds[cluster + 1]] for cluster in range(len(centroids))
+        ]
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    def __len__(self) -> int:
+        return int(self.labels.shape[0])
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        nprobe: int = 8,
+        exclude: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(scores, rows)`` per query; rows are padded with ``-1`` when short.
+
+        At least ``nprobe`` clusters are scanned, plus as many further ones as
+        needed to gather ``k`` candidates. Rows in ``exclude`` are skipped.
+        """
+        queries = normalize_rows(queries)
+        nprobe = max(1, min(nprobe, self.nlist))
+        ranked = top_k(queries @ self.centroids.T, self.nlist)
+        sizes = np.array([len(rows) for rows in self._lists])
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for position, (query, clusters) in enumerate(zip(queries, ranked)):
+            enough = int(np.searchsorted(np.cumsum(sizes[clusters]), k)) + 1
+            clusters = clusters[: max(nprobe, enough)]
+            candidates = np.sort(np.concatenate([self._lists[c] for c in clusters]))
+            if exclude is not None and len(exclude):
+                candidates = candidates[~np.isin(candidates, exclude)]
+            if not len(candidates):
+                continue
+            scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+            best = top_k(scores, k)
+            all_scores[position, : len(best)] = scores[best]
+            all_rows[position, : len(best)] = candidates[best]
+        return all_scores, all_rows
+
+
+def write_index(storage_dir: Path, name: str, centroids: np.ndarray, labels: np.ndarray) -> None:
+    for suffix, array in ((CENTROIDS_SUFFIX, centroids), (ASSIGN_SUFFIX, labels)):
+        with open(storage_dir / f"{name}{suffix}", "wb") as handle:
+            handle.write(np.ascontiguousarray(array).tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+def append_assignments(storage_dir: Path, name: str, committed: int, labels: np.ndarray) -> None:
+    """Append labels after the first ``committed`` entries, dropping any torn tail."""
+    with open(storage_dir / f"{name}{ASSIGN_SUFFIX}", "r+b") as handle:
+        handle.truncate(committed * 4)
+        handle.seek(committed * 4)
+        handle.write(np.ascontiguousarray(labels, dtype=np.int32).tobytes())
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def load_index(
+    storage_dir: Path, name: str, nlist: int, count: int, vectors: np.ndarray
+) -> IVFIndex:
+    dimension = vectors.shape[1]
+    centroids = np.fromfile(storage_dir / f"{name}{CENTROIDS_SUFFIX}", dtype=np.float32)
+    labels = np.fromfile(storage_dir / f"{name}{ASSIGN_SUFFIX}", dtype=np.int32, count=count)
+    return IVFIndex(vectors, centroids.reshape(nlist, dimension), labels)
+
+
+def remove_index_files(storage_dir: Path, keep: Iterable[str] = ()) -> None:
+    """Delete index files whose name is not listed in ``keep``."""
+    keep = set(keep)
+    for path in storage_dir.glob(f"*{CENTROIDS_SUFFIX}"):
+        name = path.name[: -len(CENTROIDS_SUFFIX)]
+        if name in keep:
+            continue
+        path.unlink()
+        assign_path = storage_dir / f"{name}{ASSIGN_SUFFIX}"
+        if assign_path.exists():
+            assign_path.unlink()
@@ -0,0 +1,224 @@
+"""In-memory cache of generated answers for repeated customer questions."""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from .scoring import top_k
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+CacheKey = Tuple[str, Tuple[str, ...], str]
+T = TypeVar("T")
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold and strip punctuation/extra whitespace: "Hours??" == "hours"."""
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", question.casefold())).strip()
+
+
+@dataclass
+class _Entry:
+    answer: str
+    expires_at: float
+    row: int = -1
+
+
+class AnswerCache:
+    """LRU + TTL map from (question, context doc ids, tone) to an answer.
+
+    Entries are tied to a vector store generation: the first lookup after the
+    knowledge base changes drops everything. With ``similarity_threshold``
+    set, a question that misses exactly may reuse the answer of a cached
+    question with the same context and tone whose embedding is at least that
+    cosine-similar. Question embeddings are kept as rows of one matrix, so
+    that lookup is a single matrix-vector product however full the cache is.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.0,
+        embed: Optional[Callable[[str], np.ndarray]] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold if embed is not None else 0.0
+        self.embed = embed
+        self.generation: Optional[int] = None
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # Row i of ``_vectors`` embeds ``_row_keys[i]``; freed rows are zeroed
+        # (never reach a positive threshold) and reused from ``_free_rows``.
+        self._vectors: Optional[np.ndarray] = None
+        self._row_keys: List[Optional[CacheKey]] = []
+        self._free_rows: List[int] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def key(question: str, doc_ids: Sequence[str], tone: str) -> CacheKey:
+        return normalize_question(question), tuple(doc_ids), tone
+
+    def _sync_generation(self, generation: int) -> None:
+        if self.generation != generation:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._reset()
+            self.generation = generation
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        self._vectors = None
+        self._row_keys.clear()
+        self._free_rows.clear()
+
+    def _store_vector(self, key: CacheKey, vector: np.ndarray) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._row_keys)
+            self._row_keys.append(None)
+            if self._vectors is None or row == len(self._vectors):
+                capacity = min(self.max_entries, max(16, 2 * row))
+                grown = np.zeros((capacity, len(vector)), dtype=np.float32)
+                if self._vectors is not None:
+                    grown[:row] = self._vectors
+                self._vectors = grown
+        self._vectors[row] = vector
+        self._row_keys[row] = key
+        return row
+
+    def _release(self, entry: _Entry) -> None:
+        if entry.row >= 0:
+            self._vectors[entry.row] = 0.0
+            self._row_keys[entry.row] = None
+            self._free_rows.append(entry.row)
+
+    def get(
+        self, question: str, doc_ids: Sequence[str], tone: str, generation: int
+    ) -> Optional[str]:
+        key = self.key(question, doc_ids, tone)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.answer
+        if self.similarity_threshold > 0:
+            answer = self._nearest(key, self.embed(key[0]), now)
+            if answer is not None:
+                return answer
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _nearest(self, key: CacheKey, vector: np.ndarray, now: float) -> Optional[str]:
+        with self._lock:
+            if self._vectors is None:
+                return None
+            scores = self._vectors[: len(self._row_keys)] @ vector
+            rows = np.flatnonzero(scores >= self.similarity_threshold)
+            # Few rows clear the threshold; check them best first for one
+            # that shares the context and tone and has not expired.
+            for row in rows[top_k(scores[rows], len(rows))]:
+                other = self._row_keys[row]
+                if other is None or other[1:] != key[1:]:
+                    continue
+                entry = self._entries[other]
+                if entry.expires_at <= now:
+                    continue
+                self._entries.move_to_end(other)
+                self._stats["near_hits"] += 1
+                return entry.answer
+            return None
+
+    def put(
+        self, question: str, doc_ids: Sequence[str], tone: str, generation: int, answer: str
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self.key(question, doc_ids, tone)
+        vector = self.embed(key[0]) if self.similarity_threshold > 0 else None
+        with self._lock:
+            self._sync_generation(generation)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._release(previous)
+            while len(self._entries) >= self.max_entries:
+                self._release(self._entries.popitem(last=False)[1])
+                self._stats["evictions"] += 1
+            row = self._store_vector(key, vector) if vector is not None else -1
+            self._entries[key] = _Entry(answer, time.monotonic() + self.ttl_seconds, row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            data: Dict[str, object] = dict(self._stats)
+            data["entries"] = len(self._entries)
+        lookups = self._stats["hits"] + self._stats["near_hits"] + self._stats["misses"]
+        data["hit_rate"] = (
+            (self._stats["hits"] + self._stats["near_hits"]) / lookups if lookups else 0.0
+        )
+        return data
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls that share a key into one call.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight await the same result (or exception) instead of calling again.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._stats: Dict[str, int] = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats["coalesced"] += 1
+            # Shielded so a cancelled follower does not cancel the shared call.
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._stats["calls"] += 1
+        try:
+            result = await fn()
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                # Followers were not cancelled; hand them an ordinary failure.
+                exc = RuntimeError("Coalesced call was cancelled.")
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when there are no followers
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        data = dict(self._stats)
+        data["in_flight"] = len(self._inflight)
+        return data
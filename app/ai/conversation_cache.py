@@ -0,0 +1,89 @@
+"""In-process cache of each active sender's open conversation."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class CachedConversation:
+    user_id: int
+    conversation_id: int
+
+
+class ConversationCache:
+    """LRU + TTL map from ``messenger_id`` to the user's open conversation.
+
+    Lets :meth:`AutomationPipeline.ensure_conversation` skip the user and
+    conversation lookups for senders who are mid-chat. Entries must be
+    dropped whenever the conversation stops being open; callers still check
+    the row they load, so a stale entry costs a miss rather than a misfiled
+    message.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 900.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[CachedConversation, float]]" = OrderedDict()
+        self._by_conversation: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, messenger_id: str) -> Optional[CachedConversation]:
+        with self._lock:
+            item = self._entries.get(messenger_id)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    self._drop(messenger_id)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(messenger_id)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, messenger_id: str, user_id: int, conversation_id: int) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._drop(messenger_id)
+            entry = CachedConversation(user_id, conversation_id)
+            self._entries[messenger_id] = (entry, time.monotonic() + self.ttl_seconds)
+            self._by_conversation[conversation_id] = messenger_id
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, messenger_id: str) -> None:
+        with self._lock:
+            if self._drop(messenger_id):
+                self._stats["invalidations"] += 1
+
+    def invalidate_conversation(self, conversation_id: int) -> None:
+        with self._lock:
+            messenger_id = self._by_conversation.get(conversation_id)
+            if messenger_id is not None and self._drop(messenger_id):
+                self._stats["invalidations"] += 1
+
+    def _drop(self, messenger_id: str) -> bool:
+        item = self._entries.pop(messenger_id, None)
+        if item is None:
+            return False
+        self._by_conversation.pop(item[0].conversation_id, None)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_conversation.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            data: Dict[str, object] = dict(self._stats)
+            data["entries"] = len(self._entries)
+        lookups = self._stats["hits"] + self._stats["misses"]
+        data["hit_rate"] = self._stats["hits"] / lookups if lookups else 0.0
+        return data
@@ -0,0 +1,130 @@
+"""Persistent, content-addressed cache of document embeddings.
+
+Vectors are keyed on ``(embedding model, text hash)``: every model gets its
+own pair of append-only files under the cache directory,
+
+- ``<model>.keys``: uint64 blake2b hash of each cached text.
+- ``<model>.f32``: the matching float32 vectors, one row per key.
+
+Keys are appended before vectors, so the number of usable entries is the
+smaller of the two row counts and a torn append is simply ignored.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from hashlib import blake2b
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from . import storage
+
+KEYS_SUFFIX = ".keys"
+VECTOR_SUFFIX = ".f32"
+
+
+def text_key(text: str) -> int:
+    return int.from_bytes(blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class EmbeddingCache:
+    """Append-only on-disk map from text hash to embedding for one model."""
+
+    def __init__(self, directory: Path, model: str, dimension: int) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.model = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.dimension = dimension
+        self.keys_path = directory / f"{self.model}{KEYS_SUFFIX}"
+        self.vectors_path = directory / f"{self.model}{VECTOR_SUFFIX}"
+        self._rows: Dict[int, int] = {}
+        self._loaded = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _committed(self) -> int:
+        keys = self.keys_path.stat().st_size // 8 if self.keys_path.exists() else 0
+        vectors = (
+            self.vectors_path.stat().st_size // (4 * self.dimension)
+            if self.vectors_path.exists()
+            else 0
+        )
+        return min(keys, vectors)
+
+    def _refresh(self) -> int:
+        """Index entries appended (possibly by other processes) since the last call."""
+        committed = self._committed()
+        if committed > self._loaded:
+            keys = np.fromfile(self.keys_path, dtype=np.uint64, count=committed)
+            for row in range(self._loaded, committed):
+                self._rows.setdefault(int(keys[row]), row)
+            self._loaded = committed
+        return committed
+
+    def __len__(self) -> int:
+        return self._refresh()
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[np.ndarray, List[int]]:
+        """Return a ``(len(texts), dimension)`` matrix and the positions not cached."""
+        committed = self._refresh()
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        missing: List[int] = []
+        found: List[Tuple[int, int]] = []
+        for position, text in enumerate(texts):
+            row = self._rows.get(text_key(text))
+            if row is None:
+                missing.append(position)
+            else:
+                found.append((position, row))
+        if found:
+            matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(committed, self.dimension)
+            )
+            positions, rows = zip(*found)
+            vectors[list(positions)] = matrix[list(rows)]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return vectors, missing
+
+    def store(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Append embeddings for ``texts`` that are not cached yet."""
+        if not len(texts):
+            return
+        with storage.writer_lock(self.directory):
+            committed = self._refresh()
+            fresh: Dict[int, int] = {}
+            for position, text in enumerate(texts):
+                key = text_key(text)
+                if key not in self._rows:
+                    fresh.setdefault(key, position)
+            if not fresh:
+                return
+            keys = np.fromiter(fresh.keys(), dtype=np.uint64, count=len(fresh))
+            rows = np.asarray(vectors, dtype=np.float32)[list(fresh.values())]
+            for path, row_bytes, data in (
+                (self.keys_path, 8, keys.tobytes()),
+                (self.vectors_path, 4 * self.dimension, rows.tobytes()),
+            ):
+                with open(path, "ab") as handle:
+                    handle.truncate(committed * row_bytes)
+                    handle.write(data)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            self._refresh()
+
+    def embed(
+        self, texts: Sequence[str], compute: Callable[[Sequence[str]], np.ndarray]
+    ) -> np.ndarray:
+        """Return embeddings for ``texts``, calling ``compute`` only for uncached ones."""
+        vectors, missing = self.lookup(texts)
+        if missing:
+            computed = compute([texts[position] for position in missing])
+            vectors[missing] = computed
+            self.store([texts[position] for position in missing], computed)
+        return vectors
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": self._loaded, "hits": self.hits, "misses": self.misses}
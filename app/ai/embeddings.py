@@ -0,0 +1,198 @@
+"""Batched text embedders selectable through ``Settings.embedding_provider``.
+
+An :class:`Embedder` maps a batch of texts to a ``(len(texts), dimension)``
+float32 matrix of unit-length rows. Its ``name`` identifies the vector space:
+it namespaces the embedding cache and is recorded in the vector store
+manifest, so switching provider re-embeds the stored corpus rather than
+comparing vectors from two different models.
+
+Embedders are small picklable objects, so bulk ingestion can hand
+``embedder.embed`` straight to worker processes.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from hashlib import blake2b
+from typing import Dict, Sequence, Tuple, Type
+
+import numpy as np
+
+from .scoring import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[\W_]+")
+_SPACE, _SEPARATOR = 32, 0
+# Random odd 64-bit multipliers; arithmetic wraps modulo 2**64.
+_POSITION_WEIGHTS = (
+    np.random.default_rng(0x5EED).integers(0, 2**63, size=64, dtype=np.uint64) * np.uint64(2)
+    + np.uint64(1)
+)
+_WORD_SEED = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser: spreads every input bit over the whole word."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class Embedder:
+    """Batched embedding model; subclasses implement :meth:`embed`."""
+
+    name = "base"
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit-normalised float32 embeddings, one row per text."""
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(dimension={self.dimension})"
+
+
+class DigestEmbedder(Embedder):
+    """Legacy model: the blake2b digest of the whole text, repeated.
+
+    Deterministic but carries no similarity: two different texts get
+    unrelated vectors. Kept so stores built with it can still be opened
+    without re-embedding.
+    """
+
+    name = "blake2b"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        digests = b"".join(
+            blake2b(text.encode("utf-8"), digest_size=32).digest() for text in texts
+        )
+        values = np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), 32)
+        repeats = -(-self.dimension // 32)
+        vectors = np.tile(values, (1, repeats))[:, : self.dimension] / 255.0
+        return normalize_rows(vectors.reshape(len(texts), self.dimension))
+
+
+class HashedNgramEmbedder(Embedder):
+    """Feature-hashed words and their character n-grams (the "hashing trick").
+
+    Texts are lower-cased and runs of punctuation folded to a single space.
+    Every word, and every character n-gram of the space-padded word with a
+    length in ``ngram_range`` (as in fastText), is hashed to one of
+    ``dimension`` signed buckets; counts are damped with ``log1p`` and rows
+    L2-normalised. Cosine similarity then follows shared vocabulary, and the
+    n-grams keep inflections and typos ("return", "returns", "retrun") close
+    together. No training data or model files are needed.
+
+    The whole batch is hashed at once: texts are joined into one byte
+    buffer and every n-gram position is hashed with NumPy array arithmetic.
+    """
+
+    name = "hashed-ngram"
+
+    def __init__(
+        self,
+        dimension: int,
+        ngram_range: Tuple[int, int] = (3, 4),
+        word_weight: float = 1.0,
+    ) -> None:
+        super().__init__(dimension)
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not len(texts):
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        encoded = [
+            f" {_NON_WORD.sub(' ', text.lower()).strip()} ".encode("utf-8") for text in texts
+        ]
+        # A NUL after every text keeps n-grams and words from spanning two texts.
+        buffer = np.frombuffer(b"\0".join(encoded) + b"\0", dtype=np.uint8)
+        lengths = np.fromiter((len(item) + 1 for item in encoded), np.int64, len(encoded))
+        owner = np.repeat(np.arange(len(texts)), lengths)
+        rows, hashes, weights = self._ngrams(buffer, owner)
+        word_rows, word_hashes = self._words(buffer, owner)
+        rows = np.concatenate([rows, word_rows])
+        hashes = _mix(np.concatenate([hashes, word_hashes]))
+        weights = np.concatenate([weights, np.full(len(word_rows), self.word_weight)])
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+        buckets = (hashes % np.uint64(self.dimension)).astype(np.int64)
+        counts = np.bincount(
+            rows * self.dimension + buckets,
+            weights=signs * weights,
+            minlength=len(texts) * self.dimension,
+        ).reshape(len(texts), self.dimension)
+        return normalize_rows(np.sign(counts) * np.log1p(np.abs(counts)))
+
+    def _ngrams(
+        self, buffer: np.ndarray, owner: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        values = buffer.astype(np.uint64)
+        separators = np.concatenate([[0], np.cumsum(buffer == _SEPARATOR)])
+        spaces = np.concatenate([[0], np.cumsum(buffer == _SPACE)])
+        rows, hashes = [], []
+        low, high = self.ngram_range
+        for size in range(low, high + 1):
+            count = len(buffer) - size + 1
+            if count <= 0:
+                continue
+            hashed = np.full(count, size, dtype=np.uint64)
+            for offset in range(size):
+                hashed = hashed + values[offset : offset + count] * _POSITION_WEIGHTS[offset]
+            # No separator anywhere, and spaces only as the first or last byte.
+            valid = (separators[size : size + count] == separators[:count]) & (
+                spaces[size - 1 : size - 1 + count] == spaces[1 : 1 + count]
+            )
+            rows.append(owner[:count][valid])
+            hashes.append(hashed[valid])
+        if not rows:
+            return np.empty(0, np.int64), np.empty(0, np.uint64), np.empty(0)
+        rows_all = np.concatenate(rows)
+        return rows_all, np.concatenate(hashes), np.ones(len(rows_all))
+
+    @staticmethod
+    def _words(buffer: np.ndarray, owner: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        in_word = (buffer != _SPACE) & (buffer != _SEPARATOR)
+        first = in_word & ~np.concatenate([[False], in_word[:-1]])
+        starts = np.flatnonzero(first)
+        if not len(starts):
+            return np.empty(0, np.int64), np.empty(0, np.uint64)
+        positions = np.flatnonzero(in_word)
+        word_of = np.cumsum(first)[positions] - 1
+        offsets = (positions - starts[word_of]) % len(_POSITION_WEIGHTS)
+        terms = buffer[positions].astype(np.uint64) * _POSITION_WEIGHTS[offsets]
+        hashed = np.add.reduceat(terms, np.flatnonzero(first[positions])) + _WORD_SEED
+        return owner[starts], hashed
+
+
+DEFAULT_PROVIDER = "local"
+
+EMBEDDERS: Dict[str, Type[Embedder]] = {
+    DEFAULT_PROVIDER: HashedNgramEmbedder,
+    HashedNgramEmbedder.name: HashedNgramEmbedder,
+    DigestEmbedder.name: DigestEmbedder,
+}
+
+
+def create_embedder(provider: str, dimension: int) -> Embedder:
+    """Instantiate the embedder registered under ``provider``.
+
+    Unknown names, such as the ``openai`` value older configurations carry
+    (it was never implemented and silently used the digest), fall back to
+    the default model with a warning rather than failing startup.
+    """
+    factory = EMBEDDERS.get(provider.lower())
+    if factory is None:
+        logger.warning(
+            "Unknown EMBEDDING_PROVIDER %r (expected one of %s); using %r.",
+            provider,
+            sorted(EMBEDDERS),
+            DEFAULT_PROVIDER,
+        )
+        factory = EMBEDDERS[DEFAULT_PROVIDER]
+    return factory(dimension)
@@ -0,0 +1,329 @@
+"""BM25 inverted index over the vector store's snippets.
+
+Embeddings blur exact tokens such as SKUs, prices and place names; this index
+scores them with Okapi BM25 and only reads the posting lists of the query's
+terms, never the whole corpus. Metadata ``key=value`` pairs are indexed as
+extra (unscored) terms, so metadata filters resolve to row sets through the
+same posting lists.
+
+Terms are stored as uint64 hashes and rows are the store's global row
+numbers. On disk the index is a set of files next to the vector segments,
+sharing a ``lex-<generation>`` prefix:
+
+- ``<name>.terms.u64``: sorted term hashes of the base postings.
+- ``<name>.offsets.i64``: ``len(terms) + 1`` offsets into the posting arrays.
+- ``<name>.rows.u32`` / ``<name>.tf.u16``: row and term frequency per posting.
+- ``<name>.lengths.u32``: token count per row, append-only.
+- ``<name>.delta``: ``(term, row, tf)`` records of rows added since the base
+  was written, append-only.
+
+As with the IVF assignments, the manifest entry records how many rows and
+delta records are committed; bytes past those counts are ignored and
+truncated by the next writer. Compaction merges the delta into a new base.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .scoring import top_k
+
+TERMS_SUFFIX = ".terms.u64"
+OFFSETS_SUFFIX = ".offsets.i64"
+ROWS_SUFFIX = ".rows.u32"
+TF_SUFFIX = ".tf.u16"
+LENGTHS_SUFFIX = ".lengths.u32"
+DELTA_SUFFIX = ".delta"
+INDEX_SUFFIXES = (
+    TERMS_SUFFIX, OFFSETS_SUFFIX, ROWS_SUFFIX, TF_SUFFIX, LENGTHS_SUFFIX, DELTA_SUFFIX,
+)  # fmt: skip
+
+POSTING_DTYPE = np.dtype([("term", "<u8"), ("row", "<u4"), ("tf", "<u2")])
+
+_TOKEN = re.compile(r"[^\W_]+")
+# Query terms in more than this share of rows are dropped when rarer ones exist:
+# their IDF is close to zero but their posting lists are the longest.
+_COMMON_FRACTION = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased runs of letters and digits ("SKU-0042" -> ["sku", "0042"])."""
+    return _TOKEN.findall(text.lower())
+
+
+def term_key(term: str) -> int:
+    return int.from_bytes(blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def filter_key(key: str, value: Any) -> int:
+    """Hash of a metadata ``key=value`` term; the NUL prefix keeps it apart from words."""
+    return term_key(f"\0{key}={json.dumps(value, sort_keys=True)}")
+
+
+def _metadata_values(value: Any) -> Iterable[Any]:
+    return value if isinstance(value, (list, tuple, set)) else (value,)
+
+
+def matches(metadata: Mapping[str, Any], filters: Mapping[str, Any]) -> bool:
+    """Reference semantics of a filter: every key must match one accepted value.
+
+    A filter value may be a single value or a list of accepted values; list
+    valued metadata (e.g. tags) matches when any of its items is accepted.
+    """
+    for key, accepted in filters.items():
+        if key not in metadata:
+            return False
+        wanted = {json.dumps(item, sort_keys=True) for item in _metadata_values(accepted)}
+        stored = {json.dumps(item, sort_keys=True) for item in _metadata_values(metadata[key])}
+        if not wanted & stored:
+            return False
+    return True
+
+
+def document_postings(
+    texts: Sequence[str], metadatas: Sequence[Mapping[str, Any]], first_row: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Postings and token counts for texts stored at rows ``first_row, first_row + 1, ...``."""
+    keys: Dict[str, int] = {}
+    postings: List[Tuple[int, int, int]] = []
+    lengths = np.zeros(len(texts), dtype=np.uint32)
+    for offset, (text, metadata) in enumerate(zip(texts, metadatas)):
+        row = first_row + offset
+        tokens = tokenize(text)
+        lengths[offset] = len(tokens)
+        for token, tf in Counter(tokens).items():
+            key = keys.get(token)
+            if key is None:
+                key = keys[token] = term_key(token)
+            postings.append((key, row, min(tf, 0xFFFF)))
+        for name, value in metadata.items():
+            for item in _metadata_values(value):
+                postings.append((filter_key(name, item), row, 0))
+    return np.array(postings, dtype=POSTING_DTYPE), lengths
+
+
+def _write(path: Path, array: np.ndarray) -> None:
+    with open(path, "wb") as handle:
+        handle.write(np.ascontiguousarray(array).tobytes())
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _append(path: Path, committed_bytes: int, array: np.ndarray) -> None:
+    with open(path, "r+b") as handle:
+        handle.truncate(committed_bytes)
+        handle.seek(committed_bytes)
+        handle.write(np.ascontiguousarray(array).tobytes())
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def write_index(
+    storage_dir: Path, name: str, postings: np.ndarray, lengths: np.ndarray
+) -> Dict[str, Any]:
+    """Write ``postings`` as a new base with an empty delta; returns its manifest entry."""
+    postings = postings[np.lexsort((postings["row"], postings["term"]))]
+    terms, starts = np.unique(postings["term"], return_index=True)
+    for suffix, array in (
+        (TERMS_SUFFIX, terms.astype(np.uint64)),
+        (OFFSETS_SUFFIX, np.append(starts, len(postings)).astype(np.int64)),
+        (ROWS_SUFFIX, postings["row"]),
+        (TF_SUFFIX, postings["tf"]),
+        (LENGTHS_SUFFIX, np.asarray(lengths, dtype=np.uint32)),
+        (DELTA_SUFFIX, np.empty(0, POSTING_DTYPE)),
+    ):
+        _write(storage_dir / f"{name}{suffix}", array)
+    return {
+        "name": name,
+        "rows": int(len(lengths)),
+        "terms": int(len(terms)),
+        "postings": int(len(postings)),
+        "delta": 0,
+    }
+
+
+def append_postings(
+    storage_dir: Path, entry: Dict[str, Any], postings: np.ndarray, lengths: np.ndarray
+) -> None:
+    """Append freshly stored rows to the delta and update ``entry`` in place."""
+    name = entry["name"]
+    _append(
+        storage_dir / f"{name}{DELTA_SUFFIX}", entry["delta"] * POSTING_DTYPE.itemsize, postings
+    )
+    _append(
+        storage_dir / f"{name}{LENGTHS_SUFFIX}", entry["rows"] * 4, lengths.astype(np.uint32)
+    )
+    entry["delta"] += int(len(postings))
+    entry["rows"] += int(len(lengths))
+
+
+def merge_index(
+    storage_dir: Path, entry: Dict[str, Any], name: str, keep: np.ndarray
+) -> Dict[str, Any]:
+    """Fold the delta into a new base, dropping rows not in ``keep`` and renumbering the rest.
+
+    ``keep`` is the boolean row mask used by segment compaction, so row
+    numbers stay aligned with the compacted vectors without re-tokenising.
+    """
+    index = LexicalIndex(storage_dir, entry)
+    postings = index.postings()
+    postings = postings[keep[postings["row"]]]
+    postings["row"] = (np.cumsum(keep) - 1)[postings["row"]]
+    return write_index(storage_dir, name, postings, np.asarray(index.lengths)[keep])
+
+
+def remove_index_files(storage_dir: Path, keep: Iterable[str] = ()) -> None:
+    """Delete lexical index files whose name is not listed in ``keep``."""
+    keep = set(keep)
+    for path in storage_dir.glob(f"*{TERMS_SUFFIX}"):
+        name = path.name[: -len(TERMS_SUFFIX)]
+        if name in keep:
+            continue
+        for suffix in INDEX_SUFFIXES:
+            target = storage_dir / f"{name}{suffix}"
+            if target.exists():
+                target.unlink()
+
+
+def _map(path: Path, dtype: Any, count: int) -> np.ndarray:
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], k: int = 60) -> np.ndarray:
+    """Merge best-first row rankings; a row at rank ``r`` (from 1) earns ``1 / (k + r)``.
+
+    Returns rows by descending fused score. Ties go to the row with the best
+    single rank, then to the earlier ranking. ``-1`` padding is ignored.
+    """
+    rows, weights, order = [], [], []
+    for position, ranking in enumerate(rankings):
+        ranking = np.asarray(ranking, dtype=np.int64)
+        ranking = ranking[ranking >= 0]
+        ranks = np.arange(1, len(ranking) + 1)
+        rows.append(ranking)
+        weights.append(1.0 / (k + ranks))
+        order.append(ranks * len(rankings) + position)
+    if not sum(len(ranking) for ranking in rows):
+        return np.empty(0, dtype=np.int64)
+    unique, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate(weights))
+    best = np.full(len(unique), np.iinfo(np.int64).max)
+    np.minimum.at(best, inverse, np.concatenate(order))
+    return unique[np.lexsort((best, -totals))]
+
+
+class LexicalIndex:
+    """Read-only view of one committed lexical index (base plus delta)."""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, storage_dir: Path, entry: Dict[str, Any]) -> None:
+        name = entry["name"]
+        self.count = entry["rows"]
+        self.terms = _map(storage_dir / f"{name}{TERMS_SUFFIX}", np.uint64, entry["terms"])
+        self.offsets = _map(
+            storage_dir / f"{name}{OFFSETS_SUFFIX}", np.int64, entry["terms"] + 1
+        )
+        self.rows = _map(storage_dir / f"{name}{ROWS_SUFFIX}", np.uint32, entry["postings"])
+        self.tf = _map(storage_dir / f"{name}{TF_SUFFIX}", np.uint16, entry["postings"])
+        self.lengths = _map(storage_dir / f"{name}{LENGTHS_SUFFIX}", np.uint32, self.count)
+        delta = np.fromfile(
+            storage_dir / f"{name}{DELTA_SUFFIX}", dtype=POSTING_DTYPE, count=entry["delta"]
+        )
+        # The delta is bounded by compaction, so sorting it once per reload is cheap.
+        self.delta = delta[np.argsort(delta["term"], kind="stable")]
+        self._delta_terms = np.ascontiguousarray(self.delta["term"])
+        self.average_length = float(np.mean(self.lengths)) if self.count else 0.0
+
+    def postings(self) -> np.ndarray:
+        """Every posting (base and delta) as a ``POSTING_DTYPE`` array."""
+        base = np.empty(len(self.rows), dtype=POSTING_DTYPE)
+        base["term"] = np.repeat(np.asarray(self.terms), np.diff(self.offsets))
+        base["row"] = self.rows
+        base["tf"] = self.tf
+        return np.concatenate([base, self.delta])
+
+    def lookup(self, key: int) -> Tuple[np.ndarray, np.ndarray]:
+        """``(rows, tf)`` of the posting list for term hash ``key``."""
+        key = np.uint64(key)
+        rows, tfs = [], []
+        slot = int(np.searchsorted(self.terms, key))
+        if slot < len(self.terms) and self.terms[slot] == key:
+            start, end = int(self.offsets[slot]), int(self.offsets[slot + 1])
+            rows.append(self.rows[start:end])
+            tfs.append(self.tf[start:end])
+        low = int(np.searchsorted(self._delta_terms, key, side="left"))
+        high = int(np.searchsorted(self._delta_terms, key, side="right"))
+        if high > low:
+            rows.append(self.delta["row"][low:high])
+            tfs.append(self.delta["tf"][low:high])
+        if not rows:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        return (
+            np.concatenate(rows).astype(np.int64),
+            np.concatenate(tfs).astype(np.float32),
+        )
+
+    def filter_rows(self, filters: Mapping[str, Any]) -> np.ndarray:
+        """Sorted rows whose metadata satisfies :func:`matches` for ``filters``."""
+        selected: Optional[np.ndarray] = None
+        for key, accepted in filters.items():
+            found = [self.lookup(filter_key(key, value))[0] for value in _metadata_values(accepted)]
+            rows = np.unique(np.concatenate([np.empty(0, np.int64)] + found))
+            selected = rows if selected is None else np.intersect1d(selected, rows, True)
+            if not len(selected):
+                break
+        return np.empty(0, np.int64) if selected is None else selected
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` rows by BM25 for ``query`` as ``(scores, rows)``, best first.
+
+        Only rows in ``allowed`` (sorted) are considered when it is given; rows
+        in ``exclude`` (tombstones) never are. Rows matching no query term are
+        not returned, so fewer than ``k`` may come back.
+        """
+        lists = [self.lookup(term_key(token)) for token in set(tokenize(query))]
+        lists = [(rows, tf) for rows, tf in lists if len(rows)]
+        if not lists or not self.count:
+            return np.empty(0, np.float32), np.empty(0, np.int64)
+        rare = [item for item in lists if len(item[0]) <= _COMMON_FRACTION * self.count]
+        if rare:
+            lists = rare
+        all_rows, all_scores = [], []
+        norm = self.k1 / max(self.average_length, 1e-9)
+        for rows, tf in lists:
+            frequency = len(rows)
+            idf = math.log(1.0 + (self.count - frequency + 0.5) / (frequency + 0.5))
+            lengths = np.asarray(self.lengths[rows], dtype=np.float32)
+            denominator = tf + self.k1 * (1.0 - self.b) + self.b * norm * lengths
+            all_rows.append(rows)
+            all_scores.append(idf * tf * (self.k1 + 1.0) / denominator)
+        rows = np.concatenate(all_rows)
+        scores = np.concatenate(all_scores)
+        keep = np.ones(len(rows), dtype=bool)
+        if allowed is not None:
+            keep &= np.isin(rows, allowed)
+        if exclude is not None and len(exclude):
+            keep &= ~np.isin(rows, exclude)
+        unique, inverse = np.unique(rows[keep], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[keep]).astype(np.float32)
+        best = top_k(totals, k)
+        return totals[best], unique[best]
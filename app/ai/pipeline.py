@@ -2,15 +2,85 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..config import Settings, get_settings
 from ..models import Conversation, EscalationTicket, MessageLog, User
+from ..observability.metrics import REGISTRY
+from ..observability.tracing import tracer
+from .answer_cache import AnswerCache, SingleFlight
+from .conversation_cache import ConversationCache
 from .vector_store import LocalVectorStore, VectorDocument
-from .xai_client import XAIClient
+from .xai_client import SentenceBuffer, XAIClient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+AnySession = Union[Session, AsyncSession]
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "pipeline_stage_seconds",
+    "Time spent in each reply stage (drafting includes its retrieval).",
+    ("stage",),
+)
+REPLIES = REGISTRY.counter(
+    "pipeline_replies_total", "Replies drafted, by the route that produced them.", ("route",)
+)
+REGISTRY.gauge(
+    "pipeline_fallback_ratio",
+    "Share of questions answered by the local fallback instead of xAI.",
+    lambda: REPLIES.value(route="fallback")
+    / max(1.0, REPLIES.value(route="fallback") + REPLIES.value(route="xai")),
+)
+
+
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    with tracer.span(f"pipeline.{name}"), STAGE_SECONDS.time(stage=name):
+        yield
+
+
+# Session.info key for conversation-cache entries waiting on the transaction.
+_PENDING_CONVERSATIONS = "pending_conversations"
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_conversations(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint; the outer transaction may still roll back
+    for cache, messenger_id, user_id, conversation_id in session.info.pop(
+        _PENDING_CONVERSATIONS, ()
+    ):
+        cache.put(messenger_id, user_id, conversation_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_conversations(session: Session) -> None:
+    if not session.in_nested_transaction():
+        session.info.pop(_PENDING_CONVERSATIONS, None)
 
 
 @dataclass
@@ -21,6 +91,51 @@ class DraftResponse:
     answer: str
     confidence: float
     citations: List[dict]
+    # Length of the prefix of ``answer`` already sent to the customer.
+    delivered_chars: int = 0
+    # How the answer was produced: greeting, local, xai or fallback.
+    route: str = "local"
+
+    @property
+    def undelivered(self) -> str:
+        return self.answer[self.delivered_chars :].strip()
+
+
+class EarlyDelivery:
+    """Sends replies to one recipient while the batch is still being processed.
+
+    Every reply for the recipient goes through it so they arrive in order.
+    After the first failed send it stops, leaving the rest of the replies to
+    the caller's regular (queued) delivery.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Any]],
+        typing: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> None:
+        self.send = send
+        self.typing = typing
+        self.failed = False
+
+    async def typing_on(self) -> None:
+        if self.typing is None or self.failed:
+            return
+        try:
+            await self.typing()
+        except Exception as exc:
+            logger.info("Typing indicator not sent: %s", exc)
+
+    async def __call__(self, text: str) -> bool:
+        if self.failed or not text.strip():
+            return False
+        try:
+            await self.send(text.strip())
+        except Exception as exc:
+            logger.warning("Early delivery failed, deferring to the send queue: %s", exc)
+            self.failed = True
+            return False
+        return True
 
 
 class AutomationPipeline:
@@ -31,31 +146,78 @@ class AutomationPipeline:
         vector_store: Optional[LocalVectorStore] = None,
         settings: Optional[Settings] = None,
         xai_client: Optional[XAIClient] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        conversation_cache: Optional[ConversationCache] = None,
     ) -> None:
         self.settings = settings or get_settings()
         self.vector_store = vector_store or LocalVectorStore(self.settings.chroma_path)
-        self.xai_client = xai_client or XAIClient()
+        self.xai_client = xai_client or XAIClient(settings=self.settings)
+        self.answer_cache = answer_cache or AnswerCache(
+            max_entries=self.settings.answer_cache_size,
+            ttl_seconds=self.settings.answer_cache_ttl_seconds,
+            similarity_threshold=self.settings.answer_cache_similarity,
+            embed=self.vector_store.embed_query,
+        )
+        # Identical questions already in flight share one upstream call.
+        self.inflight = SingleFlight()
+        self.conversations = conversation_cache or ConversationCache(
+            max_entries=self.settings.conversation_cache_size,
+            ttl_seconds=self.settings.conversation_cache_ttl_seconds,
+        )
+
+    async def run_db(
+        self, session: AnySession, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run a sync ORM helper such as :meth:`escalate` on either session type.
+
+        ``fn`` is called as ``fn(sync_session, *args, **kwargs)``. On an
+        ``AsyncSession`` it runs through ``run_sync``, so driver I/O is awaited
+        instead of blocking the event loop; calls sharing the session are
+        serialised, as an ``AsyncSession`` allows one operation at a time.
+        """
+        if not isinstance(session, AsyncSession):
+            return fn(session, *args, **kwargs)
+        lock = session.info.setdefault("pipeline_lock", asyncio.Lock())
+        async with lock:
+            return await session.run_sync(fn, *args, **kwargs)
 
     def ensure_conversation(
         self, session: Session, messenger_id: str, incoming_text: str
     ) -> Conversation:
-        """Fetch or create a conversation for the sender."""
-        user = session.query(User).filter_by(messenger_id=messenger_id).one_or_none()
-        if not user:
-            user = User(messenger_id=messenger_id, display_name=None)
-            session.add(user)
-            session.flush()
-
-        conversation = (
-            session.query(Conversation)
-            .filter_by(user_id=user.id, status="open")
-            .order_by(Conversation.updated_at.desc())
-            .first()
-        )
-        if not conversation:
-            conversation = Conversation(user_id=user.id, status="open")
-            session.add(conversation)
-            session.flush()
+        """Fetch or create a conversation for the sender.
+
+        Senders seen recently resolve through :attr:`conversations` to a
+        primary-key load (free when the session already holds the row). A
+        looked-up or new conversation is only cached once ``session``
+        commits, so a rolled-back conversation id never reaches the cache.
+        """
+        conversation = None
+        cached = self.conversations.get(messenger_id)
+        if cached is not None:
+            conversation = session.get(Conversation, cached.conversation_id)
+            if (
+                conversation is None
+                or conversation.user_id != cached.user_id
+                or conversation.status != "open"
+            ):
+                self.conversations.invalidate(messenger_id)
+                conversation = None
+
+        if conversation is None:
+            user_id = self._upsert_user(session, messenger_id)
+            conversation = (
+                session.query(Conversation)
+                .filter_by(user_id=user_id, status="open")
+                .order_by(Conversation.updated_at.desc())
+                .first()
+            )
+            if not conversation:
+                conversation = Conversation(user_id=user_id, status="open")
+                session.add(conversation)
+                session.flush()
+            session.info.setdefault(_PENDING_CONVERSATIONS, []).append(
+                (self.conversations, messenger_id, user_id, conversation.id)
+            )
 
         session.add(
             MessageLog(
@@ -68,11 +230,138 @@ class AutomationPipeline:
         conversation.last_message_preview = incoming_text[:500]
         return conversation
 
+    @staticmethod
+    def _upsert_user(session: Session, messenger_id: str) -> int:
+        """Return the user id for ``messenger_id``, inserting the user if needed.
+
+        The insert is ``ON CONFLICT DO NOTHING`` so concurrent first messages
+        from one sender cannot fail on the unique ``messenger_id``.
+        """
+        lookup = select(User.id).where(User.messenger_id == messenger_id)
+        user_id = session.execute(lookup).scalar_one_or_none()
+        if user_id is not None:
+            return user_id
+        values = {"messenger_id": messenger_id, "display_name": None}
+        dialect = session.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            module = postgresql if dialect == "postgresql" else sqlite
+            statement = (
+                module.insert(User)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=[User.messenger_id])
+            )
+            session.execute(statement)
+        else:
+            try:
+                with session.begin_nested():
+                    session.execute(insert(User).values(**values))
+            except IntegrityError:
+                pass  # another writer created the user first
+        return session.execute(lookup).scalar_one()
+
+    async def respond_many(
+        self,
+        session: AnySession,
+        messages_by_sender: Mapping[str, Sequence[str]],
+        deliveries: Optional[Mapping[str, EarlyDelivery]] = None,
+        replayed: Optional[Mapping[str, Sequence[Optional[DraftResponse]]]] = None,
+        on_delivered: Optional[Callable[[str, int, DraftResponse], Awaitable[Any]]] = None,
+    ) -> Dict[str, List[DraftResponse]]:
+        """Reply to a batch of messages, sender by sender, each in order.
+
+        Webhook jobs carry a single sender, so this normally drafts one
+        sender's messages. Senders are no longer fanned out within a job:
+        splitting batches into per-sender jobs lets the worker pool run
+        senders in parallel and retry each on its own, where a shared batch
+        commit made one slow or failing sender hold back (and replay) the
+        rest. Jobs queued before that split are still answered, one sender
+        after another.
+
+        The database is only touched once every reply is drafted: the whole
+        batch is then written through ``session`` in one step and left for
+        the caller to commit, so no write transaction (on SQLite, no database
+        lock) stays open while waiting on xAI.
+
+        Replies sent early through ``deliveries`` reach the customer before
+        that write. ``on_delivered(sender, index, draft)`` is awaited after
+        each one so the caller can remember it; on a retry, ``replayed``
+        hands those drafts back (``None`` for messages still to answer) and
+        they are logged again but neither redrafted nor resent.
+        """
+        deliveries = deliveries or {}
+        replayed = replayed or {}
+        drafts: Dict[str, List[DraftResponse]] = {}
+        for messenger_id, texts in messages_by_sender.items():
+            delivery = deliveries.get(messenger_id)
+            previous = replayed.get(messenger_id) or []
+            sender_drafts = drafts[messenger_id] = []
+            for index, text in enumerate(texts):
+                draft = previous[index] if index < len(previous) else None
+                if draft is None:
+                    draft = await self.draft(text, delivery)
+                    if draft.delivered_chars and on_delivered is not None:
+                        await on_delivered(messenger_id, index, draft)
+                sender_drafts.append(draft)
+
+        def record_batch(sync_session: Session) -> None:
+            for sender, texts in messages_by_sender.items():
+                for text, draft in zip(texts, drafts[sender]):
+                    self.record_exchange(sync_session, sender, text, draft)
+
+        await self.run_db(session, record_batch)
+        return drafts
+
+    async def draft(
+        self, message_text: str, delivery: Optional[EarlyDelivery] = None
+    ) -> DraftResponse:
+        """Produce (and with ``delivery``, send) a reply without touching the database."""
+        normalized = message_text.strip().lower()
+        greeting_tokens = ("hello", "hi", "hey", "good morning", "good afternoon")
+
+        with _stage("drafting"):
+            if any(normalized.startswith(token) for token in greeting_tokens):
+                draft = DraftResponse(
+                    conversation_id=-1,
+                    answer="Ask me a question.",
+                    confidence=0.4,
+                    citations=[],
+                    route="greeting",
+                )
+            elif message_text.strip().endswith("?"):
+                if delivery is not None and self.settings.xai_streaming:
+                    draft = await self.stream_answer_via_xai(message_text, delivery)
+                else:
+                    draft = await self.answer_question_via_xai(message_text)
+            else:
+                draft = await asyncio.to_thread(self.draft_reply, message_text)
+        REPLIES.inc(route=draft.route)
+
+        if delivery is not None and draft.undelivered and await delivery(draft.undelivered):
+            draft.delivered_chars = len(draft.answer)
+        return draft
+
+    def record_exchange(
+        self, session: Session, messenger_id: str, message_text: str, draft: DraftResponse
+    ) -> Conversation:
+        """Log an incoming message and its drafted reply; sets ``draft.conversation_id``."""
+        with _stage("ensure_conversation"):
+            conversation = self.ensure_conversation(session, messenger_id, message_text)
+        draft.conversation_id = conversation.id
+        with _stage("record_assistant_reply"):
+            self.record_assistant_reply(session, conversation, draft)
+        return conversation
+
+    def retrieve(self, message: str) -> List[VectorDocument]:
+        """Knowledge snippets for ``message`` according to ``Settings.retrieval_mode``."""
+        limit = self.settings.max_context_snippets
+        with _stage("retrieval"):
+            if self.settings.retrieval_mode == "vector":
+                return self.vector_store.similarity_search(message, limit=limit)
+            return self.vector_store.hybrid_search(message, limit=limit)
+
     def draft_reply(self, message: str, conversation_id: Optional[int] = None) -> DraftResponse:
         """Simulate retrieval + drafting for a Messenger reply."""
-        contexts = self.vector_store.similarity_search(
-            message, limit=self.settings.max_context_snippets
-        )
+        contexts = self.retrieve(message)
         confidence = 0.35 + 0.1 * len(contexts)
         answer = self._call_llm(message, contexts)
         citations = [
@@ -99,31 +388,130 @@ class AutomationPipeline:
     async def answer_question_via_xai(
         self, message: str, conversation_id: Optional[int] = None
     ) -> DraftResponse:
-        contexts = self.vector_store.similarity_search(
-            message, limit=self.settings.max_context_snippets
-        )
+        # Search and query embedding are CPU-bound; keep them off the event loop.
+        contexts = await asyncio.to_thread(self.retrieve, message)
         citations = [
             {"doc_id": ctx.doc_id, "metadata": ctx.metadata} for ctx in contexts
         ]
-        try:
-            if not self.xai_client.is_configured:
-                raise RuntimeError("XAI client not configured")
-            tone = self.settings.answer_tone[0] if self.settings.answer_tone else "concise"
-            answer = await self.xai_client.generate_answer(
-                question=message, contexts=contexts, tone=tone
-            )
+        tone = self.settings.answer_tone[0] if self.settings.answer_tone else "concise"
+        doc_ids = [ctx.doc_id for ctx in contexts]
+        generation = self.vector_store.generation()
+        answer = self.answer_cache.get(message, doc_ids, tone, generation)
+        route = "xai"
+        if answer is not None:
             confidence = 0.85
-        except Exception:
-            answer = self._call_llm(message, contexts)
-            confidence = 0.5
+        else:
+
+            async def generate() -> str:
+                answer = await self.xai_client.generate_answer(
+                    question=message, contexts=contexts, tone=tone
+                )
+                self.answer_cache.put(message, doc_ids, tone, generation, answer)
+                return answer
+
+            try:
+                if not self.xai_client.is_configured:
+                    raise RuntimeError("XAI client not configured")
+                # Keys are namespaced by call type: a completion returns the
+                # answer, a stream returns ``(answer, complete)``.
+                answer = await self.inflight.do(
+                    ("complete", AnswerCache.key(message, doc_ids, tone)), generate
+                )
+                confidence = 0.85
+            except Exception:
+                answer = self._call_llm(message, contexts)
+                confidence = 0.5
+                route = "fallback"
 
         return DraftResponse(
             conversation_id=conversation_id or -1,
             answer=answer,
             confidence=confidence,
             citations=citations,
+            route=route,
         )
 
+    async def stream_answer_via_xai(
+        self,
+        message: str,
+        delivery: EarlyDelivery,
+        conversation_id: Optional[int] = None,
+    ) -> DraftResponse:
+        """Answer via the xAI stream, sending the opening sentences early.
+
+        The typing indicator goes out before retrieval. Once complete
+        sentences totalling ``Settings.xai_stream_first_chars`` have streamed
+        in they are delivered; the remainder is left for :meth:`draft`.
+        """
+        await delivery.typing_on()
+        contexts = await asyncio.to_thread(self.retrieve, message)
+        citations = [
+            {"doc_id": ctx.doc_id, "metadata": ctx.metadata} for ctx in contexts
+        ]
+        tone = self.settings.answer_tone[0] if self.settings.answer_tone else "concise"
+        doc_ids = [ctx.doc_id for ctx in contexts]
+        generation = self.vector_store.generation()
+        draft = DraftResponse(
+            conversation_id=conversation_id or -1,
+            answer="",
+            confidence=0.85,
+            citations=citations,
+            route="xai",
+        )
+        cached = self.answer_cache.get(message, doc_ids, tone, generation)
+        if cached is not None:
+            draft.answer = cached
+            return draft
+
+        sentences = SentenceBuffer()
+        opening = ""
+        early_sent = False
+
+        async def stream() -> Tuple[str, bool]:
+            # Runs only for the first of concurrent identical questions; the
+            # others receive the finished text without early delivery.
+            nonlocal opening, early_sent
+            parts: List[str] = []
+            try:
+                with tracer.span("xai.stream"):
+                    async for delta in self.xai_client.stream_answer(
+                        question=message, contexts=contexts, tone=tone
+                    ):
+                        parts.append(delta)
+                        if early_sent or delivery.failed:
+                            continue
+                        opening += "".join(sentences.feed(delta))
+                        if len(opening) >= self.settings.xai_stream_first_chars:
+                            early_sent = await delivery(opening)
+            except Exception:
+                if not early_sent:
+                    raise
+                # The opening is already with the customer; keep what streamed.
+                return "".join(parts), False
+            answer = "".join(parts)
+            self.answer_cache.put(message, doc_ids, tone, generation, answer.strip())
+            return answer, True
+
+        try:
+            if not self.xai_client.is_configured:
+                raise RuntimeError("XAI client not configured")
+            raw, complete = await self.inflight.do(
+                ("stream", AnswerCache.key(message, doc_ids, tone)), stream
+            )
+        except Exception as exc:
+            logger.info("Streaming answer failed, using local draft: %s", exc)
+            draft.answer = self._call_llm(message, contexts)
+            draft.confidence = 0.5
+            draft.route = "fallback"
+            return draft
+        draft.answer = raw.strip()
+        if not complete:
+            draft.confidence = 0.5
+        if early_sent:
+            leading = len(raw) - len(raw.lstrip())
+            draft.delivered_chars = max(0, len(opening) - leading)
+        return draft
+
     def record_assistant_reply(
         self, session: Session, conversation: Conversation, draft: DraftResponse
     ) -> None:
@@ -151,6 +539,13 @@ class AutomationPipeline:
             payload=payload or {},
         )
         conversation.status = "escalated"
+        self.conversations.invalidate_conversation(conversation.id)
         session.add(ticket)
         session.flush()
         return ticket
+
+    def close_conversation(self, session: Session, conversation: Conversation) -> None:
+        """Close a conversation; the sender's next message opens a new one."""
+        conversation.status = "closed"
+        self.conversations.invalidate_conversation(conversation.id)
+        session.flush()
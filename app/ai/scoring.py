@@ -0,0 +1,111 @@
+"""Vectorised cosine scoring and top-k selection over the vector matrix."""
+
+from __future__ import annotations
+
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of ``matrix`` with unit-length rows (zero rows stay zero)."""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores along the last axis, best first.
+
+    Uses ``argpartition`` so only the selected ``k`` entries are sorted.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    picked = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-picked, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+class StackedMatrix:
+    """Read-only row concatenation of several matrices, without copying them.
+
+    Lets the base and write-ahead segments be addressed by global row number
+    while each stays memory-mapped on its own.
+    """
+
+    def __init__(self, blocks: Sequence[np.ndarray], dimension: int) -> None:
+        self.blocks = [block for block in blocks if len(block)]
+        self.dimension = dimension
+        self.starts = np.cumsum([0] + [len(block) for block in self.blocks])
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return int(self.starts[-1]), self.dimension
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+    def __getitem__(self, key: Union[slice, np.ndarray]) -> np.ndarray:
+        if isinstance(key, slice):
+            key = np.arange(*key.indices(len(self)))
+        rows = np.asarray(key, dtype=np.int64)
+        out = np.empty((len(rows), self.dimension), dtype=np.float32)
+        owners = np.searchsorted(self.starts, rows, side="right") - 1
+        for position, block in enumerate(self.blocks):
+            mask = owners == position
+            if mask.any():
+                out[mask] = block[rows[mask] - self.starts[position]]
+        return out
+
+
+class FlatIndex:
+    """Exact brute-force scorer over a matrix of pre-normalised vectors.
+
+    ``vectors`` is used as-is (typically a read-only memory map or a
+    :class:`StackedMatrix` of them), so building the index costs nothing and
+    scoring a batch of queries is one matrix product per block.
+    """
+
+    def __init__(self, vectors: Union[np.ndarray, StackedMatrix]) -> None:
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def search(
+        self, queries: np.ndarray, k: int, exclude: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Score ``queries`` (shape ``(m, d)``) and return ``(scores, rows)``, each ``(m, k)``.
+
+        Rows listed in ``exclude`` (tombstones) are never returned; slots that
+        cannot be filled hold row ``-1``.
+        """
+        queries = normalize_rows(queries)
+        exclude = np.empty(0, np.int64) if exclude is None else np.asarray(exclude, np.int64)
+        if not len(self):
+            empty = np.empty((queries.shape[0], 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        if isinstance(self.vectors, StackedMatrix):
+            blocks = list(zip(self.vectors.blocks, self.vectors.starts))
+        else:
+            blocks = [(self.vectors, 0)]
+        best_scores, best_rows = [], []
+        for block, start in blocks:
+            scores = queries @ block.T
+            hidden = exclude[(exclude >= start) & (exclude < start + len(block))] - start
+            scores[:, hidden] = -np.inf
+            rows = top_k(scores, k)
+            best_scores.append(np.take_along_axis(scores, rows, axis=-1))
+            best_rows.append(rows + start)
+        scores, rows = np.concatenate(best_scores, axis=1), np.concatenate(best_rows, axis=1)
+        picked = top_k(scores, k)
+        scores = np.take_along_axis(scores, picked, axis=-1)
+        rows = np.take_along_axis(rows, picked, axis=-1)
+        rows[np.isneginf(scores)] = -1
+        return scores, rows
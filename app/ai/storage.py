@@ -0,0 +1,395 @@
+"""Binary, memory-mapped segment storage backing the local vector store.
+
+A store directory holds a small ``manifest.json`` plus a list of segments.
+Each segment is made of four files sharing a name prefix:
+
+- ``<name>.f32``: contiguous float32 matrix of shape ``(count, dimension)``.
+- ``<name>.ids``: uint64 content hash per row (the hex ``doc_id``).
+- ``<name>.jsonl``: one JSON record per row holding ``doc_id``/``text``/``metadata``.
+- ``<name>.idx``: int64 byte offsets into the sidecar, ``count + 1`` entries.
+
+Vectors, offsets and sidecars are memory-mapped read-only, so searches never
+parse JSON they do not return and every worker process shares the same
+page-cache pages. An open mapping stays readable after its files are unlinked,
+so compaction deletes the previous generation as soon as the new manifest is
+durable; a reader that has not opened it yet reloads the newer manifest.
+
+Writes are append-only. The last segment is a write-ahead segment
+(``"kind": "wal"``) whose files grow in place; every other segment is an
+immutable base. A write appends rows past the committed count, fsyncs, then
+atomically replaces the manifest, which is the single commit point. Bytes
+past the committed count (left by a killed writer) are invisible to readers
+and truncated by the next writer. Replaced rows are tombstoned by listing
+their global row number under ``"deleted"`` in the manifest. Compaction folds
+the WAL into a fresh base and drops tombstoned rows.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .scoring import StackedMatrix, normalize_rows
+
+try:  # pragma: no cover - platform specific
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "LOCK"
+LEGACY_STORE_NAME = "store.json"
+
+VECTOR_SUFFIX = ".f32"
+IDS_SUFFIX = ".ids"
+SIDECAR_SUFFIX = ".jsonl"
+OFFSETS_SUFFIX = ".idx"
+SEGMENT_SUFFIXES = (VECTOR_SUFFIX, IDS_SUFFIX, SIDECAR_SUFFIX, OFFSETS_SUFFIX)
+
+_process_locks: Dict[Path, threading.Lock] = {}
+_process_locks_guard = threading.Lock()
+
+
+def doc_key(doc_id: str) -> int:
+    """Map a hex ``doc_id`` onto the uint64 stored in the ``.ids`` file."""
+    try:
+        return int(doc_id, 16) & 0xFFFFFFFFFFFFFFFF
+    except ValueError:
+        return int.from_bytes(blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` via a fsynced temp file and ``os.replace``."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def sync_directory(storage_dir: Path) -> None:
+    """fsync ``storage_dir`` so a preceding ``os.replace`` survives a crash."""
+    if not hasattr(os, "O_DIRECTORY"):  # pragma: no cover - Windows
+        return
+    descriptor = os.open(storage_dir, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+@contextmanager
+def writer_lock(storage_dir: Path) -> Iterator[None]:
+    """Serialise writers across threads and worker processes sharing ``storage_dir``."""
+    key = storage_dir.resolve()
+    with _process_locks_guard:
+        thread_lock = _process_locks.setdefault(key, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(storage_dir / LOCK_NAME, "a+b") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def read_manifest(storage_dir: Path) -> Optional[Dict[str, Any]]:
+    """Return the parsed manifest, or ``None`` when the store is uninitialised."""
+    path = storage_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_manifest(storage_dir: Path, manifest: Dict[str, Any]) -> None:
+    """Atomically publish a new manifest; this is the commit point of every write."""
+    atomic_write_bytes(
+        storage_dir / MANIFEST_NAME,
+        json.dumps(manifest, sort_keys=True).encode("utf-8"),
+    )
+
+
+def empty_manifest(dimension: int) -> Dict[str, Any]:
+    return {
+        "format": FORMAT_VERSION,
+        "dimension": dimension,
+        "generation": 0,
+        "normalized": True,
+        "segments": [],
+        "deleted": [],
+    }
+
+
+def encode_record(doc_id: str, text: str, metadata: dict) -> bytes:
+    record = {"doc_id": doc_id, "text": text, "metadata": metadata}
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _append_bytes(path: Path, committed_bytes: int, data: bytes) -> None:
+    with open(path, "r+b" if path.exists() else "w+b") as handle:
+        handle.truncate(committed_bytes)
+        handle.seek(committed_bytes)
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def write_segment(
+    storage_dir: Path,
+    name: str,
+    doc_ids: Sequence[str],
+    texts: Sequence[str],
+    metadatas: Sequence[dict],
+    vectors: np.ndarray,
+    dimension: int,
+    kind: str = "base",
+) -> Dict[str, Any]:
+    """Write a complete segment to disk and return its manifest entry."""
+    for suffix in SEGMENT_SUFFIXES:
+        (storage_dir / f"{name}{suffix}").write_bytes(b"")
+    _append_bytes(storage_dir / f"{name}{OFFSETS_SUFFIX}", 0, np.zeros(1, np.int64).tobytes())
+    entry = {"name": name, "count": 0, "kind": kind}
+    return append_segment(storage_dir, entry, doc_ids, texts, metadatas, vectors, dimension)
+
+
+def append_segment(
+    storage_dir: Path,
+    entry: Dict[str, Any],
+    doc_ids: Sequence[str],
+    texts: Sequence[str],
+    metadatas: Sequence[dict],
+    vectors: np.ndarray,
+    dimension: int,
+) -> Dict[str, Any]:
+    """Append rows after the committed ``entry["count"]`` and return the new entry.
+
+    Any torn tail from an interrupted writer is truncated first. The caller
+    makes the rows visible by publishing the returned entry in the manifest.
+    """
+    name, committed = entry["name"], entry["count"]
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(doc_ids), dimension)
+    offsets_path = storage_dir / f"{name}{OFFSETS_SUFFIX}"
+    with open(offsets_path, "rb") as handle:
+        handle.seek(committed * 8)
+        sidecar_end = int(np.frombuffer(handle.read(8), dtype=np.int64)[0])
+    payload = bytearray()
+    offsets = np.empty(len(doc_ids), dtype=np.int64)
+    for row, (doc_id, text, metadata) in enumerate(zip(doc_ids, texts, metadatas)):
+        payload += encode_record(doc_id, text, metadata)
+        offsets[row] = sidecar_end + len(payload)
+    keys = np.array([doc_key(doc_id) for doc_id in doc_ids], dtype=np.uint64)
+    _append_bytes(storage_dir / f"{name}{SIDECAR_SUFFIX}", sidecar_end, bytes(payload))
+    _append_bytes(
+        storage_dir / f"{name}{VECTOR_SUFFIX}", committed * dimension * 4, vectors.tobytes()
+    )
+    _append_bytes(storage_dir / f"{name}{IDS_SUFFIX}", committed * 8, keys.tobytes())
+    _append_bytes(offsets_path, (committed + 1) * 8, offsets.tobytes())
+    return {**entry, "count": committed + len(doc_ids)}
+
+
+def merge_segments(
+    storage_dir: Path,
+    name: str,
+    segments: Sequence["Segment"],
+    dimension: int,
+    vectors: Optional[np.ndarray] = None,
+    keep: Optional[np.ndarray] = None,
+) -> Dict[str, Any]:
+    """Concatenate ``segments`` into a new base segment.
+
+    Sidecar records are copied as raw bytes without being decoded. ``keep``
+    is an optional boolean mask over the global rows (tombstoned rows are
+    dropped); ``vectors`` optionally replaces the concatenated vector matrix.
+    """
+    total = sum(segment.count for segment in segments)
+    keep = np.ones(total, dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    offsets = [np.zeros(1, dtype=np.int64)]
+    kept_vectors, kept_keys = [np.empty((0, dimension), np.float32)], [np.empty(0, np.uint64)]
+    start = 0
+    with open(storage_dir / f"{name}{SIDECAR_SUFFIX}", "wb") as sidecar:
+        for segment in segments:
+            local = keep[start : start + segment.count]
+            shift = sidecar.tell()
+            raw = segment.raw_sidecar()
+            bounds = np.asarray(segment.offsets)
+            if local.all():
+                sidecar.write(raw)
+                offsets.append(bounds[1:] + shift)
+            else:
+                for row in np.flatnonzero(local):
+                    sidecar.write(raw[bounds[row] : bounds[row + 1]])
+                lengths = (bounds[1:] - bounds[:-1])[local]
+                offsets.append(np.cumsum(lengths) + shift)
+            if vectors is None:
+                kept_vectors.append(np.asarray(segment.vectors)[local])
+            kept_keys.append(np.asarray(segment.ids)[local])
+            start += segment.count
+        sidecar.flush()
+        os.fsync(sidecar.fileno())
+    vectors = np.concatenate(kept_vectors) if vectors is None else np.asarray(vectors)[keep]
+    keys = np.concatenate(kept_keys)
+    for suffix, array in (
+        (VECTOR_SUFFIX, np.asarray(vectors, dtype=np.float32)),
+        (IDS_SUFFIX, keys),
+        (OFFSETS_SUFFIX, np.concatenate(offsets)),
+    ):
+        with open(storage_dir / f"{name}{suffix}", "wb") as handle:
+            handle.write(np.ascontiguousarray(array).tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+    return {"name": name, "count": int(len(keys)), "kind": "base"}
+
+
+def remove_segment_files(storage_dir: Path, name: str) -> None:
+    for suffix in SEGMENT_SUFFIXES:
+        path = storage_dir / f"{name}{suffix}"
+        if path.exists():
+            path.unlink()
+
+
+def remove_stale_segments(storage_dir: Path, keep: Iterable[str]) -> None:
+    """Delete segment files whose name is not listed in ``keep``."""
+    keep = set(keep)
+    for path in storage_dir.glob(f"*{IDS_SUFFIX}"):
+        if path.stem not in keep:
+            remove_segment_files(storage_dir, path.stem)
+
+
+def _map_array(path: Path, dtype: Any, shape: tuple) -> np.ndarray:
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class Segment:
+    """Read-only, memory-mapped view over the committed rows of one segment."""
+
+    def __init__(self, storage_dir: Path, name: str, count: int, dimension: int) -> None:
+        self.storage_dir = storage_dir
+        self.name = name
+        self.count = count
+        self.dimension = dimension
+        self.vectors = _map_array(
+            storage_dir / f"{name}{VECTOR_SUFFIX}", np.float32, (count, dimension)
+        )
+        self.ids = _map_array(storage_dir / f"{name}{IDS_SUFFIX}", np.uint64, (count,))
+        self.offsets = np.memmap(
+            storage_dir / f"{name}{OFFSETS_SUFFIX}", dtype=np.int64, mode="r", shape=(count + 1,)
+        )
+        self.sidecar = _map_array(
+            storage_dir / f"{name}{SIDECAR_SUFFIX}", np.uint8, (int(self.offsets[count]),)
+        )
+
+    def records(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        """Decode the sidecar records of ``rows`` (segment-local row numbers)."""
+        decoded = []
+        for row in rows:
+            start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+            decoded.append(json.loads(self.sidecar[start:end].tobytes()))
+        return decoded
+
+    def raw_sidecar(self) -> bytes:
+        return self.sidecar.tobytes()
+
+
+class SegmentSet:
+    """All committed segments of a manifest, addressed by global row number."""
+
+    def __init__(self, storage_dir: Path, manifest: Dict[str, Any]) -> None:
+        dimension = manifest["dimension"]
+        self.manifest = manifest
+        self.segments = [
+            Segment(storage_dir, entry["name"], entry["count"], dimension)
+            for entry in manifest["segments"]
+        ]
+        self.starts = np.cumsum([0] + [segment.count for segment in self.segments])
+        self.count = int(self.starts[-1])
+        self.deleted = np.asarray(manifest.get("deleted", []), dtype=np.int64)
+        non_empty = [segment for segment in self.segments if segment.count]
+        if len(non_empty) == 1:
+            self.vectors = non_empty[0].vectors
+        else:
+            self.vectors = StackedMatrix([s.vectors for s in non_empty], dimension)
+
+    def ids(self, start: int = 0) -> np.ndarray:
+        """Doc keys of global rows ``start`` onwards."""
+        parts = [np.empty(0, np.uint64)]
+        for offset, segment in zip(self.starts, self.segments):
+            if offset + segment.count > start:
+                parts.append(np.asarray(segment.ids[max(0, start - int(offset)) :]))
+        return np.concatenate(parts)
+
+    def records(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        """Decode sidecar records for global ``rows``, preserving their order."""
+        rows = [int(row) for row in rows]
+        owners = np.searchsorted(self.starts, rows, side="right") - 1
+        decoded: List[Dict[str, Any]] = [{} for _ in rows]
+        for position, segment in enumerate(self.segments):
+            wanted = [i for i, owner in enumerate(owners) if owner == position]
+            local = [rows[i] - int(self.starts[position]) for i in wanted]
+            for i, record in zip(wanted, segment.records(local)):
+                decoded[i] = record
+        return decoded
+
+
+def migrate_json_store(storage_dir: Path, dimension: int) -> Optional[Dict[str, Any]]:
+    """One-shot conversion of a legacy ``store.json`` into the binary format.
+
+    Vectors are stored unit-normalised, as cosine scoring expects. Returns the
+    new manifest, or ``None`` when there is nothing to migrate or the store is
+    already in binary format. The legacy file is left in place.
+    """
+    legacy_path = storage_dir / LEGACY_STORE_NAME
+    if read_manifest(storage_dir) is not None or not legacy_path.exists():
+        return None
+    payload = json.loads(legacy_path.read_text(encoding="utf-8") or "[]")
+    manifest = empty_manifest(dimension)
+    manifest["generation"] = 1
+    if payload:
+        vectors = np.zeros((len(payload), dimension), dtype=np.float32)
+        for row, item in enumerate(payload):
+            values = item["vector"][:dimension]
+            vectors[row, : len(values)] = values
+        manifest["segments"].append(
+            write_segment(
+                storage_dir,
+                "base-000001",
+                [item["doc_id"] for item in payload],
+                [item["text"] for item in payload],
+                [item.get("metadata", {}) for item in payload],
+                normalize_rows(vectors),
+                dimension,
+            )
+        )
+    manifest["migrated_from"] = LEGACY_STORE_NAME
+    write_manifest(storage_dir, manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from ..config import get_settings
+
+    parser = argparse.ArgumentParser(description="Migrate a legacy store.json to binary segments.")
+    parser.add_argument("storage_dir", nargs="?", type=Path, default=None)
+    args = parser.parse_args()
+    settings = get_settings()
+    target = args.storage_dir or settings.chroma_path
+    result = migrate_json_store(target, settings.local_embedding_dimension)
+    if result is None:
+        print(f"Nothing to migrate in {target}.")
+    else:
+        print(f"Migrated {sum(s['count'] for s in result['segments'])} documents in {target}.")
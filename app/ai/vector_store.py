@@ -3,13 +3,27 @@
 from __future__ import annotations
 
 import json
-import math
-from dataclasses import dataclass
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
 from hashlib import blake2b
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
 
 from ..config import get_settings
+from . import ann, lexical, storage
+from .embedding_cache import EmbeddingCache
+from .embeddings import DigestEmbedder, Embedder, create_embedder
+from .scoring import FlatIndex, normalize_rows, top_k
+
+logger = logging.getLogger(__name__)
+
+# Manifests written before the embedding model was recorded used this one.
+LEGACY_EMBEDDING = DigestEmbedder.name
+REEMBED_BATCH = 1024
 
 
 @dataclass
@@ -22,79 +36,688 @@ class VectorDocument:
     vector: List[float]
 
 
+@dataclass
+class IngestReport:
+    """Outcome of an idempotent batch insert."""
+
+    doc_ids: List[str] = field(default_factory=list)
+    new: int = 0
+    skipped: int = 0
+    updated: int = 0
+
+
+@dataclass
+class _Corpus:
+    """Resident view of one committed generation of the store."""
+
+    stamp: Tuple[int, int, int]
+    manifest: dict
+    segments: storage.SegmentSet
+    ivf: Optional[ann.IVFIndex] = None
+    lexical: Optional[lexical.LexicalIndex] = None
+
+
+class _IdIndex:
+    """Doc keys of every stored row, sorted, with the row each one lives in.
+
+    Rows sharing a key are ordered oldest first. The index follows one row
+    numbering: :meth:`extend` picks up rows appended since it was built, and
+    reports ``False`` once compaction has renumbered the rows.
+    """
+
+    def __init__(self, segments: storage.SegmentSet) -> None:
+        self.layout: List[Tuple[str, int]] = []
+        self.count = 0
+        self.keys = np.empty(0, np.uint64)
+        self.rows = np.empty(0, np.int64)
+        self.extend(segments)
+
+    def extend(self, segments: storage.SegmentSet) -> bool:
+        layout = [(segment.name, segment.count) for segment in segments.segments]
+        if self.layout:
+            *settled, (name, count) = self.layout
+            grown = layout[len(settled)] if len(layout) > len(settled) else None
+            if layout[: len(settled)] != settled or not grown or grown[0] != name:
+                return False
+            if grown[1] < count:
+                return False
+        keys = segments.ids(self.count)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        slots = np.searchsorted(self.keys, keys, side="right")
+        self.keys = np.insert(self.keys, slots, keys)
+        self.rows = np.insert(self.rows, slots, order + self.count)
+        self.layout, self.count = layout, segments.count
+        return True
+
+    def find(self, keys: np.ndarray, deleted: np.ndarray) -> List[int]:
+        """The newest live row holding each of ``keys``, or -1."""
+        dead = set(deleted.tolist())
+        found = []
+        for start, end in zip(
+            np.searchsorted(self.keys, keys, side="left"),
+            np.searchsorted(self.keys, keys, side="right"),
+        ):
+            live = [int(row) for row in self.rows[start:end] if int(row) not in dead]
+            found.append(live[-1] if live else -1)
+        return found
+
+
 class LocalVectorStore:
-    """Minimal persistence-backed vector store."""
+    """Minimal persistence-backed vector store.
+
+    Vectors live in memory-mapped float32 segments described by
+    ``manifest.json`` (see :mod:`app.ai.storage`); a legacy ``store.json`` is
+    migrated to that layout the first time the directory is opened. Inserts
+    append to a write-ahead segment that is periodically compacted. Large
+    corpora are searched through a persisted IVF index (see :mod:`app.ai.ann`)
+    according to ``Settings.vector_index``.
 
-    def __init__(self, storage_dir: Path | None = None) -> None:
+    The opened corpus stays resident between searches. Each search only
+    ``stat()``s the manifest (replaced atomically on every commit, so its
+    inode/mtime change) and reopens the segments when another worker has
+    committed a new generation.
+
+    Inserts are idempotent: a snippet is identified by the hash of its text
+    (its ``doc_id``), re-inserting it with the same metadata is a no-op and
+    with different metadata replaces the stored row. Document embeddings are
+    memoised per model in an :class:`EmbeddingCache` under ``embeddings/``.
+
+    Texts are embedded by the :class:`~app.ai.embeddings.Embedder` chosen by
+    ``Settings.embedding_provider``. The manifest records which model built
+    the stored vectors; opening the store with a different one re-embeds the
+    corpus once (from the cache where possible) and retrains any IVF index.
+
+    A BM25 inverted index (see :mod:`app.ai.lexical`) is kept in step with
+    every commit and compaction; :meth:`hybrid_search` fuses it with the
+    vector ranking and pushes metadata filters down into it.
+    """
+
+    def __init__(
+        self, storage_dir: Path | None = None, embedder: Optional[Embedder] = None
+    ) -> None:
         settings = get_settings()
+        self.settings = settings
         self.dimension = settings.local_embedding_dimension
+        self.embedder = embedder or create_embedder(settings.embedding_provider, self.dimension)
+        if self.embedder.dimension != self.dimension:
+            raise ValueError(
+                f"Embedder {self.embedder!r} does not match "
+                f"LOCAL_EMBEDDING_DIMENSION={self.dimension}."
+            )
         self.storage_dir = storage_dir or settings.chroma_path
         self.storage_dir.mkdir(parents=True, exist_ok=True)
-        self.store_path = self.storage_dir / "store.json"
-        if not self.store_path.exists():
-            self.store_path.write_text("[]", encoding="utf-8")
-
-    def _load(self) -> List[VectorDocument]:
-        payload = json.loads(self.store_path.read_text(encoding="utf-8"))
-        docs: List[VectorDocument] = []
-        for item in payload:
-            docs.append(
-                VectorDocument(
-                    doc_id=item["doc_id"],
-                    text=item["text"],
-                    metadata=item.get("metadata", {}),
-                    vector=item["vector"],
+        self._corpus_cache: Optional[_Corpus] = None
+        self._corpus_lock = threading.Lock()
+        # Writer-side doc key lookup, kept across upserts (see _plan_upsert).
+        self._ids: Optional[_IdIndex] = None
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "reloads": 0}
+        self.embedding_cache = EmbeddingCache(
+            self.storage_dir / "embeddings",
+            f"{self.embedding_name}-{self.dimension}",
+            self.dimension,
+        )
+        with storage.writer_lock(self.storage_dir):
+            if storage.read_manifest(self.storage_dir) is None:
+                if storage.migrate_json_store(self.storage_dir, self.dimension) is None:
+                    manifest = storage.empty_manifest(self.dimension)
+                    manifest["embedding"] = self.embedding_name
+                    storage.write_manifest(self.storage_dir, manifest)
+            manifest = self._manifest()
+            if manifest["dimension"] != self.dimension:
+                raise ValueError(
+                    f"Vector store at {self.storage_dir} has dimension {manifest['dimension']}, "
+                    f"but LOCAL_EMBEDDING_DIMENSION is {self.dimension}."
                 )
+            if manifest.get("embedding", LEGACY_EMBEDDING) != self.embedding_name:
+                self._reembed(manifest)
+            elif not manifest.get("normalized"):
+                self._compact(manifest, normalize=True)
+            manifest = self._manifest()
+            entry = manifest.get("lexical")
+            if not entry or entry["rows"] != self._open(manifest).count:
+                self._build_lexical(manifest)
+            else:
+                # Leftovers of a writer that died before cleaning up.
+                self._remove_unreferenced(manifest)
+
+    @property
+    def embedding_name(self) -> str:
+        return self.embedder.name
+
+    def _manifest(self) -> dict:
+        manifest = storage.read_manifest(self.storage_dir)
+        return manifest if manifest is not None else storage.empty_manifest(self.dimension)
+
+    def _open(self, manifest: dict) -> storage.SegmentSet:
+        return storage.SegmentSet(self.storage_dir, manifest)
+
+    def _manifest_stamp(self) -> Tuple[int, int, int]:
+        info = os.stat(self.storage_dir / storage.MANIFEST_NAME)
+        return info.st_ino, info.st_mtime_ns, info.st_size
+
+    def _corpus(self) -> _Corpus:
+        """Return the resident corpus, reloading it only if the manifest changed."""
+        stamp = self._manifest_stamp()
+        cached = self._corpus_cache
+        if cached is not None and cached.stamp == stamp:
+            self._stats["hits"] += 1
+            return cached
+        with self._corpus_lock:
+            cached = self._corpus_cache
+            stamp = self._manifest_stamp()
+            if cached is not None and cached.stamp == stamp:
+                self._stats["hits"] += 1
+                return cached
+            self._stats["misses"] += 1
+            manifest = self._manifest()
+            if cached is not None and cached.manifest == manifest:
+                cached.stamp = stamp
+                return cached
+            self._stats["reloads"] += 1
+            while True:
+                try:
+                    corpus = self._load_corpus(stamp, manifest)
+                    break
+                except FileNotFoundError:
+                    # A compaction replaced this generation before we mapped
+                    # it (and deleted its files); load the newer one instead.
+                    stamp, manifest = self._manifest_stamp(), self._manifest()
+            self._corpus_cache = corpus
+            return corpus
+
+    def _load_corpus(self, stamp: Tuple[int, int, int], manifest: dict) -> _Corpus:
+        corpus = _Corpus(stamp=stamp, manifest=manifest, segments=self._open(manifest))
+        index = manifest.get("index")
+        if index and index["count"] == corpus.segments.count:
+            corpus.ivf = ann.load_index(
+                self.storage_dir,
+                index["name"],
+                index["nlist"],
+                index["count"],
+                corpus.segments.vectors,
+            )
+        entry = manifest.get("lexical")
+        if entry and entry["rows"] == corpus.segments.count:
+            corpus.lexical = lexical.LexicalIndex(self.storage_dir, entry)
+        return corpus
+
+    def cache_stats(self) -> Dict[str, object]:
+        """Counters for the resident corpus (stat hits, manifest misses, reloads)."""
+        corpus = self._corpus_cache
+        return {
+            **self._stats,
+            "generation": corpus.manifest["generation"] if corpus else -1,
+            "documents": corpus.segments.count - len(corpus.segments.deleted) if corpus else 0,
+            "embedding": self.embedding_name,
+            "embedding_cache": self.embedding_cache.stats(),
+        }
+
+    def _documents(
+        self, segments: storage.SegmentSet, rows: Iterable[int]
+    ) -> List[VectorDocument]:
+        rows = np.asarray(list(rows), dtype=np.int64)
+        if not len(rows):
+            return []
+        vectors = segments.vectors[rows]
+        return [
+            VectorDocument(
+                doc_id=record["doc_id"],
+                text=record["text"],
+                metadata=record.get("metadata", {}),
+                vector=vector.tolist(),
             )
-        return docs
-
-    def _persist(self, docs: Iterable[VectorDocument]) -> None:
-        serialized = [
-            {
-                "doc_id": doc.doc_id,
-                "text": doc.text,
-                "metadata": doc.metadata,
-                "vector": doc.vector,
-            }
-            for doc in docs
+            for vector, record in zip(vectors, segments.records(rows))
         ]
-        self.store_path.write_text(json.dumps(serialized, indent=2), encoding="utf-8")
 
     def _embed(self, text: str) -> List[float]:
-        digest = blake2b(text.encode("utf-8"), digest_size=32).digest()
-        # Repeat digest to cover target dimension.
-        values = list(digest) * ((self.dimension // len(digest)) + 1)
-        vector = [v / 255.0 for v in values[: self.dimension]]
-        return vector
+        return self._embed_many([text])[0].tolist()
+
+    def _embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embedder.embed(texts)
+
+    def _embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embedding_cache.embed(texts, self._embed_many)
+
+    @staticmethod
+    def _doc_id(text: str) -> str:
+        return blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
 
     def add_text(self, text: str, metadata: Optional[dict] = None) -> str:
-        docs = self._load()
-        doc_id = blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
-        docs.append(
-            VectorDocument(
-                doc_id=doc_id, text=text, metadata=metadata or {}, vector=self._embed(text)
+        return self.add_texts([text], [metadata or {}])[0]
+
+    def add_texts(
+        self, texts: Sequence[str], metadatas: Optional[Sequence[Optional[dict]]] = None
+    ) -> List[str]:
+        """Embed and commit a batch of snippets; returns the doc ids in input order."""
+        return self.upsert_texts(texts, metadatas).doc_ids
+
+    def upsert_texts(
+        self,
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Optional[dict]]] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> IngestReport:
+        """Idempotently commit a batch of snippets in a single append.
+
+        Snippets already stored with identical metadata are skipped; those
+        stored with different metadata are replaced. The batch becomes visible
+        to readers atomically, or not at all if the process dies mid-write.
+        ``vectors`` may carry embeddings computed elsewhere (e.g. by a bulk
+        ingest worker pool); they must come from :attr:`embedder`.
+        """
+        texts = list(texts)
+        if not texts:
+            return IngestReport()
+        metadatas = [meta or {} for meta in (metadatas or [None] * len(texts))]
+        if len(metadatas) != len(texts):
+            raise ValueError("texts and metadatas must have the same length.")
+        report = IngestReport(doc_ids=[self._doc_id(text) for text in texts])
+        if vectors is None:
+            vectors = self._embed_documents(texts)
+        else:
+            vectors = normalize_rows(
+                np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimension)
             )
+        with storage.writer_lock(self.storage_dir):
+            manifest = self._manifest()
+            current = self._open(manifest)
+            rows, replaced = self._plan_upsert(current, self._id_index(current), report, metadatas)
+            if not rows:
+                return report
+            doc_ids = [report.doc_ids[row] for row in rows]
+            texts = [texts[row] for row in rows]
+            metadatas = [metadatas[row] for row in rows]
+            vectors = vectors[rows]
+            generation = manifest["generation"] + 1
+            manifest["deleted"] = sorted(set(manifest.get("deleted", [])) | set(replaced))
+            segments = manifest["segments"]
+            if segments and segments[-1].get("kind") == "wal":
+                segments[-1] = storage.append_segment(
+                    self.storage_dir,
+                    segments[-1],
+                    doc_ids,
+                    texts,
+                    metadatas,
+                    vectors,
+                    self.dimension,
+                )
+            else:
+                segments.append(
+                    storage.write_segment(
+                        self.storage_dir,
+                        f"wal-{generation:06d}",
+                        doc_ids,
+                        texts,
+                        metadatas,
+                        vectors,
+                        self.dimension,
+                        kind="wal",
+                    )
+                )
+            self._index_new_rows(manifest, vectors)
+            self._index_new_terms(manifest, current.count, texts, metadatas)
+            manifest["generation"] = generation
+            storage.write_manifest(self.storage_dir, manifest)
+            if self._needs_compaction(manifest):
+                self._compact(manifest)
+            self._maybe_build_index()
+        return report
+
+    def _id_index(self, current: storage.SegmentSet) -> _IdIndex:
+        """The resident doc key index, brought up to date with ``current``.
+
+        Appended rows are merged in; it is only rebuilt from every stored id
+        after a compaction (by any process) renumbered the rows.
+        """
+        if self._ids is None or not self._ids.extend(current):
+            self._ids = _IdIndex(current)
+        return self._ids
+
+    @staticmethod
+    def _plan_upsert(
+        current: storage.SegmentSet,
+        ids: _IdIndex,
+        report: IngestReport,
+        metadatas: List[dict],
+    ) -> Tuple[List[int], List[int]]:
+        """Pick the batch positions to append and the stored rows they replace.
+
+        Only the batch's own keys are looked up, so the cost does not grow
+        with the size of the store.
+        """
+        incoming = np.array([storage.doc_key(doc_id) for doc_id in report.doc_ids], np.uint64)
+        matches: Dict[int, int] = {
+            position: row
+            for position, row in enumerate(ids.find(incoming, current.deleted))
+            if row >= 0
+        }
+        stored = dict(zip(matches, current.records(matches.values())))
+        appended: List[int] = []
+        replaced: List[int] = []
+        seen = set()
+        for position, doc_id in enumerate(report.doc_ids):
+            if doc_id in seen:
+                report.skipped += 1
+                continue
+            seen.add(doc_id)
+            if position not in matches:
+                report.new += 1
+            elif stored[position].get("metadata", {}) == json.loads(
+                json.dumps(metadatas[position])
+            ):
+                report.skipped += 1
+                continue
+            else:
+                report.updated += 1
+                replaced.append(matches[position])
+            appended.append(position)
+        return appended, replaced
+
+    def _needs_compaction(self, manifest: dict) -> bool:
+        segments = manifest["segments"]
+        total = sum(entry["count"] for entry in segments)
+        pending = len(manifest.get("deleted", []))
+        if segments and segments[-1].get("kind") == "wal":
+            pending += segments[-1]["count"]
+        threshold = max(
+            self.settings.vector_compact_min_rows,
+            self.settings.vector_compact_ratio * (total - pending),
+        )
+        return pending > 0 and pending >= threshold
+
+    def compact(self) -> None:
+        """Fold the write-ahead segment into a fresh base, dropping replaced rows."""
+        with storage.writer_lock(self.storage_dir):
+            self._compact(self._manifest())
+
+    def _reembed(self, manifest: dict) -> None:
+        """Replace every stored vector with one from :attr:`embedder`."""
+        segments = self._open(manifest)
+        live = np.setdiff1d(np.arange(segments.count), segments.deleted)
+        logger.info(
+            "Re-embedding %d snippets in %s from %s to %s.",
+            len(live),
+            self.storage_dir,
+            manifest.get("embedding", LEGACY_EMBEDDING),
+            self.embedding_name,
+        )
+        vectors = np.zeros((segments.count, self.dimension), dtype=np.float32)
+        for start in range(0, len(live), REEMBED_BATCH):
+            rows = live[start : start + REEMBED_BATCH]
+            vectors[rows] = self._embed_documents(
+                [record["text"] for record in segments.records(rows)]
+            )
+        # Centroids trained on the old vectors are meaningless for the new ones.
+        manifest.pop("index", None)
+        manifest["embedding"] = self.embedding_name
+        self._compact(manifest, vectors=vectors)
+        self._maybe_build_index()
+
+    def _compact(
+        self, manifest: dict, normalize: bool = False, vectors: Optional[np.ndarray] = None
+    ) -> None:
+        segments = self._open(manifest)
+        generation = manifest["generation"] + 1
+        keep = np.ones(segments.count, dtype=bool)
+        keep[segments.deleted] = False
+        if keep.any():
+            if vectors is None and normalize:
+                vectors = normalize_rows(segments.vectors[:])
+            manifest["segments"] = [
+                storage.merge_segments(
+                    self.storage_dir,
+                    f"base-{generation:06d}",
+                    segments.segments,
+                    self.dimension,
+                    vectors=vectors,
+                    keep=keep,
+                )
+            ]
+        else:
+            manifest["segments"] = []
+        index = manifest.get("index")
+        if index and len(segments.deleted):
+            # Row numbers shift once tombstones are dropped; keep the trained
+            # centroids but rewrite the per-row assignments.
+            name = f"ivf-{generation:06d}"
+            centroids = np.fromfile(
+                self.storage_dir / f"{index['name']}{ann.CENTROIDS_SUFFIX}", dtype=np.float32
+            )
+            labels = np.fromfile(
+                self.storage_dir / f"{index['name']}{ann.ASSIGN_SUFFIX}",
+                dtype=np.int32,
+                count=index["count"],
+            )
+            ann.write_index(self.storage_dir, name, centroids, labels[keep[: len(labels)]])
+            index.update(name=name, count=int(keep[: len(labels)].sum()))
+        terms = manifest.get("lexical")
+        if terms and terms["rows"] == segments.count:
+            name = f"lex-{generation:06d}"
+            manifest["lexical"] = lexical.merge_index(self.storage_dir, terms, name, keep)
+        else:
+            manifest.pop("lexical", None)
+        manifest.update(generation=generation, normalized=True, deleted=[])
+        self._publish(manifest)
+
+    def _publish(self, manifest: dict) -> None:
+        """Commit a rewritten generation, then delete the files it replaced.
+
+        The directory is fsynced first so a crash cannot bring back a manifest
+        naming deleted files. Readers still mapping the old files keep them
+        until they unmap; on POSIX the unlink only drops the name.
+        """
+        storage.write_manifest(self.storage_dir, manifest)
+        storage.sync_directory(self.storage_dir)
+        self._remove_unreferenced(manifest)
+
+    def _remove_unreferenced(self, manifest: dict) -> None:
+        """Delete segment and index files that ``manifest`` does not name."""
+        storage.remove_stale_segments(
+            self.storage_dir, {entry["name"] for entry in manifest["segments"]}
+        )
+        for module, key in ((ann, "index"), (lexical, "lexical")):
+            entry = manifest.get(key)
+            module.remove_index_files(self.storage_dir, keep={entry["name"]} if entry else ())
+
+    def _index_new_rows(self, manifest: dict, vectors: np.ndarray) -> None:
+        """Assign freshly appended rows to their IVF clusters before the commit."""
+        index = manifest.get("index")
+        if not index:
+            return
+        centroids = np.fromfile(
+            self.storage_dir / f"{index['name']}{ann.CENTROIDS_SUFFIX}", dtype=np.float32
+        ).reshape(index["nlist"], self.dimension)
+        ann.append_assignments(
+            self.storage_dir, index["name"], index["count"], ann.assign(vectors, centroids)
+        )
+        index["count"] += len(vectors)
+
+    def _index_new_terms(
+        self, manifest: dict, first_row: int, texts: List[str], metadatas: List[dict]
+    ) -> None:
+        """Append postings for freshly appended rows to the lexical index."""
+        entry = manifest.get("lexical")
+        if not entry:
+            return
+        postings, lengths = lexical.document_postings(texts, metadatas, first_row)
+        lexical.append_postings(self.storage_dir, entry, postings, lengths)
+
+    def _build_lexical(self, manifest: dict) -> None:
+        """Tokenise every stored row into a fresh lexical index."""
+        segments = self._open(manifest)
+        postings, lengths = [np.empty(0, lexical.POSTING_DTYPE)], [np.empty(0, np.uint32)]
+        for start in range(0, segments.count, REEMBED_BATCH):
+            records = segments.records(range(start, min(start + REEMBED_BATCH, segments.count)))
+            batch, batch_lengths = lexical.document_postings(
+                [record["text"] for record in records],
+                [record.get("metadata", {}) for record in records],
+                start,
+            )
+            postings.append(batch)
+            lengths.append(batch_lengths)
+        generation = manifest["generation"] + 1
+        name = f"lex-{generation:06d}"
+        manifest["lexical"] = lexical.write_index(
+            self.storage_dir, name, np.concatenate(postings), np.concatenate(lengths)
         )
-        self._persist(docs)
-        return doc_id
+        manifest["generation"] = generation
+        self._publish(manifest)
+
+    def _maybe_build_index(self) -> None:
+        mode = self.settings.vector_index
+        if mode == "flat":
+            return
+        manifest = self._manifest()
+        total = sum(entry["count"] for entry in manifest["segments"])
+        index = manifest.get("index")
+        if index:
+            if total >= index["trained_on"] * self.settings.ivf_retrain_factor:
+                self._build_index(manifest)
+        elif total and (mode == "ivf" or total >= self.settings.ivf_auto_threshold):
+            self._build_index(manifest)
+
+    def build_index(self, nlist: Optional[int] = None) -> dict:
+        """Train and persist an IVF index over the current corpus.
+
+        ``nlist`` defaults to ``Settings.ivf_nlist`` or, when that is 0, a size
+        based heuristic. Returns the index entry recorded in the manifest.
+        """
+        with storage.writer_lock(self.storage_dir):
+            return self._build_index(self._manifest(), nlist)
+
+    def _build_index(self, manifest: dict, nlist: Optional[int] = None) -> dict:
+        segments = self._open(manifest)
+        if not segments.count:
+            raise ValueError("Cannot build an index over an empty vector store.")
+        nlist = nlist or self.settings.ivf_nlist or ann.default_nlist(segments.count)
+        centroids = ann.train_centroids(segments.vectors, nlist)
+        labels = ann.assign(segments.vectors, centroids)
+        generation = manifest["generation"] + 1
+        name = f"ivf-{generation:06d}"
+        ann.write_index(self.storage_dir, name, centroids, labels)
+        manifest["index"] = {
+            "type": "ivf",
+            "name": name,
+            "nlist": int(centroids.shape[0]),
+            "count": segments.count,
+            "trained_on": segments.count,
+        }
+        manifest["generation"] = generation
+        self._publish(manifest)
+        return manifest["index"]
+
+    def generation(self) -> int:
+        """Generation of the committed corpus; it changes on every write."""
+        return self._corpus().manifest["generation"]
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Unit-normalised embedding of ``text`` as used for searching."""
+        return self._embed_many([text])[0]
+
+    def count(self) -> int:
+        segments = self._corpus().segments
+        return segments.count - len(segments.deleted)
+
+    def similarity_search(
+        self, query: str, limit: int = 3, nprobe: Optional[int] = None
+    ) -> List[VectorDocument]:
+        return self.similarity_search_batch([query], limit=limit, nprobe=nprobe)[0]
+
+    def similarity_search_batch(
+        self, queries: Sequence[str], limit: int = 3, nprobe: Optional[int] = None
+    ) -> List[List[VectorDocument]]:
+        """Return the ``limit`` nearest documents for each query, scored in one pass.
 
-    def similarity_search(self, query: str, limit: int = 3) -> List[VectorDocument]:
-        docs = self._load()
-        if not docs:
+        When an IVF index is available, ``nprobe`` (default
+        ``Settings.ivf_nprobe``) sets how many clusters each query scans.
+        """
+        if not queries:
             return []
-        query_vec = self._embed(query)
-        scored = sorted(
-            docs,
-            key=lambda doc: self._cosine_similarity(query_vec, doc.vector),
-            reverse=True,
+        corpus = self._corpus()
+        segments = corpus.segments
+        if not segments.count:
+            return [[] for _ in queries]
+        rows = self._nearest(corpus, self._embed_many(queries), limit, nprobe)
+        return [self._documents(segments, query_rows[query_rows >= 0]) for query_rows in rows]
+
+    def _nearest(
+        self, corpus: _Corpus, query_matrix: np.ndarray, limit: int, nprobe: Optional[int]
+    ) -> np.ndarray:
+        segments = corpus.segments
+        if corpus.ivf is not None and self.settings.vector_index != "flat":
+            _, rows = corpus.ivf.search(
+                query_matrix,
+                limit,
+                nprobe=nprobe or self.settings.ivf_nprobe,
+                exclude=segments.deleted,
+            )
+        else:
+            _, rows = FlatIndex(segments.vectors).search(
+                query_matrix, limit, exclude=segments.deleted
+            )
+        return rows
+
+    def _filtered(self, corpus: _Corpus, filters: Mapping[str, Any]) -> np.ndarray:
+        """Live rows whose metadata matches ``filters``, resolved via the inverted index."""
+        segments = corpus.segments
+        if corpus.lexical is None:
+            # Only until this generation's index is written: check every record.
+            live = np.setdiff1d(np.arange(segments.count), segments.deleted)
+            keep = [lexical.matches(r.get("metadata", {}), filters) for r in segments.records(live)]
+            return live[np.asarray(keep, dtype=bool)]
+        rows = corpus.lexical.filter_rows(filters)
+        return rows[~np.isin(rows, segments.deleted)]
+
+    def lexical_search(
+        self, query: str, limit: int = 3, filters: Optional[Mapping[str, Any]] = None
+    ) -> List[VectorDocument]:
+        """Return the ``limit`` best BM25 matches for ``query`` (only rows sharing a term)."""
+        corpus = self._corpus()
+        if corpus.lexical is None:
+            return []
+        allowed = self._filtered(corpus, filters) if filters else None
+        _, rows = corpus.lexical.search(
+            query, limit, allowed=allowed, exclude=corpus.segments.deleted
         )
-        return scored[:limit]
+        return self._documents(corpus.segments, rows)
 
-    @staticmethod
-    def _cosine_similarity(vec_a: List[float], vec_b: List[float]) -> float:
-        dot = sum(a * b for a, b in zip(vec_a, vec_b))
-        norm_a = math.sqrt(sum(a * a for a in vec_a))
-        norm_b = math.sqrt(sum(b * b for b in vec_b))
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return dot / (norm_a * norm_b)
+    def hybrid_search(
+        self,
+        query: str,
+        limit: int = 3,
+        filters: Optional[Mapping[str, Any]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[VectorDocument]:
+        """Fuse the BM25 and vector rankings of ``query`` with reciprocal rank fusion.
+
+        Each side contributes its best ``Settings.hybrid_candidates`` rows,
+        weighted ``1 / (Settings.hybrid_rrf_k + rank)``, so exact terms (SKUs,
+        prices, places) and paraphrases can both surface a snippet. ``filters``
+        maps metadata keys to a value or a list of accepted values (see
+        :func:`app.ai.lexical.matches`); they are resolved through the inverted
+        index first, and only the matching rows are scored on either side.
+        """
+        corpus = self._corpus()
+        segments = corpus.segments
+        if not segments.count:
+            return []
+        depth = max(limit, self.settings.hybrid_candidates)
+        allowed = self._filtered(corpus, filters) if filters else None
+        if allowed is not None and not len(allowed):
+            return []
+        rankings = []
+        if corpus.lexical is not None:
+            _, rows = corpus.lexical.search(
+                query, depth, allowed=allowed, exclude=segments.deleted
+            )
+            rankings.append(rows)
+        query_vector = self.embed_query(query)
+        if allowed is not None:
+            # A filter usually leaves few rows, so score exactly the ones it kept.
+            scores = np.asarray(segments.vectors[allowed], dtype=np.float32) @ query_vector
+            rankings.append(allowed[top_k(scores, depth)])
+        else:
+            rankings.append(self._nearest(corpus, query_vector[None, :], depth, nprobe)[0])
+        fused = lexical.reciprocal_rank_fusion(rankings, self.settings.hybrid_rrf_k)
+        return self._documents(segments, fused[:limit])
@@ -2,34 +2,200 @@
 
 from __future__ import annotations
 
-from typing import Iterable, List, Optional
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional
 
 import httpx
 
-from ..config import get_settings
+from ..config import Settings, get_settings
+from ..observability.metrics import REGISTRY
+from ..observability.tracing import tracer
 from .vector_store import VectorDocument
 
+REQUEST_SECONDS = REGISTRY.histogram(
+    "xai_request_seconds", "xAI completion latency.", ("mode", "outcome")
+)
+FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "xai_first_token_seconds", "Time from a streamed xAI request to its first token."
+)
+SHORT_CIRCUITED = REGISTRY.counter(
+    "xai_short_circuited_total", "xAI calls refused because the circuit was open."
+)
+
+
+def _outcome(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return "ok"
+    return "timeout" if isinstance(exc, asyncio.TimeoutError) else "error"
+
+
+# A sentence ends at ., ! or ? (optionally closed by quotes/brackets) before
+# whitespace, or at a CJK full stop, which is not followed by a space.
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|[。！？]+[」』）]*")
+_LAST_WORD = re.compile(r"[\w.]+$")
+# Words whose trailing period does not end a sentence ("Dr. Lee", "e.g. a").
+_ABBREVIATIONS = frozenset(
+    {"approx", "dr", "e.g", "i.e", "inc", "jr", "ltd", "mr", "mrs", "ms", "prof", "sr", "st", "vs"}
+)
+
+
+class SentenceBuffer:
+    """Accumulates streamed text and releases it one complete sentence at a time."""
+
+    def __init__(self) -> None:
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if self._after_abbreviation(match):
+                continue
+            sentences.append(self._buffer[start : match.end()])
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def _after_abbreviation(self, match: "re.Match[str]") -> bool:
+        if not match.group().startswith(".") or match.group().startswith(".."):
+            return False
+        word = _LAST_WORD.search(self._buffer, 0, match.start())
+        return word is not None and word.group().lower() in _ABBREVIATIONS
+
+    def flush(self) -> str:
+        tail, self._buffer = self._buffer, ""
+        return tail
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream that is currently failing."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker keyed on consecutive failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``reset_seconds``; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """End a call that produced no verdict (cancelled or abandoned).
+
+        Lets the next call be the half-open trial instead of leaving the
+        circuit waiting for an outcome that will never be recorded.
+        """
+        self._trial_in_flight = False
+
 
 class XAIClient:
-    """Lightweight wrapper around the xAI Grok API."""
+    """Lightweight wrapper around the xAI Grok API.
+
+    Calls share one pooled ``httpx.AsyncClient`` (closed by :meth:`aclose`),
+    at most ``Settings.xai_max_concurrency`` run at once, and each is bounded
+    by ``Settings.xai_timeout_seconds`` including time spent queueing. Upstream
+    failures trip a :class:`CircuitBreaker`, so callers fall back immediately
+    while the provider is unhealthy. :meth:`stream_answer` consumes the
+    server-sent event stream and yields text as it is generated.
+    """
 
     API_URL = "https://api.x.ai/v1/chat/completions"
 
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None) -> None:
-        settings = get_settings()
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        settings: Settings | None = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        settings = settings or get_settings()
+        self.settings = settings
         self.api_key = api_key or settings.xai_api_key
         self.model = model or settings.llm_model
+        self.api_url = settings.xai_api_url or self.API_URL
+        self.breaker = CircuitBreaker(
+            settings.xai_breaker_failure_threshold, settings.xai_breaker_reset_seconds
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max(1, settings.xai_max_concurrency))
+        self._latencies: Deque[float] = deque(maxlen=512)
+        self._ttft: Deque[float] = deque(maxlen=512)
+        self._stats: Dict[str, float] = {
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "short_circuited": 0,
+            "in_flight": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
 
     @property
     def is_configured(self) -> bool:
         return bool(self.api_key and self.model)
 
-    async def generate_answer(
-        self, question: str, contexts: Iterable[VectorDocument], tone: str = "concise"
-    ) -> str:
-        if not self.is_configured:
-            raise RuntimeError("XAI_API_KEY or model missing.")
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            limit = max(1, self.settings.xai_max_concurrency)
+            self._client = httpx.AsyncClient(
+                timeout=self.settings.xai_timeout_seconds,
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
+    def _build_request(
+        self, question: str, contexts: Iterable[VectorDocument], tone: str
+    ) -> tuple[dict, Dict[str, str]]:
         snippets: List[str] = []
         for ctx in contexts:
             snippets.append(f"- {ctx.text}")
@@ -56,8 +222,145 @@ class XAIClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(self.API_URL, json=payload, headers=headers)
-            response.raise_for_status()
-        data = response.json()
+        return payload, headers
+
+    async def generate_answer(
+        self, question: str, contexts: Iterable[VectorDocument], tone: str = "concise"
+    ) -> str:
+        if not self.is_configured:
+            raise RuntimeError("XAI_API_KEY or model missing.")
+        payload, headers = self._build_request(question, contexts, tone)
+        data = await self._complete(payload, headers)
         return data["choices"][0]["message"]["content"].strip()
+
+    async def stream_answer(
+        self, question: str, contexts: Iterable[VectorDocument], tone: str = "concise"
+    ) -> AsyncIterator[str]:
+        """Yield the answer incrementally from the SSE completion stream.
+
+        ``Settings.xai_timeout_seconds`` bounds the wait for the first token
+        and for each following event rather than the whole completion.
+        """
+        if not self.is_configured:
+            raise RuntimeError("XAI_API_KEY or model missing.")
+        if not self.breaker.allow():
+            self._stats["short_circuited"] += 1
+            SHORT_CIRCUITED.inc()
+            raise CircuitOpenError("xAI circuit is open; using local fallback.")
+        payload, headers = self._build_request(question, contexts, tone)
+        payload["stream"] = True
+        headers["Accept"] = "text/event-stream"
+        deadline = self.settings.xai_timeout_seconds
+        self._stats["calls"] += 1
+        started = time.perf_counter()
+        first_token = True
+        error: Optional[BaseException] = None
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), deadline)
+            self._stats["in_flight"] += 1
+            try:
+                async with self.client.stream(
+                    "POST", self.api_url, json=payload, headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    lines = response.aiter_lines()
+                    while True:
+                        try:
+                            line = await asyncio.wait_for(lines.__anext__(), deadline)
+                        except StopAsyncIteration:
+                            break
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        self._record_usage(event)
+                        for choice in event.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                if first_token:
+                                    first_token = False
+                                    self._ttft.append(time.perf_counter() - started)
+                                    FIRST_TOKEN_SECONDS.observe(self._ttft[-1])
+                                yield delta
+            finally:
+                self._stats["in_flight"] -= 1
+                self._semaphore.release()
+        except Exception as exc:
+            error = exc
+            if isinstance(exc, asyncio.TimeoutError):
+                self._stats["timeouts"] += 1
+            self._stats["failed"] += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (or, for the stream, closed early): neither outcome.
+            self.breaker.release_trial()
+            raise
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            REQUEST_SECONDS.observe(self._latencies[-1], mode="stream", outcome=_outcome(error))
+        self.breaker.record_success()
+        self._stats["succeeded"] += 1
+
+    def _record_usage(self, data: dict) -> None:
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            self._stats[key] += (data.get("usage") or {}).get(key) or 0
+
+    async def _complete(self, payload: dict, headers: Dict[str, str]) -> dict:
+        if not self.breaker.allow():
+            self._stats["short_circuited"] += 1
+            SHORT_CIRCUITED.inc()
+            raise CircuitOpenError("xAI circuit is open; using local fallback.")
+        self._stats["calls"] += 1
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            with tracer.span("xai.complete", model=self.model):
+                response = await asyncio.wait_for(
+                    self._post(payload, headers), self.settings.xai_timeout_seconds
+                )
+                data = response.json()
+        except Exception as exc:
+            error = exc
+            if isinstance(exc, asyncio.TimeoutError):
+                self._stats["timeouts"] += 1
+            self._stats["failed"] += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (or, for the stream, closed early): neither outcome.
+            self.breaker.release_trial()
+            raise
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            REQUEST_SECONDS.observe(self._latencies[-1], mode="complete", outcome=_outcome(error))
+        self.breaker.record_success()
+        self._stats["succeeded"] += 1
+        self._record_usage(data)
+        return data
+
+    async def _post(self, payload: dict, headers: Dict[str, str]) -> httpx.Response:
+        async with self._semaphore:
+            self._stats["in_flight"] += 1
+            try:
+                response = await self.client.post(self.api_url, json=payload, headers=headers)
+            finally:
+                self._stats["in_flight"] -= 1
+        response.raise_for_status()
+        return response
+
+    def stats(self) -> Dict[str, object]:
+        data: Dict[str, object] = dict(self._stats)
+        data["circuit"] = self.breaker.state
+        latencies = sorted(self._latencies)
+        if latencies:
+            data["latency_p50_seconds"] = latencies[len(latencies) // 2]
+            data["latency_p95_seconds"] = latencies[int(len(latencies) * 0.95)]
+            data["latency_max_seconds"] = latencies[-1]
+        ttft = sorted(self._ttft)
+        if ttft:
+            data["first_token_p50_seconds"] = ttft[len(ttft) // 2]
+            data["first_token_p95_seconds"] = ttft[int(len(ttft) * 0.95)]
+        return data
@@ -13,17 +13,115 @@ class Settings(BaseSettings):
 
     database_url: str = Field(
         default="sqlite:///./data/app.db",
-        description="SQLAlchemy compatible database URL.",
+        description=(
+            "SQLAlchemy compatible database URL. An async driver (sqlite+aiosqlite, "
+            "postgresql+asyncpg) moves webhook database work onto an AsyncSession."
+        ),
+    )
+    db_pool_size: int = Field(
+        default=10, description="Connections kept open per database engine."
+    )
+    db_max_overflow: int = Field(
+        default=20, description="Extra connections allowed beyond db_pool_size under load."
+    )
+    db_pool_recycle_seconds: int = Field(
+        default=1800, description="Reconnect pooled connections older than this."
+    )
+    db_statement_cache_size: int = Field(
+        default=500,
+        description="Compiled-statement cache entries (also asyncpg prepared statements).",
     )
     chroma_path: Path = Field(
         default=Path("data/vectorstore"),
         description="Storage path for the local vector store.",
     )
     embedding_provider: str = Field(
-        default="local", description="Provider for embeddings (local/openai/etc.)."
+        default="local",
+        description=(
+            "Embedding model: local (hashed words and character n-grams) or blake2b "
+            "(legacy digest, no similarity); unknown values fall back to local with a "
+            "warning. Changing it re-embeds the vector store."
+        ),
     )
     local_embedding_dimension: int = Field(
-        default=384, description="Vector dimension used by the local embedding stub."
+        default=384, description="Vector dimension produced by the local embedders."
+    )
+    vector_compact_min_rows: int = Field(
+        default=1024,
+        description="Minimum write-ahead segment size before it is compacted into the base.",
+    )
+    vector_compact_ratio: float = Field(
+        default=0.25,
+        description="Compact once the write-ahead segment reaches this fraction of the base.",
+    )
+    vector_index: str = Field(
+        default="auto",
+        description="Retrieval index: flat (exact scan), ivf (approximate) or auto.",
+    )
+    ivf_auto_threshold: int = Field(
+        default=50000,
+        description="Corpus size at which vector_index=auto builds an IVF index.",
+    )
+    ivf_nlist: int = Field(
+        default=0, description="IVF cluster count; 0 picks roughly 4*sqrt(corpus size)."
+    )
+    ivf_nprobe: int = Field(
+        default=8,
+        description="IVF clusters scanned per query; higher improves recall, costs latency.",
+    )
+    retrieval_mode: str = Field(
+        default="hybrid",
+        description="Answer retrieval: hybrid (BM25 + vectors, fused) or vector only.",
+    )
+    hybrid_candidates: int = Field(
+        default=50, description="Rows each ranking contributes to hybrid rank fusion."
+    )
+    hybrid_rrf_k: int = Field(
+        default=60, description="Reciprocal rank fusion constant; larger flattens rank weights."
+    )
+    ivf_retrain_factor: float = Field(
+        default=4.0,
+        description="Retrain IVF centroids once the corpus grows by this factor since training.",
+    )
+    ingest_batch_size: int = Field(
+        default=64, description="Chunks embedded and committed per vector store write."
+    )
+    ingest_read_size: int = Field(
+        default=65536, description="Bytes read per step when streaming uploaded files."
+    )
+    ingest_workers: int = Field(
+        default=1, description="Background threads running queued ingestion jobs."
+    )
+    bulk_ingest_processes: int = Field(
+        default=0,
+        description="Worker processes for bulk chunking/embedding (0 = one per CPU core).",
+    )
+    bulk_ingest_batch_size: int = Field(
+        default=256, description="Chunks per embedding task and per commit in bulk ingest."
+    )
+    bulk_ingest_root: Path = Field(
+        default=Path("data/knowledge"),
+        description="Directory the admin bulk ingest endpoint may read documents from.",
+    )
+    webhook_queue_path: str = Field(
+        default="data/queue.db",
+        description="SQLite file backing the webhook work queue (':memory:' for non-durable).",
+    )
+    webhook_workers: int = Field(
+        default=4, description="Concurrent async workers processing queued webhook jobs."
+    )
+    webhook_max_attempts: int = Field(
+        default=5, description="Attempts per webhook job before it is dead-lettered."
+    )
+    webhook_retry_base_seconds: float = Field(
+        default=1.0, description="Initial retry backoff for failed webhook jobs."
+    )
+    webhook_retry_max_seconds: float = Field(
+        default=60.0, description="Upper bound on the retry backoff for webhook jobs."
+    )
+    webhook_lease_seconds: float = Field(
+        default=120.0,
+        description="How long a claimed job stays invisible before another worker may retry it.",
     )
     llm_model: str = Field(
         default="grok-2",
@@ -42,6 +140,47 @@ class Settings(BaseSettings):
     xai_api_key: Optional[str] = Field(
         default=None, description="Optional xAI API key used for Grok responses."
     )
+    xai_api_url: Optional[str] = Field(
+        default=None,
+        description="Override for the xAI chat completions endpoint (e.g. a local stub).",
+    )
+    xai_streaming: bool = Field(
+        default=False,
+        description="Stream xAI answers and deliver the opening sentences before completion.",
+    )
+    xai_stream_first_chars: int = Field(
+        default=40,
+        description="Deliver streamed sentences early once this many characters are ready.",
+    )
+    xai_max_concurrency: int = Field(
+        default=8, description="Maximum concurrent xAI requests per process."
+    )
+    xai_timeout_seconds: float = Field(
+        default=15.0, description="Deadline for one xAI call, including time queued for a slot."
+    )
+    xai_breaker_failure_threshold: int = Field(
+        default=5, description="Consecutive xAI failures that open the circuit breaker."
+    )
+    xai_breaker_reset_seconds: float = Field(
+        default=30.0, description="How long the xAI circuit stays open before a trial call."
+    )
+    answer_cache_size: int = Field(
+        default=1024, description="Generated answers kept for repeated questions (0 disables)."
+    )
+    answer_cache_ttl_seconds: float = Field(
+        default=3600.0, description="How long a cached answer may be reused."
+    )
+    answer_cache_similarity: float = Field(
+        default=0.0,
+        description="Cosine similarity for near-duplicate question reuse (0 = exact match only).",
+    )
+    conversation_cache_size: int = Field(
+        default=10000,
+        description="Senders whose open conversation is cached in-process (0 disables).",
+    )
+    conversation_cache_ttl_seconds: float = Field(
+        default=900.0, description="Seconds a cached sender -> conversation mapping is trusted."
+    )
     embedding_model: Optional[str] = Field(
         default=None, description="Identifier for the embedding model."
     )
@@ -59,6 +198,41 @@ class Settings(BaseSettings):
         default="https://graph.facebook.com/v18.0",
         description="Base URL for Messenger Graph API calls.",
     )
+    graph_max_connections: int = Field(
+        default=20, description="Size of the pooled Graph API connection pool."
+    )
+    graph_timeout_seconds: float = Field(
+        default=10.0, description="Timeout for a single Graph API request."
+    )
+    graph_max_retries: int = Field(
+        default=3, description="Retries for Graph API sends that fail with 429/5xx."
+    )
+    graph_rate_limit_per_second: float = Field(
+        default=50.0,
+        description="Send API requests per second before usage-header throttling.",
+    )
+    log_level: str = Field(default="INFO", description="Root log level.")
+    access_log_sample_rate: float = Field(
+        default=1.0,
+        description="Fraction of requests access-logged; 5xx and slow ones always are.",
+    )
+    access_log_slow_ms: float = Field(
+        default=1000.0, description="Requests slower than this are always access-logged."
+    )
+    access_log_capture_body: bool = Field(
+        default=False,
+        description="Include the redacted, size-capped body of sampled text/JSON requests.",
+    )
+    access_log_body_max_bytes: int = Field(
+        default=2048, description="Maximum request body bytes captured into the access log."
+    )
+    trace_path: Optional[Path] = Field(
+        default=None,
+        description="Append sampled per-request trace spans to this JSON-lines file.",
+    )
+    trace_sample_rate: float = Field(
+        default=1.0, description="Fraction of webhook requests/jobs traced when TRACE_PATH is set."
+    )
     environment: str = Field(
         default="development",
         description="Arbitrary environment label (development/staging/production).",
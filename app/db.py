@@ -1,18 +1,77 @@
-"""Database helpers for SQLAlchemy sessions."""
+"""Database helpers for SQLAlchemy sessions.
 
-from contextlib import contextmanager
-from typing import Iterator
+``DATABASE_URL`` may name an async driver (``sqlite+aiosqlite://`` or
+``postgresql+asyncpg://``). The webhook pipeline then runs on an
+``AsyncSession`` and never blocks the event loop on database I/O; a sync engine
+on the matching blocking driver is still created for schema management and the
+threadpool-run admin endpoints.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Union
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.url import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from .config import get_settings
 
+ASYNC_DRIVERS = frozenset({"aiosqlite", "asyncpg"})
+
 settings = get_settings()
 
-engine = create_engine(settings.database_url, future=True, echo=False)
+
+def is_async_url(url: Union[str, URL]) -> bool:
+    return make_url(url).get_driver_name() in ASYNC_DRIVERS
+
+
+def sync_url(url: Union[str, URL]) -> URL:
+    """The URL with any async driver swapped for the dialect's default driver."""
+    url = make_url(url)
+    if url.get_driver_name() in ASYNC_DRIVERS:
+        url = url.set(drivername=url.get_backend_name())
+        url = url.difference_update_query(["prepared_statement_cache_size"])
+    return url
+
+
+def engine_options(url: Union[str, URL]) -> Dict[str, Any]:
+    """Pool and statement-cache tuning from settings, where the pool supports it."""
+    url = make_url(url)
+    options: Dict[str, Any] = {
+        "future": True,
+        "echo": False,
+        "pool_pre_ping": True,
+        "query_cache_size": settings.db_statement_cache_size,
+    }
+    if url.get_backend_name() == "sqlite":
+        return options  # SQLite picks its own pool class; sizing does not apply
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_seconds,
+    )
+    return options
+
+
+engine = create_engine(sync_url(settings.database_url), **engine_options(settings.database_url))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+async_engine = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+if is_async_url(settings.database_url):
+    url = make_url(settings.database_url)
+    if url.get_driver_name() == "asyncpg" and "prepared_statement_cache_size" not in url.query:
+        # asyncpg keeps prepared statements per connection.
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.db_statement_cache_size)}
+        )
+    async_engine = create_async_engine(url, **engine_options(url))
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
 
 def get_session() -> Iterator[Session]:
     """FastAPI dependency that yields a SQLAlchemy session."""
@@ -35,3 +94,23 @@ def session_scope() -> Iterator[Session]:
         raise
     finally:
         session.close()
+
+
+@asynccontextmanager
+async def pipeline_session() -> AsyncIterator[Union[AsyncSession, Session]]:
+    """Transactional scope for async code.
+
+    Yields an ``AsyncSession`` when ``DATABASE_URL`` uses an async driver and a
+    regular ``Session`` otherwise.
+    """
+    if AsyncSessionLocal is None:
+        with session_scope() as session:
+            yield session
+        return
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
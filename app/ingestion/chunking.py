@@ -0,0 +1,77 @@
+"""Incremental text chunking for bounded-memory ingestion."""
+
+from __future__ import annotations
+
+import codecs
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+# Whitespace characters folded into a plain space, as textwrap does.
+_WHITESPACE = str.maketrans({char: " " for char in "\t\n\x0b\x0c\r"})
+
+
+class TextChunker:
+    """Split a stream of text pieces into chunks of at most ``chunk_size`` chars.
+
+    Chunks break after the last whitespace that fits, falling back to a hard
+    cut for overlong words. Only the unfinished tail is buffered, so memory is
+    bounded by ``chunk_size`` plus the size of the piece being fed.
+    """
+
+    def __init__(self, chunk_size: int = 800) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive.")
+        self.chunk_size = chunk_size
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, piece: str) -> List[str]:
+        """Add text and return every chunk that is now complete."""
+        piece = piece.translate(_WHITESPACE)
+        if not self._started:
+            piece = piece.lstrip()
+            self._started = bool(piece)
+        self._buffer += piece
+        chunks = []
+        start = 0
+        # A cut is only final once a character beyond the chunk is known.
+        while len(self._buffer) - start > self.chunk_size:
+            end = start + self.chunk_size
+            cut = self._buffer.rfind(" ", start + 1, end) + 1 or end
+            chunks.append(self._buffer[start:cut])
+            start = cut
+        self._buffer = self._buffer[start:]
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return the final chunk, if any non-whitespace text remains."""
+        tail, self._buffer = self._buffer.rstrip(), ""
+        return [tail] if tail else []
+
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int = 800) -> Iterator[str]:
+    chunker = TextChunker(chunk_size)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.flush()
+
+
+def iter_decoded(blocks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode a byte stream incrementally; invalid sequences are dropped."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_file_blocks(path: Path, block_size: int = 65536) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        while True:
+            block = handle.read(block_size)
+            if not block:
+                return
+            yield block
@@ -0,0 +1,169 @@
+"""In-process background queue for knowledge ingestion jobs."""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..ai.vector_store import IngestReport
+from .bulk import BulkIngestor
+from .service import IngestionService
+
+
+@dataclass
+class IngestionJob:
+    """Status and progress of one queued ingestion."""
+
+    job_id: str
+    kind: str
+    source: str
+    status: str = "queued"
+    chunks_processed: int = 0
+    new: int = 0
+    skipped: int = 0
+    updated: int = 0
+    doc_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def record(self, report: IngestReport) -> None:
+        self.chunks_processed = len(report.doc_ids)
+        self.new, self.skipped, self.updated = report.new, report.skipped, report.updated
+
+    def as_dict(self, include_doc_ids: bool = False) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        data: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "source": self.source,
+            "status": self.status,
+            "chunks_processed": self.chunks_processed,
+            "new": self.new,
+            "skipped": self.skipped,
+            "updated": self.updated,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": elapsed,
+            "chunks_per_second": (
+                self.chunks_processed / elapsed if elapsed else None
+            ),
+        }
+        if include_doc_ids:
+            data["doc_ids"] = self.doc_ids
+        return data
+
+
+class IngestionJobQueue:
+    """Runs ingestion on a thread pool so request handlers return immediately.
+
+    Jobs are kept in memory; the most recent ``max_history`` are retained for
+    status queries.
+    """
+
+    def __init__(
+        self, ingestion: IngestionService, max_workers: int = 1, max_history: int = 200
+    ) -> None:
+        self.ingestion = ingestion
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingestion"
+        )
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, kind: str, source: str) -> IngestionJob:
+        job = IngestionJob(job_id=uuid.uuid4().hex, kind=kind, source=source)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in ("queued", "running"):
+                    break
+                self._jobs.popitem(last=False)
+        return job
+
+    def _run(self, job: IngestionJob, work: Callable[[Callable[[IngestReport], None]], IngestReport]) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            report = work(job.record)
+        except Exception as exc:  # surfaced through the job status endpoint
+            job.status = "failed"
+            job.error = str(exc)
+        else:
+            job.record(report)
+            job.doc_ids = report.doc_ids
+            job.status = "succeeded"
+        finally:
+            job.finished_at = time.time()
+
+    def submit_text(self, title: str, text: str, metadata: dict | None = None) -> IngestionJob:
+        job = self._register("text", title)
+        self._executor.submit(
+            self._run,
+            job,
+            lambda progress: self.ingestion.ingest_text(title, text, metadata, progress),
+        )
+        return job
+
+    def submit_file(
+        self,
+        path: Path,
+        title: str | None = None,
+        metadata: dict | None = None,
+        delete_after: bool = False,
+    ) -> IngestionJob:
+        """Queue ingestion of ``path``; ``delete_after`` removes it once the job ends."""
+        job = self._register("file", title or path.name)
+
+        def work(progress: Callable[[IngestReport], None]) -> IngestReport:
+            try:
+                return self.ingestion.ingest_path(path, title, metadata, progress)
+            finally:
+                if delete_after:
+                    path.unlink(missing_ok=True)
+
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def submit_bulk(
+        self, paths: Sequence[Path], metadata: dict | None = None
+    ) -> IngestionJob:
+        """Queue a multi-process bulk load of files and directories."""
+        job = self._register("bulk", ", ".join(str(path) for path in paths))
+        ingestor = BulkIngestor(self.ingestion.vector_store, self.ingestion.settings)
+        self._executor.submit(
+            self._run,
+            job,
+            lambda progress: ingestor.ingest_paths(paths, metadata, progress),
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def stats(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        for job in self.list():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -2,39 +2,122 @@
 
 from __future__ import annotations
 
-import textwrap
+import asyncio
+import uuid
 from pathlib import Path
-from typing import List
+from typing import Callable, Iterable, List, Optional
 
 from fastapi import UploadFile
 
-from ..ai.vector_store import LocalVectorStore
+from ..ai.vector_store import IngestReport, LocalVectorStore
+from ..config import Settings, get_settings
+from .chunking import iter_chunks, iter_decoded, iter_file_blocks
+
+ProgressCallback = Callable[[IngestReport], None]
+
+
+def _merge_reports(total: IngestReport, part: IngestReport) -> None:
+    total.doc_ids.extend(part.doc_ids)
+    total.new += part.new
+    total.skipped += part.skipped
+    total.updated += part.updated
 
 
 class IngestionService:
-    """Handles ingestion of manual snippets and uploaded files."""
+    """Handles ingestion of manual snippets and uploaded files.
+
+    Text is chunked incrementally and committed to the vector store in
+    batches of ``Settings.ingest_batch_size`` chunks, so memory stays bounded
+    regardless of document size.
+    """
 
-    def __init__(self, vector_store: LocalVectorStore) -> None:
+    chunk_size = 800
+    upload_dir = Path("data/uploads")
+
+    def __init__(self, vector_store: LocalVectorStore, settings: Settings | None = None) -> None:
         self.vector_store = vector_store
+        self.settings = settings or get_settings()
+
+    def _commit(self, chunks: List[str], metadata: dict) -> IngestReport:
+        return self.vector_store.upsert_texts(chunks, [metadata] * len(chunks))
+
+    def ingest_chunks(
+        self,
+        chunks: Iterable[str],
+        metadata: dict,
+        progress: Optional[ProgressCallback] = None,
+    ) -> IngestReport:
+        """Commit ``chunks`` to the vector store in bounded batches.
 
-    def ingest_text(self, title: str, text: str, metadata: dict | None = None) -> List[str]:
-        """Split text into manageable chunks and store them."""
+        ``progress`` is called with the running report after every batch.
+        """
+        report = IngestReport()
+        batch: List[str] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.settings.ingest_batch_size:
+                _merge_reports(report, self._commit(batch, metadata))
+                batch = []
+                if progress:
+                    progress(report)
+        if batch:
+            _merge_reports(report, self._commit(batch, metadata))
+            if progress:
+                progress(report)
+        return report
+
+    def ingest_text(
+        self,
+        title: str,
+        text: str,
+        metadata: dict | None = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> IngestReport:
+        """Split text into manageable chunks and store the ones not already present."""
         if not text.strip():
             raise ValueError("Text payload is empty.")
         metadata = metadata or {}
         metadata.setdefault("title", title)
-        chunk_size = 800
-        doc_ids = []
-        for chunk in textwrap.wrap(text.strip(), chunk_size, drop_whitespace=False):
-            doc_ids.append(self.vector_store.add_text(chunk, metadata=metadata))
-        return doc_ids
-
-    async def ingest_file(self, upload: UploadFile, metadata: dict | None = None) -> List[str]:
-        """Persist uploaded file temporarily and pipe the bytes through ingest_text."""
-        temp_path = Path(f"data/uploads/{upload.filename}")
-        temp_path.parent.mkdir(parents=True, exist_ok=True)
-        contents = await upload.read()
-        temp_path.write_bytes(contents)
-
-        text = contents.decode("utf-8", errors="ignore")
-        return self.ingest_text(title=upload.filename, text=text, metadata=metadata)
+        return self.ingest_chunks(iter_chunks([text], self.chunk_size), metadata, progress)
+
+    def ingest_path(
+        self,
+        path: Path,
+        title: str | None = None,
+        metadata: dict | None = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> IngestReport:
+        """Stream a UTF-8 file from disk into the vector store in bounded memory."""
+        metadata = metadata or {}
+        metadata.setdefault("title", title or path.name)
+        blocks = iter_file_blocks(path, self.settings.ingest_read_size)
+        chunks = iter_chunks(iter_decoded(blocks), self.chunk_size)
+        return self.ingest_chunks(chunks, metadata, progress)
+
+    async def save_upload(self, upload: UploadFile) -> Path:
+        """Spool an upload to ``data/uploads`` block by block and return its path.
+
+        Each upload gets its own file name, so two uploads of the same file
+        name never overwrite each other while queued.
+        """
+        filename = Path(upload.filename or "upload.txt").name
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.upload_dir / f"{uuid.uuid4().hex}-{filename}"
+        with open(temp_path, "wb") as handle:
+            while True:
+                block = await upload.read(self.settings.ingest_read_size)
+                if not block:
+                    break
+                await asyncio.to_thread(handle.write, block)
+        return temp_path
+
+    async def ingest_file(
+        self, upload: UploadFile, metadata: dict | None = None
+    ) -> IngestReport:
+        """Persist uploaded file and stream it through the chunker off the event loop."""
+        path = await self.save_upload(upload)
+        title = Path(upload.filename or path.name).name
+        try:
+            return await asyncio.to_thread(self.ingest_path, path, title, metadata)
+        finally:
+            path.unlink(missing_ok=True)
@@ -2,36 +2,143 @@
 
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import json
 import logging
-import json
-import logging
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, Optional
 
 from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, UploadFile
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response
 from sqlalchemy.orm import Session
 
-from .ai.pipeline import AutomationPipeline, DraftResponse
+from . import queries
+from .ai.pipeline import AutomationPipeline, DraftResponse, EarlyDelivery
 from .ai.vector_store import LocalVectorStore
 from .config import get_settings
-from .db import engine, get_session
+from .db import async_engine, engine, get_session, pipeline_session
+from .ingestion.jobs import IngestionJob, IngestionJobQueue
 from .ingestion.service import IngestionService
+from .messenger.events import extract_messages, group_by_sender, split_by_sender
 from .messenger.graph import MessengerGraphClient
-from .models import Base, Conversation, MessageLog
+from .messenger.queue import open_event_queue
+from .messenger.worker import WebhookWorkerPool
+from .migrations import ensure_indexes
+from .models import Base, Conversation
+from .observability.access_log import AccessLogMiddleware
+from .observability.log_queue import install_queue_logging, stop_queue_logging
+from .observability.metrics import CONTENT_TYPE, REGISTRY
+from .observability.tracing import tracer
 
 
 logger = logging.getLogger("webhook")
 
+WEBHOOK_SECONDS = REGISTRY.histogram(
+    "webhook_seconds",
+    "Webhook handling time: ingest (HTTP handler) and process (queued job).",
+    ("stage",),
+)
+
+
+def _job_response(job: IngestionJob) -> Dict[str, Any]:
+    return {"job_id": job.job_id, "status": job.status}
+
 
 def bootstrap_app() -> FastAPI:
     settings = get_settings()
     Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
 
     vector_store = LocalVectorStore(settings.chroma_path)
     pipeline = AutomationPipeline(vector_store=vector_store, settings=settings)
-    ingestion = IngestionService(vector_store=vector_store)
-    messenger_client = MessengerGraphClient(page_access_token=settings.page_access_token)
+    ingestion = IngestionService(vector_store=vector_store, settings=settings)
+    ingestion_jobs = IngestionJobQueue(ingestion, max_workers=settings.ingest_workers)
+    messenger_client = MessengerGraphClient(
+        page_access_token=settings.page_access_token, settings=settings
+    )
+
+    async def process_webhook(payload: Dict[str, Any]) -> None:
+        groups = group_by_sender(extract_messages(payload))
+        messages = sum(len(group) for group in groups.values())
+        with tracer.trace("webhook.process", senders=len(groups), messages=messages):
+            with WEBHOOK_SECONDS.time(stage="process"):
+                await respond_and_queue(groups)
+
+    async def respond_and_queue(groups: Dict[str, Any]) -> None:
+        deliveries = {}
+        replayed = {}
+        if settings.xai_streaming and messenger_client.page_access_token:
+            for sender_id in groups:
+                deliveries[sender_id] = EarlyDelivery(
+                    send=lambda text, to=sender_id: messenger_client.send_message(to, text),
+                    typing=lambda to=sender_id: messenger_client.send_typing(to),
+                )
+            # Early replies go out before the exchange is committed; if this
+            # job is retried, reuse the ones a previous attempt already sent.
+            mids = [message.mid for group in groups.values() for message in group if message.mid]
+            sent = await asyncio.to_thread(webhook_workers.queue.sent_replies, mids)
+            if sent:
+                replayed = {
+                    sender_id: [
+                        DraftResponse(**sent[message.mid]) if message.mid in sent else None
+                        for message in group
+                    ]
+                    for sender_id, group in groups.items()
+                }
+
+        async def remember(sender_id: str, index: int, draft: DraftResponse) -> None:
+            mid = groups[sender_id][index].mid
+            if mid:
+                await asyncio.to_thread(
+                    webhook_workers.queue.remember_reply, mid, dataclasses.asdict(draft)
+                )
+
+        async with pipeline_session() as session:
+            drafts = await pipeline.respond_many(
+                session,
+                {sender: [message.text for message in group] for sender, group in groups.items()},
+                deliveries=deliveries,
+                replayed=replayed,
+                on_delivered=remember,
+            )
+        # Delivery is its own job so a failed send is retried without
+        # re-running the pipeline or logging the conversation twice. Keying it
+        # on the sender queues it behind that sender's earlier jobs.
+        for sender_id, sender_drafts in drafts.items():
+            texts = [draft.undelivered for draft in sender_drafts if draft.undelivered]
+            if texts:
+                await webhook_workers.put(
+                    "send", {"recipient_id": sender_id, "texts": texts}, key=sender_id
+                )
+
+    async def deliver_reply(payload: Dict[str, Any]) -> None:
+        if not messenger_client.page_access_token:
+            logger.warning("PAGE_ACCESS_TOKEN is not configured; reply not sent.")
+            return
+        # Single-``text`` payloads were queued before sends were batched per
+        # sender; keep reading them so older queue files still drain.
+        texts = payload.get("texts") or [payload["text"]]
+        with tracer.trace("webhook.deliver", messages=len(texts)):
+            for index, text in enumerate(texts):
+                try:
+                    await messenger_client.send_message(payload["recipient_id"], text)
+                except Exception:
+                    if index == 0:
+                        raise
+                    # Requeue only the unsent tail so delivered replies are not repeated.
+                    await webhook_workers.put(
+                        "send",
+                        {"recipient_id": payload["recipient_id"], "texts": texts[index:]},
+                        key=payload["recipient_id"],
+                    )
+                    return
+
+    webhook_workers = WebhookWorkerPool(
+        open_event_queue(settings),
+        {"webhook": process_webhook, "send": deliver_reply},
+        settings=settings,
+    )
 
     app = FastAPI(
         title="Messenger Automation Backend",
@@ -39,24 +146,53 @@ def bootstrap_app() -> FastAPI:
         description="Automation pipeline integrating Messenger webhook, knowledge ingestion, and AI drafting.",
     )
 
-    @app.middleware("http")
-    async def log_requests(request: Request, call_next):
-        body = await request.body()
-        body_text = body.decode("utf-8", errors="ignore")
-        logger.info(
-            "HTTP %s %s headers=%s body=%s",
-            request.method,
-            request.url.path,
-            dict(request.headers),
-            body_text,
-        )
-        request._body = body
-        return await call_next(request)
+    app.add_middleware(
+        AccessLogMiddleware,
+        sample_rate=settings.access_log_sample_rate,
+        slow_ms=settings.access_log_slow_ms,
+        capture_body=settings.access_log_capture_body,
+        body_max_bytes=settings.access_log_body_max_bytes,
+    )
+
+    REGISTRY.gauge(
+        "cache_hit_ratio",
+        "Hit ratio of the in-process caches.",
+        lambda: {
+            ("answer",): pipeline.answer_cache.stats()["hit_rate"],
+            ("conversation",): pipeline.conversations.stats()["hit_rate"],
+        },
+        ("cache",),
+    )
+    REGISTRY.gauge(
+        "answer_coalesced_total",
+        "Questions that shared an identical in-flight xAI call.",
+        lambda: pipeline.inflight.stats()["coalesced"],
+        kind="counter",
+    )
+    REGISTRY.gauge(
+        "xai_circuit_open",
+        "1 while the xAI circuit breaker is open or half-open.",
+        lambda: float(pipeline.xai_client.breaker.state != "closed"),
+    )
+    REGISTRY.gauge(
+        "webhook_queue_jobs",
+        "Webhook/send jobs by queue state.",
+        lambda: {
+            (state,): value
+            for state, value in webhook_workers.queue.stats().items()
+            if state in ("depth", "in_flight", "dead_letters")
+        },
+        ("state",),
+    )
 
     @app.get("/healthz")
     def healthz() -> Dict[str, str]:
         return {"status": "ok", "environment": settings.environment}
 
+    @app.get("/metrics")
+    def metrics() -> Response:
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
     @app.get("/meta/webhook", response_class=PlainTextResponse)
     def verify_webhook(
         mode: str = Query(..., alias="hub.mode"),
@@ -69,104 +205,151 @@ def bootstrap_app() -> FastAPI:
         return verified
 
     @app.post("/meta/webhook")
-    async def ingest_event(
-        request: Request, session: Session = Depends(get_session)
-    ) -> Dict[str, str]:
+    async def ingest_event(request: Request) -> Dict[str, str]:
+        with tracer.trace("webhook.ingest"), WEBHOOK_SECONDS.time(stage="ingest"):
+            return await queue_event(request)
+
+    async def queue_event(request: Request) -> Dict[str, str]:
         raw_body = await request.body()
-        body_text = raw_body.decode("utf-8", errors="ignore")
-        logger.info("Webhook hit raw=%s", body_text)
         try:
-            payload: Dict[str, Any] = json.loads(body_text or "{}")
+            payload: Dict[str, Any] = json.loads(raw_body or b"{}")
         except json.JSONDecodeError as exc:
             logger.warning("Invalid JSON received: %s", exc)
             raise HTTPException(status_code=400, detail="Invalid payload")
 
-        entry = payload.get("entry", [{}])[0]
-        messaging = entry.get("messaging", [{}])[0]
-        sender_id = messaging.get("sender", {}).get("id")
-        message_text = messaging.get("message", {}).get("text")
-        if not sender_id or not message_text:
+        per_sender = split_by_sender(payload)
+        if not per_sender:
             raise HTTPException(status_code=400, detail="Invalid Messenger payload")
 
-        conversation = pipeline.ensure_conversation(
-            session=session, messenger_id=sender_id, incoming_text=message_text
-        )
-        normalized = message_text.strip().lower()
-        greeting_tokens = ("hello", "hi", "hey", "good morning", "good afternoon")
-
-        if any(normalized.startswith(token) for token in greeting_tokens):
-            draft = DraftResponse(
-                conversation_id=conversation.id,
-                answer="Ask me a question.",
-                confidence=0.4,
-                citations=[],
-            )
-        elif message_text.strip().endswith("?"):
-            draft = await pipeline.answer_question_via_xai(
-                message_text, conversation_id=conversation.id
-            )
-        else:
-            draft = pipeline.draft_reply(
-                message_text, conversation_id=conversation.id
-            )
-
-        pipeline.record_assistant_reply(session, conversation, draft)
-        session.commit()
-        try:
-            messenger_client.send_message(sender_id, draft.answer)
-        except Exception as exc:
-            logger.warning("Failed to send Messenger reply: %s", exc)
+        # One job per sender, keyed on the sender id, so each sender's
+        # messages are processed in order across webhook batches and workers.
+        for sender_id, sender_payload in per_sender.items():
+            await webhook_workers.put("webhook", sender_payload, key=sender_id)
         return {"status": "queued"}
 
-    @app.post("/admin/knowledge/text")
+    @app.get("/admin/webhook/dead-letters")
+    def list_dead_letters(limit: int = Query(50, ge=1, le=500)) -> Dict[str, Any]:
+        jobs = webhook_workers.queue.dead_letters(limit)
+        return {"items": [job.as_dict() for job in jobs]}
+
+    @app.post("/admin/webhook/dead-letters/{job_id}/retry")
+    async def retry_dead_letter(job_id: int) -> Dict[str, Any]:
+        if not await webhook_workers.requeue(job_id):
+            raise HTTPException(status_code=404, detail="Unknown dead-lettered job")
+        return {"job_id": job_id, "status": "queued"}
+
+    @app.on_event("startup")
+    def start_webhook_workers() -> None:
+        install_queue_logging(settings.log_level)
+        tracer.configure(settings.trace_path, settings.trace_sample_rate)
+        webhook_workers.start()
+
+    @app.on_event("shutdown")
+    async def stop_webhook_workers() -> None:
+        await webhook_workers.stop()
+        webhook_workers.queue.close()
+        await messenger_client.aclose()
+        await pipeline.xai_client.aclose()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+    @app.on_event("shutdown")
+    def stop_ingestion_jobs() -> None:
+        ingestion_jobs.shutdown()
+        tracer.close()
+        stop_queue_logging()
+
+    @app.post("/admin/knowledge/text", status_code=202)
     async def upload_text_snippet(
         payload: Dict[str, Any],
     ) -> Dict[str, Any]:
         title = payload.get("title")
         text = payload.get("text")
         metadata = payload.get("metadata") or {}
-        if not title or not text:
+        if not title or not text or not str(text).strip():
             raise HTTPException(status_code=422, detail="Missing title or text payload")
-        doc_ids = ingestion.ingest_text(title=title, text=text, metadata=metadata)
-        return {"ingested": len(doc_ids), "doc_ids": doc_ids}
+        job = ingestion_jobs.submit_text(title=title, text=text, metadata=metadata)
+        return _job_response(job)
 
-    @app.post("/admin/knowledge/file")
+    @app.post("/admin/knowledge/file", status_code=202)
     async def upload_file_snippet(
         file: UploadFile = File(...),
     ) -> Dict[str, Any]:
-        doc_ids = await ingestion.ingest_file(file)
-        return {"ingested": len(doc_ids), "doc_ids": doc_ids}
+        path = await ingestion.save_upload(file)
+        title = Path(file.filename or path.name).name
+        job = ingestion_jobs.submit_file(path, title=title, delete_after=True)
+        return _job_response(job)
+
+    @app.post("/admin/knowledge/bulk", status_code=202)
+    def bulk_ingest(payload: Dict[str, Any]) -> Dict[str, Any]:
+        root = settings.bulk_ingest_root.resolve()
+        paths = []
+        for item in payload.get("paths") or ["."]:
+            path = (root / str(item)).resolve()
+            if not path.is_relative_to(root) or not path.exists():
+                raise HTTPException(
+                    status_code=422, detail=f"Path not found under bulk ingest root: {item}"
+                )
+            paths.append(path)
+        job = ingestion_jobs.submit_bulk(paths, metadata=payload.get("metadata") or {})
+        return _job_response(job)
+
+    @app.get("/admin/knowledge/jobs")
+    def list_ingestion_jobs() -> Dict[str, Any]:
+        return {"items": [job.as_dict() for job in ingestion_jobs.list()]}
+
+    @app.get("/admin/knowledge/jobs/{job_id}")
+    def get_ingestion_job(job_id: str) -> Dict[str, Any]:
+        job = ingestion_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown ingestion job")
+        return job.as_dict(include_doc_ids=True)
+
+    @app.get("/admin/stats")
+    def admin_stats() -> Dict[str, Any]:
+        return {
+            "vector_store": vector_store.cache_stats(),
+            "ingestion_jobs": ingestion_jobs.stats(),
+            "webhook_queue": webhook_workers.stats(),
+            "graph_api": messenger_client.stats(),
+            "xai": pipeline.xai_client.stats(),
+            "answer_cache": pipeline.answer_cache.stats(),
+            "answer_coalescing": pipeline.inflight.stats(),
+            "conversation_cache": pipeline.conversations.stats(),
+        }
 
     @app.get("/admin/conversations")
     def list_conversations(
         limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = Query(None),
+        status: Optional[str] = Query(None),
+        min_confidence: Optional[float] = Query(None, ge=0, le=1),
+        max_confidence: Optional[float] = Query(None, ge=0, le=1),
         session: Session = Depends(get_session),
     ) -> Dict[str, Any]:
-        conversations: List[Conversation] = (
-            session.query(Conversation)
-            .order_by(Conversation.updated_at.desc())
-            .limit(limit)
-            .all()
-        )
-        data = []
-        for convo in conversations:
-            last_message: Optional[MessageLog] = (
-                session.query(MessageLog)
-                .filter_by(conversation_id=convo.id)
-                .order_by(MessageLog.created_at.desc())
-                .first()
-            )
-            data.append(
-                {
-                    "id": convo.id,
-                    "status": convo.status,
-                    "confidence": convo.confidence,
-                    "preview": convo.last_message_preview,
-                    "last_message": last_message.content if last_message else None,
-                    "updated_at": convo.updated_at.isoformat(),
-                }
+        try:
+            data, next_cursor = queries.list_conversations(
+                session,
+                limit=limit,
+                cursor=cursor,
+                status=status,
+                min_confidence=min_confidence,
+                max_confidence=max_confidence,
             )
-        return {"items": data, "count": len(data)}
+        except queries.InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return {"items": data, "count": len(data), "next_cursor": next_cursor}
+
+    @app.post("/admin/conversations/{conversation_id}/close")
+    def close_conversation(
+        conversation_id: int, session: Session = Depends(get_session)
+    ) -> Dict[str, Any]:
+        conversation = session.get(Conversation, conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Unknown conversation.")
+        pipeline.close_conversation(session, conversation)
+        session.commit()
+        return {"id": conversation.id, "status": conversation.status}
 
     return app
 
@@ -0,0 +1,75 @@
+"""Parsing of Messenger webhook payloads."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class IncomingMessage:
+    """A text message extracted from a webhook batch."""
+
+    sender_id: str
+    text: str
+    timestamp: int = 0
+    mid: Optional[str] = None
+
+
+def _message_events(payload: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], IncomingMessage]]:
+    entries = payload.get("entry") if isinstance(payload, dict) else None
+    for entry in entries if isinstance(entries, list) else []:
+        events = entry.get("messaging") if isinstance(entry, dict) else None
+        for event in events if isinstance(events, list) else []:
+            if not isinstance(event, dict):
+                continue
+            sender_id = (event.get("sender") or {}).get("id")
+            message = event.get("message") or {}
+            text = message.get("text")
+            if not sender_id or not text or message.get("is_echo"):
+                continue
+            yield event, IncomingMessage(
+                sender_id=str(sender_id),
+                text=text,
+                timestamp=int(event.get("timestamp") or 0),
+                mid=message.get("mid"),
+            )
+
+
+def extract_messages(payload: Dict[str, Any]) -> List[IncomingMessage]:
+    """Return every inbound text message in ``payload``, in delivery order.
+
+    Meta batches several ``entry`` items, each with several ``messaging``
+    events, into one POST. Echoes of the page's own messages and non-text
+    events (delivery/read receipts, postbacks) are skipped.
+    """
+    return [message for _, message in _message_events(payload)]
+
+
+def split_by_sender(payload: Dict[str, Any]) -> "OrderedDict[str, Dict[str, Any]]":
+    """Split a webhook batch into one payload per sender.
+
+    Each payload holds only that sender's text message events, in batch
+    order, so it can be queued and processed on its own.
+    """
+    events: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for event, message in _message_events(payload):
+        events.setdefault(message.sender_id, []).append(event)
+    return OrderedDict(
+        (sender_id, {"object": payload.get("object"), "entry": [{"messaging": items}]})
+        for sender_id, items in events.items()
+    )
+
+
+def group_by_sender(messages: List[IncomingMessage]) -> "OrderedDict[str, List[IncomingMessage]]":
+    """Group messages per sender, each group ordered by event timestamp.
+
+    The sort is stable, so events without timestamps keep their batch order.
+    """
+    groups: "OrderedDict[str, List[IncomingMessage]]" = OrderedDict()
+    for message in messages:
+        groups.setdefault(message.sender_id, []).append(message)
+    for group in groups.values():
+        group.sort(key=lambda message: message.timestamp)
+    return groups
@@ -2,20 +2,142 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+import importlib.util
+import json
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import httpx
 
-from ..config import get_settings
+from ..config import Settings, get_settings
+from ..observability.metrics import REGISTRY
+from ..observability.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+SEND_SECONDS = REGISTRY.histogram(
+    "graph_send_seconds",
+    "Send API call latency including rate limiting and retries.",
+    ("kind", "outcome"),
+)
+RESPONSES = REGISTRY.counter(
+    "graph_responses_total", "Send API HTTP responses by status code.", ("status",)
+)
+
+# Headers in which Graph reports how much of the rate limit budget is used.
+USAGE_HEADERS = ("x-business-use-case-usage", "x-app-usage", "x-page-usage", "x-ad-account-usage")
+
+
+class GraphAPIError(RuntimeError):
+    """A Send API call that failed; ``retryable`` is False for client errors."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = True):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """Async token bucket that can be slowed or paused by server feedback."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.scale = 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                rate = self.rate * self.scale
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / rate)
+
+
+def usage_from_headers(headers: httpx.Headers) -> Tuple[float, float]:
+    """Return (highest usage percentage, seconds until access is regained).
+
+    ``X-App-Usage``/``X-Page-Usage`` hold a flat object of percentages;
+    ``X-Business-Use-Case-Usage`` maps business ids to lists of such objects
+    with an ``estimated_time_to_regain_access`` in minutes.
+    """
+    highest, regain = 0.0, 0.0
+    for name in USAGE_HEADERS:
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(data, dict):
+            continue
+        buckets: List[dict] = []
+        if any(isinstance(value, list) for value in data.values()):
+            for value in data.values():
+                buckets.extend(item for item in value if isinstance(item, dict))
+        else:
+            buckets.append(data)
+        for bucket in buckets:
+            for key in ("call_count", "total_cputime", "total_time"):
+                value = bucket.get(key)
+                if isinstance(value, (int, float)):
+                    highest = max(highest, float(value))
+            minutes = bucket.get("estimated_time_to_regain_access")
+            if isinstance(minutes, (int, float)):
+                regain = max(regain, 60.0 * minutes)
+    return highest, regain
+
+
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
 
 
 class MessengerGraphClient:
-    """Send messages and perform webhook verification."""
+    """Send messages and perform webhook verification.
 
-    def __init__(self, page_access_token: Optional[str] = None) -> None:
-        settings = get_settings()
-        self.page_access_token = page_access_token or settings.page_access_token
-        self.base_url = str(settings.graph_api_base_url).rstrip("/")
+    Sends go through one pooled ``httpx.AsyncClient`` (HTTP/2 when the ``h2``
+    package is installed) created on first use and closed by :meth:`aclose`.
+    Requests are paced by a token bucket that slows down as Graph's usage
+    headers approach their limits and pauses when Graph asks us to back off;
+    429 and 5xx responses are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        page_access_token: Optional[str] = None,
+        settings: Settings | None = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.settings = settings or get_settings()
+        self.page_access_token = page_access_token or self.settings.page_access_token
+        self.base_url = str(self.settings.graph_api_base_url).rstrip("/")
+        self.bucket = TokenBucket(self.settings.graph_rate_limit_per_second)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats: Dict[str, float] = {"sent": 0, "retried": 0, "failed": 0, "throttled": 0}
 
     def verify_webhook(self, mode: str, token: str, challenge: str) -> Optional[str]:
         """Validate the verification token."""
@@ -24,17 +146,141 @@ class MessengerGraphClient:
             return challenge
         return None
 
-    def send_message(self, recipient_id: str, text: str) -> Dict[str, Any]:
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self._transport is None and importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=self.settings.graph_max_connections,
+                    max_keepalive_connections=self.settings.graph_max_connections,
+                ),
+                timeout=self.settings.graph_timeout_seconds,
+                transport=self._transport,
+            )
+        return self._client
+
+    def _observe(self, response: httpx.Response) -> None:
+        usage, regain = usage_from_headers(response.headers)
+        if any(name in response.headers for name in USAGE_HEADERS):
+            # Scale the send rate down linearly from 75% to 100% usage.
+            self.bucket.scale = 1.0 if usage < 75 else max(0.05, (100 - usage) / 25)
+        if regain:
+            self.bucket.pause(regain)
+        if response.status_code == 429 or regain:
+            self._stats["throttled"] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return min(30.0, 0.5 * 2**attempt) * random.uniform(0.5, 1.0)
+
+    async def send_message(self, recipient_id: str, text: str) -> Dict[str, Any]:
         """Send an outbound message via Graph API."""
+        return await self._send(
+            {
+                "recipient": {"id": recipient_id},
+                "message": {"text": text},
+                "messaging_type": "RESPONSE",
+            }
+        )
+
+    async def send_typing(self, recipient_id: str, on: bool = True) -> Dict[str, Any]:
+        """Show (or hide) the typing indicator in the recipient's thread."""
+        return await self._send(
+            {
+                "recipient": {"id": recipient_id},
+                "sender_action": "typing_on" if on else "typing_off",
+            }
+        )
+
+    async def _send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        kind = "message" if "message" in payload else "sender_action"
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with tracer.span("graph.send", kind=kind):
+                result = await self._send_with_retries(payload)
+            outcome = "ok"
+            return result
+        finally:
+            SEND_SECONDS.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+
+    async def _send_with_retries(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         if not self.page_access_token:
-            raise RuntimeError("PAGE_ACCESS_TOKEN is not configured.")
-        payload = {
-            "recipient": {"id": recipient_id},
-            "message": {"text": text},
-            "messaging_type": "RESPONSE",
-        }
-        url = f"{self.base_url}/me/messages"
+            raise GraphAPIError("PAGE_ACCESS_TOKEN is not configured.", retryable=False)
         params = {"access_token": self.page_access_token}
-        response = httpx.post(url, params=params, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        attempts = max(1, self.settings.graph_max_retries + 1)
+        for attempt in range(attempts):
+            await self.bucket.acquire()
+            try:
+                response = await self.client.post("/me/messages", params=params, json=payload)
+            except httpx.TransportError as exc:
+                RESPONSES.inc(status="transport_error")
+                error: GraphAPIError = GraphAPIError(f"Graph API unreachable: {exc}")
+                delay = self._backoff(attempt)
+            else:
+                RESPONSES.inc(status=response.status_code)
+                self._observe(response)
+                if response.is_success:
+                    self._stats["sent"] += 1
+                    return response.json()
+                retryable = response.status_code == 429 or response.status_code >= 500
+                error = GraphAPIError(
+                    f"Graph API returned {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code,
+                    retryable=retryable,
+                )
+                if not retryable:
+                    break
+                delay = _retry_after(response.headers) or self._backoff(attempt)
+                if response.status_code == 429:
+                    self.bucket.pause(delay)
+            if attempt + 1 < attempts:
+                self._stats["retried"] += 1
+                logger.info("Retrying Graph send in %.2fs: %s", delay, error)
+                await asyncio.sleep(delay)
+        self._stats["failed"] += 1
+        raise error
+
+    async def send_messages(
+        self, messages: Sequence[Tuple[str, str]], concurrency: int = 16
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """Send ``(recipient_id, text)`` pairs concurrently over the shared pool.
+
+        Messages to the same recipient are sent one after another in the
+        given order. Returns one result per message: the Graph response, or
+        the exception if that message could not be delivered (later messages
+        to the same recipient are then not attempted).
+        """
+        by_recipient: "OrderedDict[str, List[int]]" = OrderedDict()
+        for position, (recipient_id, _) in enumerate(messages):
+            by_recipient.setdefault(recipient_id, []).append(position)
+        results: List[Union[Dict[str, Any], Exception]] = [None] * len(messages)  # type: ignore[list-item]
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def send_in_order(recipient_id: str, positions: List[int]) -> None:
+            async with semaphore:
+                for index, position in enumerate(positions):
+                    try:
+                        results[position] = await self.send_message(
+                            recipient_id, messages[position][1]
+                        )
+                    except Exception as exc:
+                        for skipped in positions[index:]:
+                            results[skipped] = exc
+                        return
+
+        await asyncio.gather(
+            *(send_in_order(recipient, positions) for recipient, positions in by_recipient.items())
+        )
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        data = dict(self._stats)
+        data["rate_scale"] = self.bucket.scale
+        return data
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,381 @@
+"""Durable local work queue for webhook processing.
+
+Jobs live in a SQLite table (WAL mode) so anything acknowledged to Meta
+survives a restart; several app processes may share one queue file. Workers
+*lease* a job, and a lease that is not acked before it expires (the worker
+crashed) makes the job claimable again. Jobs that keep failing are parked in
+a dead-letter state for inspection and manual requeue.
+
+A job may carry an ordering key (the Messenger sender id): a keyed job is
+only claimable once every older live job with the same key has been acked,
+so one sender's jobs run one at a time and in order, whichever worker or
+process claims them. Dead-lettered jobs no longer hold their key.
+
+The queue also remembers, for ``reply_retention_seconds``, the replies a job
+already sent to a customer, keyed by the Messenger message id, so a retried
+job can skip them instead of sending them twice.
+
+:class:`MemoryEventQueue` implements the same interface without durability and
+is used when the queue file cannot be opened.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from ..config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LEASED = "leased"
+DEAD = "dead"
+
+
+@dataclass
+class QueuedJob:
+    """A unit of work claimed from the queue."""
+
+    job_id: int
+    kind: str
+    payload: dict
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "payload": self.payload,
+            "attempts": self.attempts,
+            "enqueued_at": self.enqueued_at,
+            "last_error": self.last_error,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    leased_until REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_available ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS sent_replies (
+    message_id TEXT PRIMARY KEY,
+    reply TEXT NOT NULL,
+    sent_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sent_replies_sent_at ON sent_replies (sent_at);
+"""
+
+_RUNNABLE = (
+    "((j.status = ? AND j.available_at <= ?) OR (j.status = ? AND j.leased_until < ?)) "
+    "AND (j.ordering_key IS NULL OR NOT EXISTS ("
+    "SELECT 1 FROM jobs AS o WHERE o.ordering_key = j.ordering_key AND o.id < j.id "
+    "AND o.status != ?))"
+)
+
+
+class SQLiteEventQueue:
+    """Queue persisted in a SQLite database file."""
+
+    durable = True
+
+    def __init__(
+        self, path: Path, lease_seconds: float = 120.0, reply_retention_seconds: float = 86400.0
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.reply_retention_seconds = reply_retention_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "ordering_key" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN ordering_key TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_ordering_key ON jobs (ordering_key, id)"
+        )
+
+    def put(
+        self, kind: str, payload: dict, delay: float = 0.0, key: Optional[str] = None
+    ) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, payload, enqueued_at, available_at, ordering_key) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), now, now + delay, key),
+            )
+            return int(cursor.lastrowid)
+
+    def claim(self) -> Optional[QueuedJob]:
+        """Lease the oldest runnable job, or return ``None`` if there is none.
+
+        A keyed job is skipped while an older job with the same key is live.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT j.id, j.kind, j.payload, j.attempts, j.enqueued_at, j.last_error "
+                    f"FROM jobs AS j WHERE {_RUNNABLE} ORDER BY j.available_at, j.id LIMIT 1",
+                    (PENDING, now, LEASED, now, DEAD),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, leased_until = ? "
+                        "WHERE id = ?",
+                        (LEASED, now + self.lease_seconds, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return QueuedJob(
+            job_id=row[0],
+            kind=row[1],
+            payload=json.loads(row[2]),
+            attempts=row[3] + 1,
+            enqueued_at=row[4],
+            last_error=row[5],
+        )
+
+    def ack(self, job: QueuedJob) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.job_id,))
+
+    def retry(self, job: QueuedJob, error: str, delay: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, leased_until = NULL, "
+                "last_error = ? WHERE id = ?",
+                (PENDING, time.time() + delay, error, job.job_id),
+            )
+
+    def dead_letter(self, job: QueuedJob, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, leased_until = NULL, last_error = ? WHERE id = ?",
+                (DEAD, error, job.job_id),
+            )
+
+    def dead_letters(self, limit: int = 50) -> List[QueuedJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload, attempts, enqueued_at, last_error FROM jobs "
+                "WHERE status = ? ORDER BY id DESC LIMIT ?",
+                (DEAD, limit),
+            ).fetchall()
+        return [
+            QueuedJob(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5]) for row in rows
+        ]
+
+    def requeue(self, job_id: int) -> bool:
+        """Move a dead-lettered job back to the queue with a fresh retry budget."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ? "
+                "WHERE id = ? AND status = ?",
+                (PENDING, time.time(), job_id, DEAD),
+            )
+            return cursor.rowcount > 0
+
+    def remember_reply(self, message_id: str, reply: dict) -> None:
+        """Record a reply already sent for ``message_id``; prunes expired entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sent_replies (message_id, reply, sent_at) VALUES (?, ?, ?)",
+                (message_id, json.dumps(reply), now),
+            )
+            self._conn.execute(
+                "DELETE FROM sent_replies WHERE sent_at < ?", (now - self.reply_retention_seconds,)
+            )
+
+    def sent_replies(self, message_ids: Sequence[str]) -> Dict[str, dict]:
+        """Replies remembered for any of ``message_ids``, keyed by message id."""
+        if not message_ids:
+            return {}
+        placeholders = ", ".join("?" * len(message_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT message_id, reply FROM sent_replies WHERE message_id IN ({placeholders}) "
+                "AND sent_at >= ?",
+                (*message_ids, time.time() - self.reply_retention_seconds),
+            ).fetchall()
+        return {row[0]: json.loads(row[1]) for row in rows}
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        now = time.time()
+        with self._lock:
+            counts = dict(
+                self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            )
+            oldest = self._conn.execute(
+                "SELECT MIN(enqueued_at) FROM jobs WHERE status != ?", (DEAD,)
+            ).fetchone()[0]
+        return {
+            "depth": counts.get(PENDING, 0) + counts.get(LEASED, 0),
+            "in_flight": counts.get(LEASED, 0),
+            "dead_letters": counts.get(DEAD, 0),
+            "oldest_age_seconds": now - oldest if oldest is not None else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryEventQueue:
+    """Non-durable fallback with the same interface as :class:`SQLiteEventQueue`."""
+
+    durable = False
+
+    def __init__(
+        self, lease_seconds: float = 120.0, reply_retention_seconds: float = 86400.0
+    ) -> None:
+        self.lease_seconds = lease_seconds
+        self.reply_retention_seconds = reply_retention_seconds
+        self._lock = threading.Lock()
+        self._next_id = 1
+        # job_id -> [job, status, available_at, leased_until, ordering_key]
+        self._jobs: Dict[int, list] = {}
+        # message_id -> (sent_at, reply), oldest first
+        self._sent: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def put(
+        self, kind: str, payload: dict, delay: float = 0.0, key: Optional[str] = None
+    ) -> int:
+        now = time.time()
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = [QueuedJob(job_id, kind, payload), PENDING, now + delay, None, key]
+            return job_id
+
+    def claim(self) -> Optional[QueuedJob]:
+        now = time.time()
+        with self._lock:
+            # Oldest live job per ordering key; only it may run.
+            heads: Dict[str, int] = {}
+            for job_id, entry in self._jobs.items():
+                if entry[4] is not None and entry[1] != DEAD:
+                    heads[entry[4]] = min(job_id, heads.get(entry[4], job_id))
+            runnable = [
+                (entry[2], job_id)
+                for job_id, entry in self._jobs.items()
+                if (
+                    (entry[1] == PENDING and entry[2] <= now)
+                    or (entry[1] == LEASED and entry[3] < now)
+                )
+                and (entry[4] is None or heads[entry[4]] == job_id)
+            ]
+            if not runnable:
+                return None
+            entry = self._jobs[min(runnable)[1]]
+            entry[1], entry[3] = LEASED, now + self.lease_seconds
+            entry[0].attempts += 1
+            return entry[0]
+
+    def ack(self, job: QueuedJob) -> None:
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+
+    def retry(self, job: QueuedJob, error: str, delay: float) -> None:
+        with self._lock:
+            entry = self._jobs[job.job_id]
+            entry[0].last_error = error
+            entry[1], entry[2], entry[3] = PENDING, time.time() + delay, None
+
+    def dead_letter(self, job: QueuedJob, error: str) -> None:
+        with self._lock:
+            entry = self._jobs[job.job_id]
+            entry[0].last_error = error
+            entry[1], entry[3] = DEAD, None
+
+    def dead_letters(self, limit: int = 50) -> List[QueuedJob]:
+        with self._lock:
+            dead = [entry[0] for entry in self._jobs.values() if entry[1] == DEAD]
+        return sorted(dead, key=lambda job: job.job_id, reverse=True)[:limit]
+
+    def requeue(self, job_id: int) -> bool:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[1] != DEAD:
+                return False
+            entry[0].attempts = 0
+            entry[1], entry[2] = PENDING, time.time()
+            return True
+
+    def remember_reply(self, message_id: str, reply: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._sent.pop(message_id, None)
+            self._sent[message_id] = (now, reply)
+            cutoff = now - self.reply_retention_seconds
+            while self._sent and next(iter(self._sent.values()))[0] < cutoff:
+                self._sent.popitem(last=False)
+
+    def sent_replies(self, message_ids: Sequence[str]) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                message_id: self._sent[message_id][1]
+                for message_id in message_ids
+                if message_id in self._sent
+            }
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        now = time.time()
+        with self._lock:
+            live = [entry for entry in self._jobs.values() if entry[1] != DEAD]
+            dead = len(self._jobs) - len(live)
+        return {
+            "depth": len(live),
+            "in_flight": sum(1 for entry in live if entry[1] == LEASED),
+            "dead_letters": dead,
+            "oldest_age_seconds": (
+                now - min(entry[0].enqueued_at for entry in live) if live else None
+            ),
+        }
+
+    def close(self) -> None:
+        pass
+
+
+EventQueue = Union[SQLiteEventQueue, MemoryEventQueue]
+
+
+def open_event_queue(settings: Settings | None = None) -> EventQueue:
+    """Open the configured queue, falling back to memory if SQLite is unusable."""
+    settings = settings or get_settings()
+    target = settings.webhook_queue_path
+    if target and str(target) != ":memory:":
+        try:
+            return SQLiteEventQueue(Path(target), settings.webhook_lease_seconds)
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("Webhook queue at %s unavailable (%s); using memory.", target, exc)
+    return MemoryEventQueue(settings.webhook_lease_seconds)
@@ -0,0 +1,191 @@
+"""Async worker pool that drains the webhook queue."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..config import Settings, get_settings
+from ..observability.metrics import REGISTRY
+from .queue import EventQueue, QueuedJob
+
+logger = logging.getLogger(__name__)
+
+QUEUE_ERRORS = REGISTRY.counter(
+    "webhook_queue_errors_total",
+    "Queue operations (claim, ack, retry, dead_letter) that raised in a worker.",
+    ("operation",),
+)
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+
+class WebhookWorkerPool:
+    """Runs queued jobs on ``Settings.webhook_workers`` asyncio tasks.
+
+    Each job kind has its own handler. A handler that raises is retried with
+    jittered exponential backoff until ``webhook_max_attempts`` is reached,
+    after which the job is dead-lettered. Exceptions with a false
+    ``retryable`` attribute are dead-lettered straight away.
+
+    A failing queue operation (e.g. ``database is locked``) never ends a
+    worker: it is logged and counted in ``queue_errors``; a failed claim
+    backs off before the next one, and a job that could not be settled runs
+    again once its lease expires.
+    """
+
+    def __init__(
+        self,
+        queue: EventQueue,
+        handlers: Dict[str, JobHandler],
+        settings: Settings | None = None,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self.queue = queue
+        self.handlers = handlers
+        self.settings = settings or get_settings()
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stats: Dict[str, float] = {
+            "processed": 0,
+            "retried": 0,
+            "dead_lettered": 0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0,
+            "busy_seconds": 0.0,
+            "queue_errors": 0,
+        }
+
+    async def put(self, kind: str, payload: dict, key: Optional[str] = None) -> int:
+        """Durably enqueue a job and wake an idle worker.
+
+        Jobs sharing ``key`` run one at a time, in the order they were put.
+        """
+        job_id = await asyncio.to_thread(self.queue.put, kind, payload, 0.0, key)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"webhook-worker-{index}")
+            for index in range(max(1, self.settings.webhook_workers))
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(
+            self.settings.webhook_retry_max_seconds,
+            self.settings.webhook_retry_base_seconds * 2 ** (attempts - 1),
+        )
+        return delay * random.uniform(0.5, 1.0)
+
+    def _queue_error(self, operation: str) -> None:
+        self._stats["queue_errors"] += 1
+        QUEUE_ERRORS.inc(operation=operation)
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            # Clear before claiming so a put() racing with an empty claim wakes us.
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self.queue.claim)
+            except Exception:
+                failures += 1
+                self._queue_error("claim")
+                delay = self._backoff(failures)
+                logger.exception("Claiming a webhook job failed; retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # _process handles handler and queue errors; this is a last resort.
+                logger.exception("Webhook worker failed on %s job %s", job.kind, job.job_id)
+
+    async def _settle(self, operation: str, job: QueuedJob, *args: object) -> bool:
+        """Run ``queue.<operation>(job, *args)``; on failure log it and leave the lease."""
+        try:
+            await asyncio.to_thread(getattr(self.queue, operation), job, *args)
+        except Exception:
+            self._queue_error(operation)
+            logger.exception(
+                "Could not %s %s job %s; it runs again once its lease expires.",
+                operation.replace("_", "-"),
+                job.kind,
+                job.job_id,
+            )
+            return False
+        return True
+
+    async def _process(self, job: QueuedJob) -> None:
+        started = time.time()
+        lag = started - job.enqueued_at
+        self._stats["last_lag_seconds"] = lag
+        self._stats["max_lag_seconds"] = max(self._stats["max_lag_seconds"], lag)
+        try:
+            handler = self.handlers[job.kind]
+            await handler(job.payload)
+        except asyncio.CancelledError:
+            # Shutdown: leave the lease to expire so the job runs again.
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if (
+                job.attempts >= self.settings.webhook_max_attempts
+                or job.kind not in self.handlers
+                or not getattr(exc, "retryable", True)
+            ):
+                logger.error("Dead-lettering %s job %s: %s", job.kind, job.job_id, error)
+                if await self._settle("dead_letter", job, error):
+                    self._stats["dead_lettered"] += 1
+            else:
+                delay = self._backoff(job.attempts)
+                logger.warning(
+                    "Retrying %s job %s in %.1fs (attempt %s): %s",
+                    job.kind,
+                    job.job_id,
+                    delay,
+                    job.attempts,
+                    error,
+                )
+                if await self._settle("retry", job, error, delay):
+                    self._stats["retried"] += 1
+        else:
+            if await self._settle("ack", job):
+                self._stats["processed"] += 1
+        finally:
+            self._stats["busy_seconds"] += time.time() - started
+
+    async def requeue(self, job_id: int) -> bool:
+        requeued = await asyncio.to_thread(self.queue.requeue, job_id)
+        if requeued and self._wakeup is not None:
+            self._wakeup.set()
+        return requeued
+
+    def stats(self) -> Dict[str, object]:
+        data: Dict[str, object] = dict(self.queue.stats())
+        data.update(self._stats)
+        data["workers"] = len(self._tasks)
+        data["durable"] = self.queue.durable
+        return data
@@ -0,0 +1,124 @@
+"""Schema upgrades for existing databases and a query-plan check for hot paths.
+
+``Base.metadata.create_all`` only creates missing tables, so indexes added to
+the models later never reach a database created before them.
+:func:`ensure_indexes` fills that gap at startup. Large Postgres databases
+should instead apply ``migrations/*.sql`` (which builds indexes
+``CONCURRENTLY``) ahead of a deploy.
+
+Run ``python -m app.migrations --check-plans`` to print the plans of the
+webhook/admin hot-path queries and fail if any of them scans a whole table.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Executable
+
+from .models import Base, Conversation, EscalationTicket, MessageLog
+from .queries import conversation_page_query
+
+
+def ensure_indexes(bind: Engine) -> List[str]:
+    """Create model indexes missing from existing tables; returns their names."""
+    inspector = inspect(bind)
+    created: List[str] = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
+                created.append(index.name)
+    return created
+
+
+# (name, tables that must be reached through an index, statement)
+HOT_PATH_QUERIES: Sequence[Tuple[str, Sequence[str], Callable[[], Executable]]] = (
+    (
+        "open conversation for user",
+        ("conversations",),
+        lambda: select(Conversation)
+        .filter_by(user_id=1, status="open")
+        .order_by(Conversation.updated_at.desc())
+        .limit(1),
+    ),
+    (
+        "latest messages of a conversation",
+        ("message_logs",),
+        lambda: select(MessageLog)
+        .filter_by(conversation_id=1)
+        .order_by(MessageLog.created_at.desc(), MessageLog.id.desc())
+        .limit(1),
+    ),
+    (
+        "admin conversation page",
+        ("conversations", "message_logs"),
+        lambda: conversation_page_query(51, status="open"),
+    ),
+    (
+        "escalations of a conversation",
+        ("escalation_tickets",),
+        lambda: select(EscalationTicket).filter_by(conversation_id=1),
+    ),
+)
+
+
+def explain(bind: Engine, statement: Executable) -> List[str]:
+    sql = str(statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+    with bind.connect() as connection:
+        if bind.dialect.name == "sqlite":
+            rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+            return [row[-1] for row in rows]
+        if bind.dialect.name == "postgresql":
+            # Tiny tables are always cheaper to scan; ask whether an index *can* be used.
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            return [row[0] for row in connection.execute(text(f"EXPLAIN {sql}")).all()]
+    raise NotImplementedError(f"No plan check for {bind.dialect.name}.")
+
+
+def full_scans(plan: Sequence[str], tables: Sequence[str]) -> List[str]:
+    """Plan lines in which one of ``tables`` is read without an index."""
+    bad = []
+    for line in plan:
+        for table in tables:
+            if f"SCAN {table}" in line and "INDEX" not in line:  # SQLite
+                bad.append(line)
+            elif f"Seq Scan on {table}" in line:  # Postgres
+                bad.append(line)
+    return bad
+
+
+def check_query_plans(bind: Engine) -> List[Tuple[str, List[str], List[str]]]:
+    """Return ``(name, plan, offending lines)`` for every hot-path query."""
+    results = []
+    for name, tables, build in HOT_PATH_QUERIES:
+        plan = explain(bind, build())
+        results.append((name, plan, full_scans(plan, tables)))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from .db import engine
+
+    parser = argparse.ArgumentParser(description="Add missing indexes and check query plans.")
+    parser.add_argument("--check-plans", action="store_true")
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    for name in ensure_indexes(engine):
+        print(f"Created index {name}")
+    if args.check_plans:
+        failed = False
+        for name, plan, offending in check_query_plans(engine):
+            print(f"{'FAIL' if offending else 'ok  '} {name}")
+            for line in plan:
+                print(f"       {line}")
+            failed = failed or bool(offending)
+        sys.exit(1 if failed else 0)
@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, JSON, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, JSON, String, Text, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -32,6 +32,12 @@ class Conversation(Base):
     """A conversation made up of inbound and outbound messages."""
 
     __tablename__ = "conversations"
+    __table_args__ = (
+        # ensure_conversation: open conversation for a user, newest first.
+        Index("ix_conversations_user_status_updated", "user_id", "status", "updated_at"),
+        # Admin listing: keyset pagination on (updated_at, id).
+        Index("ix_conversations_updated_id", "updated_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -61,6 +67,9 @@ class MessageLog(Base):
     """Individual messages exchanged as part of a conversation."""
 
     __tablename__ = "message_logs"
+    __table_args__ = (
+        Index("ix_message_logs_conversation_created", "conversation_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     conversation_id: Mapped[int] = mapped_column(
@@ -80,6 +89,7 @@ class EscalationTicket(Base):
     """Tickets created when the automation pipeline hands off to a human."""
 
     __tablename__ = "escalation_tickets"
+    __table_args__ = (Index("ix_escalation_tickets_conversation_id", "conversation_id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     conversation_id: Mapped[int] = mapped_column(
@@ -0,0 +1 @@
+"""Logging, access logs and other operational instrumentation."""
@@ -0,0 +1,176 @@
+"""Sampled, structured access log with redacted, size-capped body capture."""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode
+
+REDACTED = "[redacted]"
+
+# Keys whose values are credentials or customer content (Messenger text/ids).
+SENSITIVE_KEYS = frozenset(
+    {
+        "access_token",
+        "api_key",
+        "authorization",
+        "email",
+        "hub.verify_token",
+        "id",
+        "page_access_token",
+        "password",
+        "phone",
+        "secret",
+        "text",
+        "token",
+        "verify_token",
+    }
+)
+CAPTURED_CONTENT_TYPES = ("application/json", "application/x-www-form-urlencoded", "text/")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+_BEARER = re.compile(r"(?i)bearer\s+[\w.~+/=-]+")
+# "key": "value" pairs in JSON that could not be parsed (e.g. truncated bodies).
+_JSON_FIELD = re.compile(
+    r'"(%s)"\s*:\s*"(?:[^"\\]|\\.)*"?'
+    % "|".join(re.escape(key) for key in sorted(SENSITIVE_KEYS))
+)
+
+
+def redact_text(text: str) -> str:
+    text = _JSON_FIELD.sub(lambda match: f'"{match.group(1)}": "{REDACTED}"', text)
+    text = _BEARER.sub(f"Bearer {REDACTED}", text)
+    text = _EMAIL.sub(REDACTED, text)
+    return _PHONE.sub(REDACTED, text)
+
+
+def redact(value: Any) -> Any:
+    """Copy of a decoded JSON value with sensitive keys and patterns masked."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+def redact_query(query: str) -> str:
+    pairs = parse_qsl(query, keep_blank_values=True)
+    return urlencode(
+        [
+            (key, REDACTED if key.lower() in SENSITIVE_KEYS else redact_text(value))
+            for key, value in pairs
+        ]
+    )
+
+
+def render_body(body: bytes, content_type: str, limit: int) -> Optional[str]:
+    """Redacted text of at most ``limit`` bytes of ``body``; None for binary types."""
+    if not any(content_type.startswith(kind) for kind in CAPTURED_CONTENT_TYPES):
+        return None
+    truncated = len(body) > limit
+    body = body[:limit]
+    if content_type.startswith("application/json") and not truncated:
+        try:
+            return json.dumps(redact(json.loads(body)), ensure_ascii=False)
+        except ValueError:
+            pass
+    text = body.decode("utf-8", errors="replace")
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        text = redact_query(text)
+    else:
+        text = redact_text(text)
+    return text + "...[truncated]" if truncated else text
+
+
+class AccessLogMiddleware:
+    """ASGI middleware that writes one JSON line per request to ``logger``.
+
+    Bodies are never buffered: request and response sizes are counted as
+    the chunks stream past. A ``sample_rate`` fraction of requests is logged,
+    plus every 5xx and every request slower than ``slow_ms``. With
+    ``capture_body``, sampled requests also log the first
+    ``body_max_bytes`` of a text/JSON body after :func:`redact`.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        logger: Optional[logging.Logger] = None,
+        sample_rate: float = 1.0,
+        slow_ms: float = 1000.0,
+        capture_body: bool = False,
+        body_max_bytes: int = 2048,
+        sampler: Callable[[], float] = random.random,
+    ) -> None:
+        self.app = app
+        self.logger = logger or logging.getLogger("access")
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.capture_body = capture_body
+        self.body_max_bytes = body_max_bytes
+        self.sampler = sampler
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        sampled = self.sample_rate >= 1 or self.sampler() < self.sample_rate
+        capture = self.capture_body and sampled
+        captured = bytearray()
+        sizes = {"request": 0, "response": 0}
+        status = 500
+
+        async def counting_receive() -> Dict[str, Any]:
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                sizes["request"] += len(chunk)
+                room = self.body_max_bytes + 1 - len(captured)
+                if capture and room > 0:
+                    captured.extend(chunk[:room])
+            return message
+
+        async def counting_send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            if sampled or status >= 500 or latency_ms >= self.slow_ms:
+                entry: Dict[str, Any] = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "latency_ms": round(latency_ms, 2),
+                    "request_bytes": sizes["request"],
+                    "response_bytes": sizes["response"],
+                }
+                query = scope.get("query_string", b"").decode("latin-1")
+                if query:
+                    entry["query"] = redact_query(query)
+                if self.sample_rate < 1:
+                    entry["sample_rate"] = self.sample_rate
+                if capture and captured:
+                    headers = dict(scope.get("headers") or [])
+                    content_type = headers.get(b"content-type", b"").decode("latin-1")
+                    body = render_body(bytes(captured), content_type, self.body_max_bytes)
+                    if body is not None:
+                        entry["body"] = body
+                self.logger.info(json.dumps(entry, ensure_ascii=False), extra={"access": entry})
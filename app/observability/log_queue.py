@@ -0,0 +1,77 @@
+"""Move log handler I/O off the calling thread (and the event loop)."""
+
+from __future__ import annotations
+
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List
+
+# Loggers that keep their own handlers and do not propagate to the root
+# logger (uvicorn installs these through its logging config).
+DETACHED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listeners: Dict[str, QueueListener] = {}
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """Enqueue records as they are; the listener's handlers format them.
+
+    The queue never leaves the process, so the record does not have to be
+    flattened for pickling, and formatters that read ``record.args`` (such
+    as uvicorn's access formatter) still see them.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _move_behind_queue(logger: logging.Logger, handlers: List[logging.Handler]) -> QueueListener:
+    for handler in handlers:
+        logger.removeHandler(handler)
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.addHandler(_InProcessQueueHandler(records))
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def install_queue_logging(level: str = "INFO") -> Dict[str, QueueListener]:
+    """Route log records through queues drained by background threads.
+
+    The root logger's existing handlers (a stderr ``StreamHandler`` when it
+    has none) are moved behind a :class:`QueueListener`, and so are the
+    handlers of :data:`DETACHED_LOGGERS`, whose records never reach the
+    root. Loggers only enqueue the record, so formatting and writing never
+    block a request. Calling it again returns the running listeners, keyed
+    by logger name (``""`` for the root).
+    """
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listeners:
+        return _listeners
+    handlers = [handler for handler in root.handlers if not isinstance(handler, QueueHandler)]
+    if not handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        handlers = [handler]
+    _listeners[""] = _move_behind_queue(root, handlers)
+    for name in DETACHED_LOGGERS:
+        logger = logging.getLogger(name)
+        handlers = [handler for handler in logger.handlers if not isinstance(handler, QueueHandler)]
+        if handlers:
+            _listeners[name] = _move_behind_queue(logger, handlers)
+    return _listeners
+
+
+def stop_queue_logging() -> None:
+    """Flush queued records and restore the original handlers."""
+    while _listeners:
+        name, listener = _listeners.popitem()
+        listener.stop()
+        logger = logging.getLogger(name or None)
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                logger.removeHandler(handler)
+        for handler in listener.handlers:
+            logger.addHandler(handler)
@@ -0,0 +1,132 @@
+"""Optional per-request trace spans written as JSON lines to a local file."""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from queue import SimpleQueue
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_time: float
+    duration_ms: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class _Trace:
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+
+
+_trace: ContextVar[Optional[_Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[str]] = ContextVar("span", default=None)
+
+
+class Tracer:
+    """Records nested timing spans for sampled traces.
+
+    :meth:`trace` starts a trace (one webhook request or job); :meth:`span`
+    inside it, including in tasks spawned from it, adds a child span. Both
+    are no-ops when tracing is off or the trace was not sampled. Finished
+    traces are appended to ``path`` as one JSON object per line by a
+    background thread.
+    """
+
+    def __init__(self) -> None:
+        self.path: Optional[Path] = None
+        self.sample_rate = 1.0
+        self._logger = logging.getLogger("app.trace")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener: Optional[QueueListener] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def configure(self, path: Union[str, Path, None], sample_rate: float = 1.0) -> None:
+        self.close()
+        self.sample_rate = sample_rate
+        self.path = Path(path) if path else None
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(self.path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records: "SimpleQueue[logging.LogRecord]" = SimpleQueue()
+        self._logger.addHandler(QueueHandler(records))
+        self._listener = QueueListener(records, handler)
+        self._listener.start()
+
+    def close(self) -> None:
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+        self.path = None
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        if not self.enabled or _trace.get() is not None or random.random() >= self.sample_rate:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+        trace = _Trace(uuid.uuid4().hex)
+        token = _trace.set(trace)
+        try:
+            with self.span(name, **attributes) as span:
+                yield span
+        finally:
+            _trace.reset(token)
+            root = trace.spans[0]
+            self._logger.info(
+                json.dumps(
+                    {
+                        "trace_id": trace.trace_id,
+                        "name": name,
+                        "duration_ms": root.duration_ms,
+                        "spans": [asdict(span) for span in trace.spans],
+                    },
+                    default=str,
+                )
+            )
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        trace = _trace.get()
+        if trace is None:
+            yield None
+            return
+        span = Span(name, uuid.uuid4().hex[:16], _span.get(), time.time(), attributes=attributes)
+        trace.spans.append(span)
+        token = _span.set(span.span_id)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _span.reset(token)
+
+
+tracer = Tracer()
@@ -0,0 +1,129 @@
+"""Read-side queries used by the admin API."""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import String, and_, func, literal, or_, select, type_coerce
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .models import Conversation, MessageLog
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that was not issued by this API."""
+
+
+def encode_cursor(updated_at: Any, conversation_id: int) -> str:
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    raw = json.dumps([str(updated_at), conversation_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, conversation_id = json.loads(raw)
+        return str(updated_at), int(conversation_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Malformed pagination cursor.") from exc
+
+
+def conversation_page_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+) -> Select:
+    """One statement returning a page of conversations with their last message.
+
+    Conversations are ordered newest first on ``(updated_at, id)`` and paged
+    by keyset: the cursor holds the last row's sort key. The cursor compares
+    against the stored ``updated_at`` value verbatim, so paging stays exact on
+    SQLite, which keeps timestamps as text. The last message per conversation
+    comes from a ``ROW_NUMBER()`` window over just the conversations on the
+    page.
+    """
+    # Raw column value: text on SQLite, a timestamp elsewhere.
+    updated_raw = type_coerce(Conversation.updated_at, String)
+    page = select(
+        Conversation.id,
+        Conversation.status,
+        Conversation.confidence,
+        Conversation.last_message_preview,
+        Conversation.updated_at,
+        updated_raw.label("updated_at_key"),
+    )
+    if status is not None:
+        page = page.where(Conversation.status == status)
+    if min_confidence is not None:
+        page = page.where(Conversation.confidence >= min_confidence)
+    if max_confidence is not None:
+        page = page.where(Conversation.confidence <= max_confidence)
+    if cursor is not None:
+        after_updated, after_id = decode_cursor(cursor)
+        after = literal(after_updated, String)
+        page = page.where(
+            or_(updated_raw < after, and_(updated_raw == after, Conversation.id < after_id))
+        )
+    page = (
+        page.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        .limit(limit)
+        .subquery("page")
+    )
+
+    ranked = (
+        select(
+            MessageLog.conversation_id,
+            MessageLog.content,
+            func.row_number()
+            .over(
+                partition_by=MessageLog.conversation_id,
+                order_by=(MessageLog.created_at.desc(), MessageLog.id.desc()),
+            )
+            .label("position"),
+        )
+        .where(MessageLog.conversation_id.in_(select(page.c.id)))
+        .subquery("ranked")
+    )
+    return (
+        select(page, ranked.c.content.label("last_message"))
+        .outerjoin(ranked, and_(ranked.c.conversation_id == page.c.id, ranked.c.position == 1))
+        .order_by(page.c.updated_at.desc(), page.c.id.desc())
+    )
+
+
+def list_conversations(
+    session: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of conversation summaries and the cursor for the next."""
+    rows = session.execute(
+        conversation_page_query(limit + 1, cursor, status, min_confidence, max_confidence)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at_key, rows[-1].id)
+    items = [
+        {
+            "id": row.id,
+            "status": row.status,
+            "confidence": row.confidence,
+            "preview": row.last_message_preview,
+            "last_message": row.last_message,
+            "updated_at": row.updated_at.isoformat(),
+        }
+        for row in rows
+    ]
+    return items, next_cursor
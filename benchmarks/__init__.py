@@ -0,0 +1,6 @@
+"""Reproducible benchmarks for retrieval, ingestion and the webhook path.
+
+Run from the repository root, e.g. ``python -m benchmarks.bench_store``.
+Every benchmark writes a JSON result (tagged with the git commit) that
+``python -m benchmarks.compare`` can diff against an earlier run.
+"""
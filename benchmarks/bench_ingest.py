@@ -0,0 +1,95 @@
+"""Ingest rate of ``IngestionService`` (and optionally ``BulkIngestor``).
+
+    python -m benchmarks.bench_ingest --megabytes 5 --bulk-files 20
+
+Measures a fresh ``ingest_text`` and ``ingest_path`` of a synthetic document,
+a repeat ingest of the same file (everything skipped as already stored) and,
+with ``--bulk-files``, a multi-process bulk ingest of a directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .common import isolated_settings, params, peak_rss_mb, rss_mb, write_results
+from .corpus import synthetic_document
+
+
+def _timed(name: str, size_bytes: int, run: Callable[[], object]) -> Dict[str, object]:
+    started = time.perf_counter()
+    report = run()
+    seconds = time.perf_counter() - started
+    chunks = report.new + report.skipped + report.updated
+    result = {
+        "seconds": round(seconds, 3),
+        "chunks": chunks,
+        "new": report.new,
+        "skipped": report.skipped,
+        "chunks_per_second": round(chunks / seconds, 1) if seconds else None,
+        "megabytes_per_second": round(size_bytes / 2**20 / seconds, 2) if seconds else None,
+        "rss_mb": rss_mb(),
+    }
+    rate, throughput = result["chunks_per_second"], result["megabytes_per_second"]
+    print(f"{name:<12} {rate} chunks/s {throughput} MiB/s")
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--megabytes", type=float, default=2.0)
+    parser.add_argument("--bulk-files", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-") as temp:
+        root = Path(temp)
+        isolated_settings(root)
+        from app.ai.vector_store import LocalVectorStore
+        from app.ingestion.bulk import BulkIngestor
+        from app.ingestion.service import IngestionService
+
+        size = int(args.megabytes * 2**20)
+        document = synthetic_document(size)
+        path = root / "document.txt"
+        path.write_text(document, encoding="utf-8")
+        results: Dict[str, object] = {}
+
+        service = IngestionService(LocalVectorStore(root / "text"))
+        results["ingest_text"] = _timed(
+            "ingest_text", size, lambda: service.ingest_text("bench", document)
+        )
+        service = IngestionService(LocalVectorStore(root / "path"))
+        results["ingest_path"] = _timed("ingest_path", size, lambda: service.ingest_path(path))
+        results["reingest_path"] = _timed(
+            "reingest", size, lambda: service.ingest_path(path)
+        )
+
+        if args.bulk_files:
+            corpus = root / "corpus"
+            corpus.mkdir()
+            per_file = max(1, size // args.bulk_files)
+            for index in range(args.bulk_files):
+                text = synthetic_document(per_file, seed=100 + index)
+                (corpus / f"doc-{index:04d}.txt").write_text(text, encoding="utf-8")
+            ingestor = BulkIngestor(LocalVectorStore(root / "bulk"), processes=args.processes)
+            results["bulk"] = _timed(
+                "bulk", size, lambda: ingestor.ingest_paths([corpus])
+            )
+            results["bulk"]["processes"] = ingestor.processes
+
+    path = write_results(
+        "ingest",
+        params(args),
+        {**results, "peak_rss_mb": peak_rss_mb()},
+        args.output,
+    )
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Throughput and latency of ``LocalVectorStore`` writes and searches.
+
+    python -m benchmarks.bench_store --sizes 1000 10000 100000 --queries 500
+
+For each corpus size a fresh store is bulk-loaded with synthetic chunks
+(``add_texts`` in batches), then timed on single ``add_text`` calls and on
+``similarity_search`` and ``hybrid_search`` queries. ``hit_rate`` is the
+share of questions with at least one relevant snippet (see
+:func:`benchmarks.corpus.relevant`) among the ``--limit`` results, i.e. how
+useful the retrieved context is.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .common import isolated_settings, params, peak_rss_mb, rss_mb, summarize, write_results
+from .corpus import relevant, synthetic_chunks, synthetic_questions
+
+
+def bench_size(
+    root: Path,
+    size: int,
+    queries: int,
+    batch_size: int,
+    single_adds: int,
+    limit: int,
+) -> Dict[str, object]:
+    from app.ai.vector_store import LocalVectorStore
+
+    store = LocalVectorStore(root / f"store-{size}")
+    chunks = synthetic_chunks(size + single_adds, seed=size)
+
+    batch_seconds: List[float] = []
+    started = time.perf_counter()
+    loaded = 0
+    while loaded < size:
+        batch = list(itertools.islice(chunks, min(batch_size, size - loaded)))
+        tick = time.perf_counter()
+        store.add_texts(batch)
+        batch_seconds.append(time.perf_counter() - tick)
+        loaded += len(batch)
+    load_seconds = time.perf_counter() - started
+
+    add_seconds: List[float] = []
+    for text in chunks:
+        tick = time.perf_counter()
+        store.add_text(text)
+        add_seconds.append(time.perf_counter() - tick)
+
+    questions = synthetic_questions(queries, corpus_size=size)
+    for question in questions[: min(10, len(questions))]:
+        store.similarity_search(question, limit=limit)  # warm the resident corpus
+
+    def timed(search: Callable[[str], List]) -> Dict[str, object]:
+        seconds: List[float] = []
+        hits = 0
+        started = time.perf_counter()
+        for question in questions:
+            tick = time.perf_counter()
+            results = search(question)
+            seconds.append(time.perf_counter() - tick)
+            hits += any(relevant(question, document.text) for document in results)
+        total = time.perf_counter() - started
+        return {
+            **summarize(seconds),
+            "queries_per_second": round(queries / total, 1) if total else None,
+            "hit_rate": round(hits / len(questions), 3) if questions else None,
+        }
+
+    return {
+        "size": size,
+        "count": store.count(),
+        "bulk_load": {
+            "seconds": round(load_seconds, 3),
+            "chunks_per_second": round(size / load_seconds, 1) if load_seconds else None,
+            "batch": summarize(batch_seconds),
+        },
+        "add_text": summarize(add_seconds),
+        "similarity_search": timed(lambda text: store.similarity_search(text, limit=limit)),
+        "hybrid_search": timed(lambda text: store.hybrid_search(text, limit=limit)),
+        "index": (store._corpus().manifest.get("index") or {}).get("type", "flat"),
+        "embedding": store.embedding_name,
+        "rss_mb": rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--single-adds", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--index", choices=["auto", "flat", "ivf"], default="auto")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--embedding", default="local", help="EMBEDDING_PROVIDER to use.")
+    parser.add_argument("--workdir", type=Path, help="Keep stores here instead of a temp dir.")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-store-") as temp:
+        root = args.workdir or Path(temp)
+        isolated_settings(
+            root,
+            vector_index=args.index,
+            local_embedding_dimension=args.dimension,
+            embedding_provider=args.embedding,
+        )
+        results = []
+        for size in args.sizes:
+            result = bench_size(
+                root, size, args.queries, args.batch_size, args.single_adds, args.limit
+            )
+            print(
+                f"size={size:>8} load={result['bulk_load']['chunks_per_second']} chunks/s "
+                f"rss={result['rss_mb']}MiB"
+            )
+            for kind in ("similarity_search", "hybrid_search"):
+                search = result[kind]
+                print(
+                    f"    {kind:<18} p50={search['p50_ms']}ms p99={search['p99_ms']}ms "
+                    f"qps={search['queries_per_second']} hit_rate={search['hit_rate']}"
+                )
+            results.append(result)
+    path = write_results(
+        "store",
+        params(args),
+        {"sizes": results, "peak_rss_mb": peak_rss_mb()},
+        args.output,
+    )
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
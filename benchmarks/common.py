@@ -0,0 +1,124 @@
+"""Shared helpers: isolated settings, latency summaries, RSS and result files."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+RESULTS_DIR = Path("benchmarks/results")
+
+
+def isolated_settings(root: Path, **overrides: object) -> None:
+    """Point every storage setting at ``root`` and apply ``overrides``.
+
+    Must run before anything reads :func:`app.config.get_settings`; the cached
+    settings object is reset so the new environment takes effect.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    env = {
+        "DATABASE_URL": f"sqlite:///{root / 'app.db'}",
+        "CHROMA_PATH": str(root / "vectorstore"),
+        "WEBHOOK_QUEUE_PATH": str(root / "webhook_queue.db"),
+        "BULK_INGEST_ROOT": str(root),
+        "LOG_LEVEL": "WARNING",
+    }
+    env.update({key.upper(): str(value) for key, value in overrides.items()})
+    os.environ.update(env)
+    from app.config import get_settings
+
+    get_settings.cache_clear()
+
+
+def summarize(seconds: Iterable[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99/max of latency samples, in milliseconds."""
+    samples = np.asarray(list(seconds), dtype=np.float64) * 1000
+    if not samples.size:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Current resident set size of ``pid`` (default: this process) in MiB."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        return peak_rss_mb()
+    return None
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def environment() -> Dict[str, object]:
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def params(args: argparse.Namespace) -> Dict[str, object]:
+    """Command-line arguments as JSON-friendly values."""
+    return {
+        key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()
+    }
+
+
+def write_results(
+    name: str, params: Dict[str, object], results: object, output: Optional[Path] = None
+) -> Path:
+    """Write ``{"benchmark", "environment", "params", "results"}`` as JSON."""
+    env = environment()
+    if output is None:
+        commit = (env["commit"] or "unknown")[:12]
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        output = RESULTS_DIR / f"{name}-{commit}-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    document = {"benchmark": name, "environment": env, "params": params, "results": results}
+    output.write_text(json.dumps(document, indent=2, default=str) + "\n", encoding="utf-8")
+    return output
@@ -0,0 +1,66 @@
+"""Diff two benchmark result files, e.g. from the parent commit and HEAD.
+
+    python -m benchmarks.compare old.json new.json --threshold 10
+
+Prints every shared numeric metric with its relative change and exits with
+status 1 if a latency (``*_ms``) grew, or a rate (``*_per_second``) fell, by
+more than ``--threshold`` percent.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+Number = Union[int, float]
+
+
+def flatten(value: object, prefix: str = "") -> Iterator[Tuple[str, Number]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = item.get("size", index) if isinstance(item, dict) else index
+            yield from flatten(item, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def regression(name: str, change: float, threshold: float) -> bool:
+    leaf = name.rsplit(".", 1)[-1]
+    if leaf.endswith("_ms"):
+        return change > threshold
+    if leaf.endswith("_per_second"):
+        return change < -threshold
+    return False
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent.")
+    args = parser.parse_args(argv)
+
+    old, new = (json.loads(path.read_text(encoding="utf-8")) for path in (args.old, args.new))
+    before: Dict[str, Number] = dict(flatten(old["results"]))
+    after: Dict[str, Number] = dict(flatten(new["results"]))
+    print(f"{old['environment'].get('commit')} -> {new['environment'].get('commit')}")
+    failed = False
+    for name in sorted(before.keys() & after.keys()):
+        if not before[name]:
+            continue
+        change = (after[name] - before[name]) / abs(before[name]) * 100
+        flag = regression(name, change, args.threshold)
+        failed = failed or flag
+        label = "REGRESSION" if flag else ""
+        print(f"{label:<10} {name:<60} {before[name]:>12} {after[name]:>12} {change:+7.1f}%")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Deterministic synthetic knowledge bases, questions and webhook payloads."""
+
+from __future__ import annotations
+
+import random
+from typing import Dict, Iterator, List, Sequence
+
+PRODUCTS = (
+    "backpack", "blender", "desk lamp", "e-bike", "espresso machine", "gift card",
+    "hiking boots", "kettle", "office chair", "phone case", "rain jacket", "smart watch",
+    "standing desk", "tent", "water bottle", "yoga mat",
+)  # fmt: skip
+PLACES = (
+    "Austin", "Berlin", "Chicago", "Denver", "Dublin", "Lisbon", "Madrid", "Melbourne",
+    "Montreal", "Osaka", "Oslo", "Portland", "Seattle", "Toronto", "Vienna", "Warsaw",
+)  # fmt: skip
+TOPICS = (
+    "shipping", "returns", "warranty", "opening hours", "payment", "discounts",
+    "sizing", "pickup", "repairs", "subscriptions",
+)  # fmt: skip
+_SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "be")
+
+
+def _vocabulary(rng: random.Random, size: int = 2000) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_chunks(count: int, seed: int = 0, words: int = 90) -> Iterator[str]:
+    """Yield ``count`` distinct FAQ-like snippets of roughly ``words`` words.
+
+    Each names a SKU, a product, a city, a price and a topic so that both
+    lexical and semantic lookups have something specific to find.
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    for index in range(count):
+        product = rng.choice(PRODUCTS)
+        place = rng.choice(PLACES)
+        topic = rng.choice(TOPICS)
+        lead = (
+            f"SKU-{index:07d}: the {product} sold in our {place} store costs "
+            f"${rng.randint(5, 900)}.{rng.randint(0, 99):02d}. About {topic}: "
+        )
+        filler = " ".join(rng.choice(vocabulary) for _ in range(max(0, words - 20)))
+        yield lead + filler + "."
+
+
+def synthetic_questions(count: int, seed: int = 1, corpus_size: int = 1000) -> List[str]:
+    rng = random.Random(seed)
+    templates = (
+        "How much is SKU-{sku:07d}?",
+        "Do you sell the {product} in {place}?",
+        "What is your {topic} policy for the {product}?",
+        "Is the {product} available in {place} and what does it cost?",
+    )
+    return [
+        rng.choice(templates).format(
+            sku=rng.randrange(max(1, corpus_size)),
+            product=rng.choice(PRODUCTS),
+            place=rng.choice(PLACES),
+            topic=rng.choice(TOPICS),
+        )
+        for _ in range(count)
+    ]
+
+
+def relevant(question: str, chunk: str) -> bool:
+    """Whether ``chunk`` answers ``question`` (same SKU, or same product and city/topic)."""
+    if "SKU-" in question:
+        return question.split("SKU-", 1)[1][:7] in chunk.split(":", 1)[0]
+    product = next((item for item in PRODUCTS if f"the {item} " in question), None)
+    qualifier = next((item for item in PLACES + TOPICS if item in question), None)
+    return bool(product and qualifier) and f"the {product} " in chunk and qualifier in chunk
+
+
+def synthetic_document(target_bytes: int, seed: int = 2) -> str:
+    """Paragraphs of synthetic snippets totalling about ``target_bytes``."""
+    parts: List[str] = []
+    size = 0
+    for chunk in synthetic_chunks(10**9, seed=seed):
+        parts.append(chunk)
+        size += len(chunk) + 2
+        if size >= target_bytes:
+            break
+    return "\n\n".join(parts)
+
+
+def chat_message(rng: random.Random, corpus_size: int = 1000) -> str:
+    """A customer message: mostly questions, some greetings and statements."""
+    roll = rng.random()
+    if roll < 0.15:
+        return rng.choice(("hello", "hi there", "hey"))
+    if roll < 0.35:
+        return f"I want to return my {rng.choice(PRODUCTS)}"
+    return synthetic_questions(1, seed=rng.randrange(2**31), corpus_size=corpus_size)[0]
+
+
+def webhook_payload(messages: Sequence[Dict[str, object]]) -> Dict[str, object]:
+    """Messenger ``page`` webhook body for ``{"sender", "text", "timestamp", "mid"}`` items."""
+    return {
+        "object": "page",
+        "entry": [
+            {
+                "id": "bench-page",
+                "time": messages[0]["timestamp"] if messages else 0,
+                "messaging": [
+                    {
+                        "sender": {"id": message["sender"]},
+                        "recipient": {"id": "bench-page"},
+                        "timestamp": message["timestamp"],
+                        "message": {"mid": message["mid"], "text": message["text"]},
+                    }
+                    for message in messages
+                ],
+            }
+        ],
+    }
@@ -0,0 +1,251 @@
+"""Replay Messenger webhook traffic against a locally started service.
+
+    python -m benchmarks.loadgen --rate 50 --duration 30 --senders 500 --streaming
+
+Starts the xAI and Graph stubs, seeds a synthetic knowledge base, launches
+``uvicorn app.main:app`` in a subprocess wired to the stubs and posts
+webhook payloads at a fixed arrival rate. Each simulated customer waits for
+a reply before writing again, so besides HTTP latency of ``/meta/webhook``
+the run reports time to first reply as observed by the Graph stub.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from .common import isolated_settings, params, rss_mb, summarize, write_results
+from .corpus import chat_message, synthetic_chunks, webhook_payload
+from .stubs import ServerThread, graph_stub, xai_stub
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ReplyWaiter:
+    """Bridges Graph stub deliveries (stub thread) to per-sender futures."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.waiting: Dict[str, asyncio.Future] = {}
+        self.deliveries = 0
+        self.typing = 0
+
+    def expect(self, sender: str) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.waiting[sender] = future
+        return future
+
+    def on_message(self, recipient: str, payload: Dict[str, Any]) -> None:
+        self.loop.call_soon_threadsafe(self._delivered, recipient, "message" in payload)
+
+    def _delivered(self, recipient: str, is_message: bool) -> None:
+        if not is_message:
+            self.typing += 1
+            return
+        self.deliveries += 1
+        future = self.waiting.pop(recipient, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+
+async def generate_load(
+    client: httpx.AsyncClient, waiter: ReplyWaiter, args: argparse.Namespace
+) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    idle: Deque[str] = deque(f"bench-{index:06d}" for index in range(args.senders))
+    http_seconds: List[float] = []
+    reply_seconds: List[float] = []
+    statuses: Counter = Counter()
+    outcome = {"reply_timeouts": 0, "skipped_no_idle_sender": 0, "messages": 0}
+
+    async def post(senders: List[str], tick: int) -> None:
+        messages = [
+            {
+                "sender": sender,
+                "text": chat_message(rng, args.kb_chunks),
+                "timestamp": int(time.time() * 1000),
+                "mid": f"mid.{tick}.{position}",
+            }
+            for position, sender in enumerate(senders)
+        ]
+        replies = {sender: waiter.expect(sender) for sender in senders}
+        started = time.perf_counter()
+        try:
+            response = await client.post("/meta/webhook", json=webhook_payload(messages))
+            statuses[str(response.status_code)] += 1
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            response = None
+        http_seconds.append(time.perf_counter() - started)
+        outcome["messages"] += len(senders)
+        for sender, future in replies.items():
+            if response is not None and response.is_success:
+                try:
+                    delivered = await asyncio.wait_for(future, args.reply_timeout)
+                    reply_seconds.append(delivered - started)
+                except asyncio.TimeoutError:
+                    outcome["reply_timeouts"] += 1
+            waiter.waiting.pop(sender, None)
+            idle.append(sender)
+
+    tasks = []
+    interval = 1.0 / args.rate
+    ticks = int(args.rate * args.duration)
+    started = time.perf_counter()
+    for tick in range(ticks):
+        delay = started + tick * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        batch = [idle.popleft() for _ in range(min(args.batch, len(idle)))]
+        if not batch:
+            outcome["skipped_no_idle_sender"] += 1
+            continue
+        tasks.append(asyncio.create_task(post(batch, tick)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": {
+            **summarize(http_seconds),
+            "requests_per_second": round(len(http_seconds) / elapsed, 1),
+            "statuses": dict(statuses),
+        },
+        "first_reply": summarize(reply_seconds),
+        **outcome,
+        "deliveries": waiter.deliveries,
+        "typing_indicators": waiter.typing,
+        "elapsed_seconds": round(elapsed, 2),
+    }
+
+
+async def sample_rss(pid: int, peak: Dict[str, float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        value = rss_mb(pid)
+        if value is not None:
+            peak["peak"] = max(peak.get("peak", 0.0), value)
+            peak["last"] = value
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args: argparse.Namespace, root: Path) -> Dict[str, Any]:
+    waiter = ReplyWaiter(asyncio.get_running_loop())
+    xai_app = xai_stub(args.xai_latency, args.xai_first_token)
+    graph_app = graph_stub(args.graph_latency, waiter.on_message)
+    with ServerThread(xai_app, free_port()) as xai, ServerThread(graph_app, free_port()) as graph:
+        isolated_settings(
+            root,
+            xai_api_key="bench",
+            xai_api_url=f"{xai.url}/v1/chat/completions",
+            xai_streaming=args.streaming,
+            page_access_token="bench",
+            graph_api_base_url=f"{graph.url}/v18.0",
+            graph_rate_limit_per_second=100000,
+            **dict(item.split("=", 1) for item in args.env),
+        )
+        if args.kb_chunks:
+            from app.ai.vector_store import LocalVectorStore
+            from app.config import get_settings
+
+            store = LocalVectorStore(get_settings().chroma_path)
+            store.add_texts(list(synthetic_chunks(args.kb_chunks)))
+
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--log-level", "warning"],  # fmt: skip
+            env=os.environ.copy(),
+        )
+        rss: Dict[str, float] = {}
+        stop = asyncio.Event()
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}",
+                timeout=30,
+                limits=httpx.Limits(max_connections=args.connections),
+            ) as client:
+                deadline = time.monotonic() + 60
+                while True:
+                    try:
+                        if (await client.get("/healthz")).is_success:
+                            break
+                    except httpx.HTTPError:
+                        pass
+                    if process.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("Service did not start.")
+                    await asyncio.sleep(0.2)
+                sampler = asyncio.create_task(sample_rss(process.pid, rss, stop))
+                result = await generate_load(client, waiter, args)
+                stop.set()
+                await sampler
+                result["app_rss_mb"] = rss
+                result["stats"] = (await client.get("/admin/stats")).json()
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rate", type=float, default=20.0, help="Webhook POSTs per second.")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--senders", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="Messages per webhook payload.")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--kb-chunks", type=int, default=1000)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--xai-latency", type=float, default=0.3)
+    parser.add_argument("--xai-first-token", type=float, default=0.1)
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    parser.add_argument("--reply-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra service setting, e.g. --env WEBHOOK_WORKERS=16 (repeatable).",
+    )
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-load-") as temp:
+        result = asyncio.run(run(args, Path(temp)))
+    requests, reply = result["requests"], result["first_reply"]
+    print(
+        f"{requests['requests_per_second']} req/s  webhook p50={requests.get('p50_ms')}ms "
+        f"p99={requests.get('p99_ms')}ms  first reply p50={reply.get('p50_ms')}ms "
+        f"p99={reply.get('p99_ms')}ms  timeouts={result['reply_timeouts']}"
+    )
+    path = write_results(
+        "loadgen",
+        params(args),
+        result,
+        args.output,
+    )
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
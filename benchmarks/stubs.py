@@ -0,0 +1,122 @@
+"""Local stand-ins for the xAI completions API and the Messenger Send API.
+
+    python -m benchmarks.stubs --xai-port 8801 --graph-port 8802
+
+Both answer after a configurable delay so the service can be load-tested
+without network access, credentials or upstream rate limits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+ANSWER = (
+    "Thanks for asking. Our stores carry that item and it ships within two days. "
+    "Returns are free within thirty days with the receipt. "
+    "Let us know if there is anything else we can help with."
+)
+
+
+def xai_stub(latency: float = 0.3, first_token: float = 0.1, answer: str = ANSWER) -> FastAPI:
+    """Chat completions stub; streams word by word when ``stream`` is set."""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request) -> Any:
+        payload = await request.json()
+        usage = {"prompt_tokens": 200, "completion_tokens": 40, "total_tokens": 240}
+        if not payload.get("stream"):
+            await asyncio.sleep(latency)
+            message = {"role": "assistant", "content": answer}
+            return {"choices": [{"message": message}], "usage": usage}
+
+        words = answer.split(" ")
+        step = max(0.0, latency - first_token) / max(1, len(words))
+
+        async def events() -> Any:
+            await asyncio.sleep(first_token)
+            for index, word in enumerate(words):
+                delta = word if index == 0 else " " + word
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]})}\n\n"
+                await asyncio.sleep(step)
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def graph_stub(
+    latency: float = 0.05, on_message: Optional[Callable[[str, Dict[str, Any]], None]] = None
+) -> FastAPI:
+    """Send API stub; ``on_message(recipient_id, payload)`` sees every accepted call."""
+    app = FastAPI()
+    ids = count()
+
+    @app.post("/{version}/me/messages")
+    async def send(version: str, request: Request) -> Dict[str, str]:
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        recipient = payload.get("recipient", {}).get("id", "")
+        if on_message is not None:
+            on_message(recipient, payload)
+        return {"recipient_id": recipient, "message_id": f"m_{next(ids)}"}
+
+    return app
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a background thread (context manager)."""
+
+    def __init__(self, app: FastAPI, port: int, host: str = "127.0.0.1") -> None:
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.url = f"http://{host}:{port}"
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "ServerThread":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Stub server on {self.url} did not start.")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--xai-port", type=int, default=8801)
+    parser.add_argument("--graph-port", type=int, default=8802)
+    parser.add_argument("--xai-latency", type=float, default=0.3)
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+    with ServerThread(xai_stub(args.xai_latency), args.xai_port) as xai, ServerThread(
+        graph_stub(args.graph_latency), args.graph_port
+    ) as graph:
+        print(f"XAI_API_URL={xai.url}/v1/chat/completions")
+        print(f"GRAPH_API_BASE_URL={graph.url}/v18.0")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+-- Composite indexes for the webhook and admin hot paths (see app/models.py).
+-- CONCURRENTLY avoids blocking writes on a live database; run this file
+-- outside a transaction, e.g. `psql "$DATABASE_URL" -f migrations/0001_hot_path_indexes.sql`.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_user_status_updated
+    ON public.conversations USING btree (user_id, status, updated_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_updated_id
+    ON public.conversations USING btree (updated_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_message_logs_conversation_created
+    ON public.message_logs USING btree (conversation_id, created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_escalation_tickets_conversation_id
+    ON public.escalation_tickets USING btree (conversation_id);
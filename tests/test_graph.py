@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.messenger.graph import GraphAPIError, MessengerGraphClient, TokenBucket, usage_from_headers
+
+
+def make_client(
+    handler: Callable[[httpx.Request], httpx.Response], **overrides
+) -> MessengerGraphClient:
+    options = {"page_access_token": "token", "graph_max_retries": 3}
+    options.update(overrides)
+    return MessengerGraphClient(
+        settings=Settings(**options), transport=httpx.MockTransport(handler)
+    )
+
+
+def scripted(*responses: httpx.Response) -> Callable[[httpx.Request], httpx.Response]:
+    """Handler answering with ``responses`` in order (the last one repeats)."""
+    calls: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return responses[min(len(calls), len(responses)) - 1]
+
+    handler.calls = calls  # type: ignore[attr-defined]
+    return handler
+
+
+def record_backoff(client: MessengerGraphClient, seconds: float = 0.0) -> List[int]:
+    attempts: List[int] = []
+
+    def backoff(attempt: int) -> float:
+        attempts.append(attempt)
+        return seconds
+
+    client._backoff = backoff  # type: ignore[method-assign]
+    return attempts
+
+
+def ok() -> httpx.Response:
+    return httpx.Response(200, json={"recipient_id": "1", "message_id": "m"})
+
+
+def test_retries_server_errors_then_succeeds():
+    handler = scripted(httpx.Response(503), httpx.Response(500), ok())
+    client = make_client(handler)
+    attempts = record_backoff(client)
+
+    result = asyncio.run(client.send_message("1", "hello"))
+
+    assert result["message_id"] == "m"
+    assert len(handler.calls) == 3
+    assert attempts == [0, 1]
+    assert client.stats()["retried"] == 2
+    body = json.loads(handler.calls[0].content)
+    assert body["recipient"] == {"id": "1"} and body["message"] == {"text": "hello"}
+    assert handler.calls[0].url.params["access_token"] == "token"
+
+
+def test_gives_up_after_max_retries():
+    handler = scripted(httpx.Response(502))
+    client = make_client(handler, graph_max_retries=2)
+    record_backoff(client)
+
+    with pytest.raises(GraphAPIError) as caught:
+        asyncio.run(client.send_message("1", "hello"))
+
+    assert caught.value.status_code == 502 and caught.value.retryable
+    assert len(handler.calls) == 3
+    assert client.stats()["failed"] == 1
+
+
+def test_client_errors_are_not_retried():
+    handler = scripted(httpx.Response(400, json={"error": {"message": "bad recipient"}}), ok())
+    client = make_client(handler)
+    attempts = record_backoff(client)
+
+    with pytest.raises(GraphAPIError) as caught:
+        asyncio.run(client.send_message("1", "hello"))
+
+    assert caught.value.status_code == 400 and not caught.value.retryable
+    assert len(handler.calls) == 1
+    assert attempts == []
+    assert client.stats()["retried"] == 0
+
+
+def test_rate_limited_send_waits_for_retry_after():
+    handler = scripted(httpx.Response(429, headers={"Retry-After": "0.3"}), ok())
+    client = make_client(handler)
+    attempts = record_backoff(client, seconds=5.0)
+
+    started = time.monotonic()
+    asyncio.run(client.send_message("1", "hello"))
+    elapsed = time.monotonic() - started
+
+    assert len(handler.calls) == 2
+    assert attempts == []  # Retry-After wins over the computed backoff
+    assert 0.3 <= elapsed < 2.0
+    assert client.stats()["throttled"] == 1
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    client = make_client(scripted(ok()))
+    for attempt in range(4):
+        delay = client._backoff(attempt)
+        assert 0.25 * 2**attempt <= delay <= 0.5 * 2**attempt
+    assert client._backoff(20) <= 30.0
+
+
+def test_high_app_usage_slows_the_bucket():
+    usage = {"X-App-Usage": json.dumps({"call_count": 95, "total_time": 10})}
+    client = make_client(scripted(httpx.Response(200, json={}, headers=usage)))
+
+    asyncio.run(client.send_message("1", "hello"))
+
+    assert client.bucket.scale == pytest.approx(0.2)
+    assert client.stats()["rate_scale"] == pytest.approx(0.2)
+
+    client = make_client(scripted(httpx.Response(200, json={}, headers={"X-App-Usage": "{}"})))
+    asyncio.run(client.send_message("1", "hello"))
+    assert client.bucket.scale == 1.0
+
+
+def test_token_bucket_paces_by_scaled_rate():
+    async def drain(bucket: TokenBucket, count: int) -> float:
+        started = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    fast = TokenBucket(rate=40, capacity=1)
+    slow = TokenBucket(rate=40, capacity=1)
+    slow.scale = 0.25
+    fast_elapsed = asyncio.run(drain(fast, 5))
+    slow_elapsed = asyncio.run(drain(slow, 5))
+
+    # Four refills at 40/s vs 10/s (the first token is already in the bucket).
+    assert 0.09 <= fast_elapsed < 0.3
+    assert 0.39 <= slow_elapsed < 0.8
+
+
+def test_token_bucket_pause_blocks_acquire():
+    async def run() -> float:
+        bucket = TokenBucket(rate=100)
+        bucket.pause(0.2)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.2
+
+
+def test_usage_from_headers():
+    headers = httpx.Headers(
+        {
+            "X-App-Usage": json.dumps({"call_count": 12, "total_cputime": 40, "total_time": 30}),
+            "X-Business-Use-Case-Usage": json.dumps(
+                {
+                    "123": [
+                        {
+                            "type": "messenger",
+                            "call_count": 88,
+                            "estimated_time_to_regain_access": 2,
+                        },
+                        {"type": "pages", "call_count": 5},
+                    ]
+                }
+            ),
+        }
+    )
+    assert usage_from_headers(headers) == (88.0, 120.0)
+    assert usage_from_headers(httpx.Headers({"X-Page-Usage": "not json"})) == (0.0, 0.0)
+    assert usage_from_headers(httpx.Headers({"X-App-Usage": "[1, 2]"})) == (0.0, 0.0)
+    assert usage_from_headers(httpx.Headers()) == (0.0, 0.0)
+
+
+def test_regain_access_pauses_the_bucket():
+    usage = {
+        "X-Business-Use-Case-Usage": json.dumps(
+            {"1": [{"call_count": 100, "estimated_time_to_regain_access": 1}]}
+        )
+    }
+    client = make_client(scripted(httpx.Response(200, json={}, headers=usage)))
+
+    asyncio.run(client.send_message("1", "hello"))
+
+    assert client.bucket._paused_until - time.monotonic() > 55
+    assert client.stats()["throttled"] == 1
+
+
+def test_send_messages_keeps_per_recipient_order_and_skips_after_failure():
+    sent: Dict[str, List[str]] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        recipient, text = body["recipient"]["id"], body["message"]["text"]
+        if text == "fail":
+            return httpx.Response(403, json={"error": {"message": "blocked"}})
+        sent.setdefault(recipient, []).append(text)
+        return httpx.Response(200, json={"recipient_id": recipient, "message_id": text})
+
+    client = make_client(handler)
+    messages = [
+        ("a", "a1"),
+        ("b", "b1"),
+        ("a", "a2"),
+        ("b", "fail"),
+        ("c", "c1"),
+        ("b", "b3"),
+        ("a", "a3"),
+    ]
+
+    results = asyncio.run(client.send_messages(messages, concurrency=2))
+
+    assert sent == {"a": ["a1", "a2", "a3"], "b": ["b1"], "c": ["c1"]}
+    assert [result["message_id"] for result in (results[0], results[2], results[6])] == [
+        "a1",
+        "a2",
+        "a3",
+    ]
+    assert isinstance(results[3], GraphAPIError) and results[3] is results[5]
+    assert results[4]["message_id"] == "c1"
+
+
+def test_missing_token_fails_without_a_request():
+    handler = scripted(ok())
+    client = make_client(handler, page_access_token=None)
+    client.page_access_token = None
+
+    with pytest.raises(GraphAPIError) as caught:
+        asyncio.run(client.send_message("1", "hello"))
+
+    assert not caught.value.retryable
+    assert handler.calls == []
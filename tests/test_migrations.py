@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.migrations import HOT_PATH_QUERIES, check_query_plans, ensure_indexes
+from app.models import Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _model_indexes():
+    return {index.name for table in Base.metadata.sorted_tables for index in table.indexes}
+
+
+def test_hot_path_queries_use_indexes(engine):
+    assert ensure_indexes(engine) == []
+    results = check_query_plans(engine)
+    assert [name for name, _, _ in results] == [name for name, _, _ in HOT_PATH_QUERIES]
+    for name, plan, offending in results:
+        assert plan, name
+        assert offending == [], f"{name}: {plan}"
+
+
+def test_ensure_indexes_upgrades_existing_database(engine):
+    # A database created before the indexes were added to the models.
+    with engine.begin() as connection:
+        for name in _model_indexes():
+            connection.execute(text(f'DROP INDEX "{name}"'))
+    assert any(offending for _, _, offending in check_query_plans(engine))
+
+    assert sorted(ensure_indexes(engine)) == sorted(_model_indexes())
+    inspector = inspect(engine)
+    existing = {
+        index["name"]
+        for table in Base.metadata.sorted_tables
+        for index in inspector.get_indexes(table.name)
+    }
+    assert _model_indexes() <= existing
+    assert all(not offending for _, _, offending in check_query_plans(engine))
+    assert ensure_indexes(engine) == []
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+from typing import AsyncIterator, List
+
+import httpx
+import pytest
+
+from app.ai.xai_client import CircuitBreaker, CircuitOpenError, SentenceBuffer, XAIClient
+from app.config import Settings
+
+
+def feed_all(deltas: List[str]) -> List[str]:
+    buffer = SentenceBuffer()
+    sentences = [sentence for delta in deltas for sentence in buffer.feed(delta)]
+    tail = buffer.flush()
+    return sentences + ([tail] if tail else [])
+
+
+def test_sentence_buffer_releases_complete_sentences():
+    buffer = SentenceBuffer()
+    assert buffer.feed("Hello there") == []
+    assert buffer.feed(". How are") == ["Hello there. "]
+    assert buffer.feed(" you?  I'm fine") == ["How are you?  "]
+    assert buffer.flush() == "I'm fine"
+    assert buffer.flush() == ""
+
+
+def test_sentence_buffer_keeps_trailing_partial_sentence():
+    buffer = SentenceBuffer()
+    assert buffer.feed("We ship worldwide.") == []  # no whitespace yet: may continue
+    assert buffer.feed("com is our site. Ok") == ["We ship worldwide.com is our site. "]
+    assert buffer.flush() == "Ok"
+
+
+def test_sentence_buffer_skips_abbreviations():
+    text = "Ask Dr. Lee or Mrs. Smith, e.g. by phone. Open 9 a.m. daily! Done"
+    deltas = [text[index : index + 3] for index in range(0, len(text), 3)]
+    assert feed_all(deltas) == [
+        "Ask Dr. Lee or Mrs. Smith, e.g. by phone. ",
+        "Open 9 a.m. ",
+        "daily! ",
+        "Done",
+    ]
+
+
+def test_sentence_buffer_handles_quotes_ellipses_and_decimals():
+    assert feed_all(['He said "yes." ', "It costs 4.50 dollars... ", "Really?) Yes"]) == [
+        'He said "yes." ',
+        "It costs 4.50 dollars... ",
+        "Really?) ",
+        "Yes",
+    ]
+
+
+def test_sentence_buffer_multibyte_text():
+    text = "Très bien. ¿Dónde está? 日本語です。元気ですか？ 🙂 Merci"
+    deltas = list(text)  # one code point per delta
+    assert feed_all(deltas) == [
+        "Très bien. ",
+        "¿Dónde está? ",
+        "日本語です。",
+        "元気ですか？",
+        " 🙂 Merci",
+    ]
+    assert "".join(feed_all(deltas)) == text
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_admits_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # the trial is still in flight
+
+    breaker.record_failure()  # failed trial re-opens at once
+    assert breaker.state == "open" and not breaker.allow()
+
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_release_trial_lets_the_next_call_try():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    breaker.release_trial()  # cancelled: no verdict
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def sse(*deltas: str) -> List[bytes]:
+    events = [
+        f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]})}\n\n" for delta in deltas
+    ]
+    return [event.encode("utf-8") for event in events] + [b"data: [DONE]\n\n"]
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: List[bytes]) -> None:
+        self.chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+def make_client(chunks: List[bytes], status: int = 200, **overrides) -> XAIClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(status, stream=ChunkedStream(chunks))
+
+    options = {"xai_api_key": "key", "xai_breaker_failure_threshold": 1}
+    options.update(overrides)
+    return XAIClient(settings=Settings(**options), transport=httpx.MockTransport(handler))
+
+
+async def collect(client: XAIClient) -> List[str]:
+    return [delta async for delta in client.stream_answer("question?", [])]
+
+
+def test_stream_answer_reassembles_multibyte_split_across_chunks():
+    body = b"".join(sse("Café ", "ouvert ☕. ", "日本。"))
+    # Cut every few bytes so several UTF-8 sequences straddle chunk boundaries.
+    chunks = [body[index : index + 5] for index in range(0, len(body), 5)]
+    client = make_client(chunks)
+
+    deltas = asyncio.run(collect(client))
+
+    assert deltas == ["Café ", "ouvert ☕. ", "日本。"]
+    assert client.stats()["succeeded"] == 1
+    assert client.breaker.state == "closed"
+
+
+def test_stream_failure_opens_breaker_and_short_circuits():
+    client = make_client([b"upstream down"], status=503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(collect(client))
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(collect(client))
+    assert client.stats()["short_circuited"] == 1
+
+
+def test_abandoned_stream_releases_half_open_trial():
+    client = make_client(sse("One. ", "Two. "))
+    client.breaker.record_failure()
+    client.breaker.opened_at -= client.breaker.reset_seconds
+
+    async def read_first() -> str:
+        stream = client.stream_answer("question?", [])
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(read_first()) == "One. "
+    assert client.breaker.state == "half_open"
+    assert client.breaker.allow()  # the next call becomes the trial
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_stream_answer_via_xai_delivers_opening_early(tmp_path, monkeypatch):
+    from app.ai.pipeline import AutomationPipeline, EarlyDelivery
+    from app.ai.vector_store import LocalVectorStore
+    from app.config import get_settings
+    from benchmarks.stubs import ANSWER, ServerThread, xai_stub
+
+    port = free_port()
+    monkeypatch.setenv("CHROMA_PATH", str(tmp_path / "vectorstore"))
+    monkeypatch.setenv("XAI_API_KEY", "key")
+    monkeypatch.setenv("XAI_API_URL", f"http://127.0.0.1:{port}/v1/chat/completions")
+    monkeypatch.setenv("XAI_STREAM_FIRST_CHARS", "40")
+    get_settings.cache_clear()
+    try:
+        settings = get_settings()
+        store = LocalVectorStore(tmp_path / "vectorstore")
+        store.add_text("Orders ship within two days; returns are free for thirty days.")
+        pipeline = AutomationPipeline(vector_store=store, settings=settings)
+        sent: List[str] = []
+        typing: List[bool] = []
+
+        async def send(text: str) -> None:
+            sent.append(text)
+
+        async def typing_on() -> None:
+            typing.append(True)
+
+        async def ask():
+            try:
+                delivery = EarlyDelivery(send=send, typing=typing_on)
+                return await pipeline.stream_answer_via_xai("When does my order ship?", delivery)
+            finally:
+                await pipeline.xai_client.aclose()
+
+        with ServerThread(xai_stub(latency=0.2, first_token=0.05), port):
+            draft = asyncio.run(ask())
+    finally:
+        get_settings.cache_clear()
+
+    opening = "Thanks for asking. Our stores carry that item and it ships within two days."
+    assert typing == [True]
+    assert sent == [opening]
+    assert draft.route == "xai" and draft.answer == ANSWER
+    assert draft.answer[: draft.delivered_chars].strip() == opening
+    assert draft.undelivered == ANSWER[len(opening) :].strip()
+    assert draft.citations and draft.citations[0]["doc_id"]